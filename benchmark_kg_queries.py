@@ -0,0 +1,250 @@
+"""
+Benchmark knowledge-graph query modes against a stubbed LLM.
+
+The question banks are ingested into a temporary LightRAG working directory with
+a deterministic local LLM and embedding function, then a query set is run
+through every query mode. For each mode the script reports the latency
+distribution and how many LLM / embedding calls a query costs, so the modes can
+be compared without paying for (or waiting on) a real model. The stub LLM
+sleeps ``--llm-latency-ms`` plus ``--ms-per-1k-chars`` per 1000 prompt
+characters, which makes modes that build larger contexts proportionally slower.
+
+Usage:
+    python benchmark_kg_queries.py
+    python benchmark_kg_queries.py --modes local,hybrid --repeat 3 --json kg_bench.json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import statistics
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List
+
+import numpy as np
+
+from rag_app import config
+
+EMBEDDING_DIM = 64
+DEFAULT_MODES = ["naive", "local", "global", "hybrid", "mix"]
+GRAPH_MODES = {"local", "global", "hybrid", "mix"}
+
+
+class StubModels:
+    """Deterministic LLM and embedding functions that count their calls."""
+
+    def __init__(self, llm_latency_ms: float, ms_per_1k_chars: float):
+        self.llm_latency_ms = llm_latency_ms
+        self.ms_per_1k_chars = ms_per_1k_chars
+        self.calls: Counter = Counter()
+        self.prompt_chars: Counter = Counter()
+
+    def reset(self):
+        self.calls.clear()
+        self.prompt_chars.clear()
+
+    async def llm(self, prompt, system_prompt=None, history_messages=[], keyword_extraction=False, **kwargs):
+        from lightrag.prompt import PROMPTS
+
+        chars = len(prompt) + len(system_prompt or "")
+        if keyword_extraction or "response_format" in kwargs:
+            kind = "keywords"
+        elif PROMPTS["DEFAULT_TUPLE_DELIMITER"] in (system_prompt or "") + prompt:
+            kind = "extraction"
+        elif "history_messages" in kwargs or system_prompt:
+            kind = "answer"
+        else:
+            kind = "other"
+        self.calls[kind] += 1
+        self.prompt_chars[kind] += chars
+        await asyncio.sleep((self.llm_latency_ms + self.ms_per_1k_chars * chars / 1000) / 1000)
+
+        if kind == "keywords":
+            terms = [t for t in re.split(r"[\s，。？！、：,.?!:]+", self._user_query(prompt)) if t][:4]
+            return json.dumps({"high_level_keywords": terms[:1], "low_level_keywords": terms})
+        if kind == "extraction":
+            return self._extract(prompt, PROMPTS)
+        return "Stub answer."
+
+    @staticmethod
+    def _user_query(prompt: str) -> str:
+        """The query of a keyword-extraction prompt (the line after ``User Query:``)."""
+        match = re.search(r"^User Query:[ \t]*(.*)$", prompt, re.MULTILINE)
+        return match.group(1) if match else ""
+
+    @staticmethod
+    def _extract(prompt: str, prompts: Dict) -> str:
+        """Turn every question/option line of the chunk into an entity linked to the question stem."""
+        d = prompts["DEFAULT_TUPLE_DELIMITER"]
+        lines = [line.strip() for line in prompt.splitlines() if line.startswith(("题目：", "选项"))]
+        names = [re.sub(r"^(题目：|选项[A-Z]\.\s*)", "", line)[:40] for line in lines]
+        records = [f"entity{d}{name}{d}concept{d}{line}" for name, line in zip(names, lines)]
+        records += [f"relation{d}{names[0]}{d}{name}{d}option{d}Option of the question."
+                    for name in names[1:]]
+        return "\n".join(records) + "\n" + prompts["DEFAULT_COMPLETION_DELIMITER"]
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """Hashed character-bigram vectors, so similar texts get similar embeddings."""
+        self.calls["embedding"] += 1
+        vectors = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for i in range(len(text) - 1):
+                bucket = int.from_bytes(hashlib.md5(text[i:i + 2].encode("utf-8")).digest()[:4], "little")
+                vectors[row, bucket % EMBEDDING_DIM] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+
+class _CharTokenizer:
+    """Offline tokenizer (one token per character), avoids downloading tiktoken encodings."""
+
+    def encode(self, content):
+        return [ord(ch) for ch in content]
+
+    def decode(self, tokens):
+        return "".join(chr(t) for t in tokens)
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def _summarize(latencies: List[float], calls: Counter, queries: int) -> Dict:
+    ms = [v * 1000 for v in latencies]
+    return {
+        "queries": queries,
+        "mean_ms": round(statistics.mean(ms), 2),
+        "p50_ms": round(_percentile(ms, 50), 2),
+        "p95_ms": round(_percentile(ms, 95), 2),
+        "p99_ms": round(_percentile(ms, 99), 2),
+        "max_ms": round(max(ms), 2),
+        "llm_calls_per_query": round(sum(v for k, v in calls.items() if k != "embedding") / queries, 2),
+        "llm_calls_by_kind": {k: v for k, v in calls.items() if k != "embedding"},
+        "embedding_calls_per_query": round(calls["embedding"] / queries, 2),
+    }
+
+
+async def _check_graph_retrieval(manager, stubs: StubModels, mode: str, query: str) -> int:
+    """
+    Fail if a graph mode ran without retrieving entities or generating answers.
+
+    Returns:
+        int: Number of entities retrieved for ``query``
+    """
+    from lightrag import QueryParam
+
+    answers = stubs.calls["answer"]
+    data = await manager.rag.aquery_data(query, param=QueryParam(mode=mode))
+    entities = len((data.get("data") or {}).get("entities") or [])
+    if not entities or not answers:
+        raise RuntimeError(f"{mode} mode retrieved {entities} entities and made {answers} answer calls; "
+                           "the benchmark would only measure the no-context path")
+    return entities
+
+
+async def run_benchmark(args) -> Dict:
+    from lightrag.utils import Tokenizer
+
+    from rag_app.kg_ingest import load_question_documents
+    from rag_app.kg_module import KGManager
+
+    stubs = StubModels(args.llm_latency_ms, args.ms_per_1k_chars)
+    manager = KGManager(working_dir=args.working_dir, llm_model_func=stubs.llm, embedding_func=stubs.embed,
+                        tokenizer=Tokenizer("char", _CharTokenizer()),
+                        # LightRAG's own query cache would hide the cost of repeated queries
+                        enable_llm_cache=False)
+
+    started = time.perf_counter()
+    for csv_file in args.csv:
+        await manager.aingest_csv(csv_file)
+    ingest = {"seconds": round(time.perf_counter() - started, 2), "llm_calls": dict(stubs.calls)}
+
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        queries = [doc["text"].splitlines()[0].replace("题目：", "")
+                   for csv_file in args.csv for doc in load_question_documents(csv_file)][:args.num_queries]
+
+    results = {"ingest": ingest, "modes": {}}
+    for mode in args.modes:
+        stubs.reset()
+        latencies = []
+        for _ in range(args.repeat):
+            for query in queries:
+                t0 = time.perf_counter()
+                await manager.aquery(query, mode=mode, use_cache=False)
+                latencies.append(time.perf_counter() - t0)
+        summary = _summarize(latencies, stubs.calls, len(latencies))
+        if mode in GRAPH_MODES:
+            summary["entities_retrieved"] = await _check_graph_retrieval(manager, stubs, mode, queries[0])
+
+        # Second pass through the result cache: what a repeated query costs
+        manager.query_cache.invalidate()
+        for query in queries:
+            await manager.aquery(query, mode=mode)
+        cached = []
+        for query in queries:
+            t0 = time.perf_counter()
+            await manager.aquery(query, mode=mode)
+            cached.append(time.perf_counter() - t0)
+        summary["cached_p50_ms"] = round(_percentile([v * 1000 for v in cached], 50), 3)
+        results["modes"][mode] = summary
+    return results
+
+
+def print_report(results: Dict):
+    ingest = results["ingest"]
+    print(f"\nIngestion: {ingest['seconds']}s, LLM calls {ingest['llm_calls']}")
+    header = f"{'mode':<8}{'n':>5}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}{'llm/q':>8}{'emb/q':>8}{'cached p50':>12}"
+    print(header)
+    print("-" * len(header))
+    for mode, s in results["modes"].items():
+        print(f"{mode:<8}{s['queries']:>5}{s['mean_ms']:>10}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}"
+              f"{s['max_ms']:>10}{s['llm_calls_per_query']:>8}{s['embedding_calls_per_query']:>8}{s['cached_p50_ms']:>12}")
+    print("(latencies in ms; llm/q and emb/q are model calls per query)")
+
+
+def main():
+    default_csv = [f for f in [config.DATA_FILE, *config.STEM_OPTION_CSV_FILES] if os.path.exists(f)]
+    parser = argparse.ArgumentParser(description="Benchmark knowledge-graph query modes against a stubbed LLM.")
+    parser.add_argument("--csv", nargs="+", default=default_csv, help="Question bank CSV files to ingest")
+    parser.add_argument("--queries", help="File with one query per line (default: question stems)")
+    parser.add_argument("--num-queries", type=int, default=10, help="Number of question stems used as queries")
+    parser.add_argument("--modes", default=",".join(DEFAULT_MODES), help="Comma-separated query modes")
+    parser.add_argument("--repeat", type=int, default=1, help="Passes over the query set per mode")
+    parser.add_argument("--llm-latency-ms", type=float, default=50, help="Fixed latency of a stub LLM call")
+    parser.add_argument("--ms-per-1k-chars", type=float, default=20, help="Extra stub latency per 1000 prompt chars")
+    parser.add_argument("--working-dir", help="LightRAG working directory (default: a temporary directory)")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    args = parser.parse_args()
+    args.modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+
+    temp_dir = None
+    if not args.working_dir:
+        temp_dir = args.working_dir = tempfile.mkdtemp(prefix="kg_bench_")
+    # Stub responses must not end up in the shared response cache
+    config.KG_CONFIG.update({"embedding_dim": EMBEDDING_DIM, "response_cache": {"mode": "off"}})
+    try:
+        results = asyncio.run(run_benchmark(args))
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
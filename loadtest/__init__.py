@@ -0,0 +1,7 @@
+"""
+Load-testing harness for the RAG API.
+
+- ``python -m loadtest``: open-loop load generator (see ``loadtest.generator``)
+- ``python -m loadtest.stubs``: stub Ollama / DashScope embedding servers and a
+  stub reranker with configurable latency, for offline benchmarks
+"""
@@ -0,0 +1,241 @@
+"""
+Open-loop load generator for the search API.
+
+Requests are sent on a fixed schedule (constant or Poisson arrivals at the
+target QPS) whether or not earlier requests have finished, so a slow server
+builds a queue instead of slowing the client down. Latency is measured from the
+scheduled send time, which keeps client-side lag from hiding server
+queueing (coordinated omission). Requests in the warm-up window are sent but
+not reported.
+
+The report has, per QPS step: sent and completed requests, achieved
+throughput, p50/p95/p99/max latency of successful responses, the error rate
+with a breakdown by status (429/503 load shedding, 504 deadline, client
+timeouts), and how many responses were degraded (``deadline_ms``) or coalesced.
+
+Usage:
+    python -m loadtest --qps 20,50,100 --duration 30
+    python -m loadtest --endpoint /search --qps 200 --deadline-ms 150 --fields id,distance --json search.json
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import math
+import os
+import random
+from collections import Counter
+from typing import Dict, List, Optional
+
+import httpx
+
+from rag_app import config
+
+QUERY_COLUMNS = ("题干", "question_text")  # stem-option banks, questions.csv
+
+
+def load_queries(paths: List[str], column: Optional[str] = None) -> List[str]:
+    """
+    Unique queries from question bank CSVs (the stem column) or text files (one query per line).
+
+    Args:
+        paths (List[str]): CSV or text files
+        column (str): CSV column to use, defaults to the first of ``QUERY_COLUMNS`` present
+    """
+    queries = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            if not path.lower().endswith(".csv"):
+                queries.update((line.strip(), None) for line in f if line.strip())
+                continue
+            reader = csv.DictReader(f)
+            field = column or next((c for c in QUERY_COLUMNS if c in (reader.fieldnames or [])), None)
+            if field is None:
+                raise ValueError(f"{path} has none of the columns {QUERY_COLUMNS}; pass --column")
+            queries.update((row[field].strip(), None) for row in reader if (row.get(field) or "").strip())
+    return list(queries)
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+def summarize(samples: List[Dict], duration: float) -> Dict:
+    """
+    Aggregate request samples into the report of one QPS step.
+
+    Args:
+        samples (List[Dict]): ``{"latency", "status", "error", "degraded", "coalesced"}`` per request;
+            ``status`` is None when the request never got a response
+        duration (float): Measured window in seconds
+    """
+    ok = [s for s in samples if s["status"] == 200]
+    errors = Counter(str(s["status"]) if s["status"] is not None else s["error"]
+                     for s in samples if s["status"] != 200)
+    degraded = Counter(d for s in ok for d in s["degraded"])
+    ms = [s["latency"] * 1000 for s in ok]
+    summary = {
+        "sent": len(samples),
+        "ok": len(ok),
+        "throughput_qps": round(len(ok) / duration, 2) if duration else 0.0,
+        "error_rate": round(1 - len(ok) / len(samples), 4) if samples else 0.0,
+        "errors": dict(errors),
+        "degraded": sum(1 for s in ok if s["degraded"]),
+        "degraded_by_kind": dict(degraded),
+        "coalesced": sum(1 for s in ok if s["coalesced"]),
+    }
+    if ms:
+        summary.update({
+            "p50_ms": round(_percentile(ms, 50), 2),
+            "p95_ms": round(_percentile(ms, 95), 2),
+            "p99_ms": round(_percentile(ms, 99), 2),
+            "max_ms": round(max(ms), 2),
+        })
+    return summary
+
+
+async def _send(client: httpx.AsyncClient, endpoint: str, payload: Dict, scheduled: float, samples: List[Dict]):
+    sample = {"latency": None, "status": None, "error": None, "degraded": [], "coalesced": False}
+    try:
+        response = await client.post(endpoint, json=payload)
+        sample["status"] = response.status_code
+        if response.status_code == 200:
+            body = response.json()
+            sample["degraded"] = body.get("degraded") or []
+            sample["coalesced"] = bool(body.get("coalesced"))
+    except httpx.TimeoutException:
+        sample["error"] = "timeout"
+    except httpx.HTTPError as e:
+        sample["error"] = type(e).__name__
+    sample["latency"] = asyncio.get_running_loop().time() - scheduled
+    samples.append(sample)
+
+
+async def run_step(client: httpx.AsyncClient, endpoint: str, queries: List[str], qps: float, duration: float,
+                   warmup: float = 0.0, payload: Optional[Dict] = None, arrival: str = "poisson",
+                   max_inflight: int = 1000, seed: Optional[int] = None) -> Dict:
+    """
+    Send requests at ``qps`` for ``warmup + duration`` seconds and summarize the measured window.
+
+    Args:
+        client (httpx.AsyncClient): Client with the API base URL
+        endpoint (str): Path such as ``/search/reranked``
+        queries (List[str]): Query set, sent in random order (cycled)
+        qps (float): Target arrival rate
+        duration (float): Measured seconds after the warm-up
+        warmup (float): Seconds of traffic sent before measuring
+        payload (Dict): Extra request fields (top_k, mode, deadline_ms, fields)
+        arrival (str): ``poisson`` (exponential gaps) or ``constant``
+        max_inflight (int): Outstanding requests above which new arrivals are dropped and
+            counted as ``client_saturated`` (protects the generator itself)
+        seed (int): Random seed for the query order and arrival gaps
+    """
+    rng = random.Random(seed)
+    order = list(queries)
+    rng.shuffle(order)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    measure_from = start + warmup
+    end = measure_from + duration
+    measured: List[Dict] = []
+    discarded: List[Dict] = []
+    inflight = set()
+    max_lag = 0.0
+    scheduled = start
+    i = 0
+    while scheduled < end:
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        max_lag = max(max_lag, loop.time() - scheduled)
+        samples = measured if scheduled >= measure_from else discarded
+        if len(inflight) >= max_inflight:
+            samples.append({"latency": 0.0, "status": None, "error": "client_saturated", "degraded": [],
+                            "coalesced": False})
+        else:
+            body = {"query": order[i % len(order)], **(payload or {})}
+            task = asyncio.ensure_future(_send(client, endpoint, body, scheduled, samples))
+            inflight.add(task)
+            task.add_done_callback(inflight.discard)
+        i += 1
+        scheduled += rng.expovariate(qps) if arrival == "poisson" else 1.0 / qps
+    if inflight:
+        await asyncio.gather(*inflight)
+    summary = summarize(measured, duration)
+    summary.update({"target_qps": qps, "duration": duration, "max_send_lag_ms": round(max_lag * 1000, 2)})
+    return summary
+
+
+async def run_load(args, queries: List[str]) -> Dict:
+    payload = {"top_k": args.top_k}
+    if args.endpoint.rstrip("/").endswith("reranked"):
+        payload["mode"] = args.mode
+    if args.deadline_ms:
+        payload["deadline_ms"] = args.deadline_ms
+    if args.fields:
+        payload["fields"] = args.fields
+    limits = httpx.Limits(max_connections=args.max_inflight, max_keepalive_connections=args.max_inflight)
+    results = {"url": args.url, "endpoint": args.endpoint, "payload": payload, "queries": len(queries), "steps": []}
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        for qps in args.qps:
+            print(f"Running {qps} QPS for {args.duration}s (+{args.warmup}s warm-up) against {args.endpoint} ...")
+            step = await run_step(client, args.endpoint, queries, qps, args.duration, args.warmup, payload,
+                                  args.arrival, args.max_inflight, args.seed)
+            results["steps"].append(step)
+    return results
+
+
+def print_report(results: Dict):
+    print(f"\n{results['endpoint']} {results['payload']} ({results['queries']} distinct queries)")
+    header = (f"{'qps':>8}{'sent':>8}{'ok/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+              f"{'err%':>8}{'degr':>7}{'coal':>7}  errors")
+    print(header)
+    print("-" * len(header))
+    for s in results["steps"]:
+        latencies = "".join(f"{s.get(k, '-'):>9}" for k in ("p50_ms", "p95_ms", "p99_ms", "max_ms"))
+        print(f"{s['target_qps']:>8}{s['sent']:>8}{s['throughput_qps']:>9}{latencies}"
+              f"{round(s['error_rate'] * 100, 2):>8}{s['degraded']:>7}{s['coalesced']:>7}  {s['errors'] or ''}")
+    print("(latencies in ms from the scheduled send time, successful responses only)")
+
+
+def main():
+    default_csv = [f for f in [config.DATA_FILE, *config.STEM_OPTION_CSV_FILES] if os.path.exists(f)]
+    parser = argparse.ArgumentParser(description="Open-loop load test of the search API.")
+    parser.add_argument("--url", default=f"http://localhost:{config.API_PORT}", help="API base URL")
+    parser.add_argument("--endpoint", default="/search/reranked", help="/search or /search/reranked")
+    parser.add_argument("--queries", nargs="+", default=default_csv,
+                        help="Question bank CSVs (stem column) or text files with one query per line")
+    parser.add_argument("--column", help="CSV column with the queries (default: 题干 or question_text)")
+    parser.add_argument("--qps", default="20", help="Target QPS; comma-separated values run one step each")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds per step")
+    parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds at the start of each step")
+    parser.add_argument("--arrival", choices=["poisson", "constant"], default="poisson", help="Arrival process")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--mode", choices=["vector", "graph"], default="vector", help="Recall mode for /search/reranked")
+    parser.add_argument("--deadline-ms", type=int, help="Latency budget sent with every request")
+    parser.add_argument("--fields", help="Comma-separated result fields to request (projection)")
+    parser.add_argument("--timeout", type=float, default=30, help="Client timeout per request in seconds")
+    parser.add_argument("--max-inflight", type=int, default=1000, help="Outstanding requests before arrivals are dropped")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for query order and arrivals")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    args = parser.parse_args()
+    args.qps = [float(q) for q in args.qps.split(",") if q.strip()]
+    args.fields = [f.strip() for f in args.fields.split(",") if f.strip()] if args.fields else None
+
+    queries = load_queries(args.queries, args.column)
+    if not queries:
+        parser.error("the query set is empty")
+    results = asyncio.run(run_load(args, queries))
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Local stand-ins for the model backends, so the whole stack can be load-tested offline.
+
+- Ollama: ``POST /api/embeddings`` (one prompt, used by the Chroma embedding
+  function) and ``POST /api/embed`` (batched input, used by the KG client)
+- DashScope: ``POST /api/v1/services/embeddings/text-embedding/text-embedding``,
+  the endpoint behind ``dashscope.TextEmbedding.call``
+- Reranker: a ``rag_app.model_server.ModelServer`` on a Unix socket whose
+  reranker scores character-bigram overlap; like the real model server it runs
+  one rerank at a time
+
+Embeddings are hashed character-bigram vectors, so similar texts get similar
+vectors and retrieval over a knowledge base built with the stubs still returns
+sensible neighbours. Every call sleeps ``latency_ms + per_item_ms * items``,
+scaled by a random factor in ``[1 - jitter, 1 + jitter]``.
+
+Usage:
+    python -m loadtest.stubs --embed-latency-ms 20 --rerank-ms-per-candidate 8
+    # then, in another shell
+    RAG_OLLAMA_HOST=http://127.0.0.1:11434 RAG_MODEL_SERVER_SOCKET=/tmp/rag_stub_models.sock python main.py
+    # DashScope instead of Ollama: set EMBEDDING_PROVIDER = "dashscope" and
+    DASHSCOPE_HTTP_BASE_URL=http://127.0.0.1:8011/api/v1 DASHSCOPE_API_KEY=stub python main.py
+"""
+
+import argparse
+import asyncio
+import hashlib
+import random
+import time
+from typing import List, Optional
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+
+from rag_app.model_server import ModelServer
+
+DEFAULT_DIMENSIONS = 1024  # Qwen3-Embedding-0.6B / text-embedding-v4, matches existing collections
+
+
+def _bigrams(text: str) -> List[str]:
+    return [text[i:i + 2] for i in range(len(text) - 1)] or [text]
+
+
+def hashed_embeddings(texts: List[str], dimensions: int = DEFAULT_DIMENSIONS) -> List[List[float]]:
+    """Deterministic unit vectors built from hashed character bigrams."""
+    vectors = np.zeros((len(texts), dimensions), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for gram in _bigrams(text):
+            bucket = int.from_bytes(hashlib.md5(gram.encode("utf-8")).digest()[:4], "little")
+            vectors[row, bucket % dimensions] += 1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.where(norms == 0, 1.0, norms)).tolist()
+
+
+class StubLatency:
+    """Simulated service time: ``latency_ms + per_item_ms * items``, with jitter."""
+
+    def __init__(self, latency_ms: float = 0.0, per_item_ms: float = 0.0, jitter: float = 0.0,
+                 seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.per_item_ms = per_item_ms
+        self.jitter = jitter
+        self._random = random.Random(seed)
+
+    def seconds(self, items: int = 1) -> float:
+        factor = 1.0 + self._random.uniform(-self.jitter, self.jitter) if self.jitter else 1.0
+        return max(0.0, (self.latency_ms + self.per_item_ms * items) * factor / 1000)
+
+
+def create_ollama_app(latency: StubLatency, dimensions: int = DEFAULT_DIMENSIONS, concurrency: int = 0) -> FastAPI:
+    """
+    Stub Ollama embedding server.
+
+    Args:
+        latency (StubLatency): Service time per request (items = number of texts)
+        dimensions (int): Embedding dimensions
+        concurrency (int): Requests served at the same time (like ``OLLAMA_NUM_PARALLEL``); 0 means unlimited
+    """
+    app = FastAPI(title="Stub Ollama")
+    slots = asyncio.Semaphore(concurrency) if concurrency > 0 else None
+
+    async def serve(texts: List[str]) -> List[List[float]]:
+        if slots is None:
+            await asyncio.sleep(latency.seconds(len(texts)))
+        else:
+            async with slots:
+                await asyncio.sleep(latency.seconds(len(texts)))
+        return hashed_embeddings(texts, dimensions)
+
+    @app.post("/api/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        return {"embedding": (await serve([body.get("prompt", "")]))[0]}
+
+    @app.post("/api/embed")
+    async def embed(request: Request):
+        body = await request.json()
+        texts = body.get("input", "")
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        started = time.perf_counter_ns()
+        vectors = await serve(texts)
+        return {"model": body.get("model"), "embeddings": vectors, "total_duration": time.perf_counter_ns() - started}
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": []}
+
+    return app
+
+
+def create_dashscope_app(latency: StubLatency, dimensions: int = DEFAULT_DIMENSIONS) -> FastAPI:
+    """Stub DashScope text-embedding server (``DASHSCOPE_HTTP_BASE_URL`` = ``http://host:port/api/v1``)."""
+    app = FastAPI(title="Stub DashScope")
+
+    @app.post("/api/v1/services/embeddings/text-embedding/text-embedding")
+    async def text_embedding(request: Request):
+        body = await request.json()
+        texts = body.get("input", {}).get("texts", [])
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        dimension = body.get("parameters", {}).get("dimension", dimensions)
+        await asyncio.sleep(latency.seconds(len(texts)))
+        vectors = hashed_embeddings(texts, dimension)
+        return {
+            "status_code": 200,
+            "request_id": hashlib.md5(repr(texts).encode("utf-8")).hexdigest(),
+            "code": "",
+            "message": "",
+            "output": {"embeddings": [{"text_index": i, "embedding": v} for i, v in enumerate(vectors)]},
+            "usage": {"total_tokens": sum(len(t) for t in texts)},
+        }
+
+    return app
+
+
+class StubReranker:
+    """Cross-encoder stand-in: bigram overlap scores after a simulated forward pass."""
+
+    def __init__(self, latency: StubLatency):
+        self.latency = latency
+
+    def rerank(self, query: str, chunks: List[str], chunk_ids: Optional[List[str]] = None) -> List[float]:
+        time.sleep(self.latency.seconds(len(chunks)))
+        query_grams = set(_bigrams(query))
+        return [len(query_grams & set(_bigrams(chunk))) / max(len(query_grams), 1) for chunk in chunks]
+
+
+async def serve_stubs(args):
+    servers = []
+    if args.ollama_port:
+        app = create_ollama_app(StubLatency(args.embed_latency_ms, args.embed_ms_per_text, args.jitter, args.seed),
+                                args.dimensions, args.embed_concurrency)
+        servers.append(uvicorn.Server(uvicorn.Config(app, host=args.host, port=args.ollama_port, log_level="warning")))
+        print(f"Stub Ollama:    http://{args.host}:{args.ollama_port}   (RAG_OLLAMA_HOST)")
+    if args.dashscope_port:
+        app = create_dashscope_app(StubLatency(args.embed_latency_ms, args.embed_ms_per_text, args.jitter, args.seed),
+                                   args.dimensions)
+        servers.append(uvicorn.Server(uvicorn.Config(app, host=args.host, port=args.dashscope_port,
+                                                     log_level="warning")))
+        print(f"Stub DashScope: http://{args.host}:{args.dashscope_port}/api/v1   (DASHSCOPE_HTTP_BASE_URL)")
+    model_server = None
+    if args.reranker_socket:
+        reranker = StubReranker(StubLatency(args.rerank_latency_ms, args.rerank_ms_per_candidate, args.jitter,
+                                            args.seed))
+        model_server = ModelServer(args.reranker_socket, reranker=reranker)
+        await model_server.start()
+        print(f"Stub reranker:  {args.reranker_socket}   (RAG_MODEL_SERVER_SOCKET)")
+    try:
+        if servers:
+            await asyncio.gather(*(server.serve() for server in servers))
+        else:
+            # Only the reranker: the model server runs on this loop until interrupted
+            await asyncio.Event().wait()
+    finally:
+        if model_server is not None:
+            await model_server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run stub Ollama / DashScope embedding servers and a stub reranker.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface for the HTTP stubs")
+    parser.add_argument("--ollama-port", type=int, default=11434, help="Stub Ollama port (0 to disable)")
+    parser.add_argument("--dashscope-port", type=int, default=8011, help="Stub DashScope port (0 to disable)")
+    parser.add_argument("--reranker-socket", default="/tmp/rag_stub_models.sock",
+                        help="Unix socket of the stub reranker model server (empty to disable)")
+    parser.add_argument("--dimensions", type=int, default=DEFAULT_DIMENSIONS, help="Embedding dimensions")
+    parser.add_argument("--embed-latency-ms", type=float, default=20, help="Fixed latency of an embedding request")
+    parser.add_argument("--embed-ms-per-text", type=float, default=1, help="Extra embedding latency per input text")
+    parser.add_argument("--embed-concurrency", type=int, default=4,
+                        help="Embedding requests the stub Ollama serves at once (0 for unlimited)")
+    parser.add_argument("--rerank-latency-ms", type=float, default=30, help="Fixed latency of a rerank call")
+    parser.add_argument("--rerank-ms-per-candidate", type=float, default=8, help="Extra rerank latency per candidate")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Relative random variation of every latency")
+    parser.add_argument("--seed", type=int, help="Random seed for the jitter")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve_stubs(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -3,28 +3,87 @@ Main application script that demonstrates how to use both RAG and fine-tuning pa
 This script sets up a FastAPI server that provides endpoints for both RAG and fine-tuning functionality.
 """
 
+import asyncio
 import os
-from typing import Dict, List, Optional
+from contextlib import asynccontextmanager
+from typing import Dict, List, Literal, Optional
 
 import uvicorn
 from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+# Heavy components (Chroma, the reranker model, LightRAG, fine-tuning) are imported and
+# built lazily by their factories, so importing this module and starting the server is fast
+from rag_app import config, executors, metrics
+from rag_app.deadline import DeadlineExceeded
+from rag_app.executors import Overloaded
+from rag_app.lifecycle import ComponentRegistry
+from rag_app.responses import SEARCH_RESULT_FIELDS, CompressionMiddleware, FastJSONResponse, project_results
+
+
+def _create_rag_manager():
+    from rag_app.rag_module import RAGManager
+    return RAGManager()
+
+
+def _load_reranker():
+    # Returns the loaded cross-encoder, or a marker when reranking is disabled in config
+    return components.get("rag").load_reranker() or "disabled"
+
+
+def _create_kg_manager():
+    from rag_app.kg_module import KGManager
+    return KGManager()
+
+
+def _create_ft_manager():
+    from finetune_app.finetune_module import FineTuneManager
+    return FineTuneManager()
+
+
+def _create_monitor():
+    from rag_app.monitor import KnowledgeBaseMonitor
+    return KnowledgeBaseMonitor()
+
+
+# Components are built on first use or by the background warm-up (LIFECYCLE_CONFIG)
+components = ComponentRegistry()
+components.register("rag", _create_rag_manager, close=lambda rag: rag.close())
+components.register("reranker", _load_reranker)
+components.register("kg", _create_kg_manager, close=lambda kg: kg.aclose())
+components.register("finetune", _create_ft_manager)
+components.register("monitor", _create_monitor, close=lambda monitor: monitor.close())
+for _name in config.LIFECYCLE_CONFIG.get("required", ["rag"]):
+    components[_name].required = True
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Fail fast on a broken configuration instead of exiting at import time
+    config.validate_config()
+    warmup_names = config.LIFECYCLE_CONFIG.get("warmup", [])
+    warmup = None
+    if warmup_names:
+        warmup = asyncio.create_task(components.warm_up(
+            warmup_names, parallel=config.LIFECYCLE_CONFIG.get("parallel_warmup", True)))
+    yield
+    if warmup is not None and not warmup.done():
+        warmup.cancel()
+    await components.aclose()
+    executors.shutdown()
 
-# Import from our packages
-from finetune_app.finetune_module import FineTuneManager
-from rag_app.rag_module import RAGManager
-from rag_app.kg_module import KGManager
-from rag_app.monitor import KnowledgeBaseMonitor
 
 # Create FastAPI app
 app = FastAPI(
     title="RAG and Fine-tuning API",
     description="API for RAG search and model fine-tuning",
     version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 # Add CORS middleware
@@ -36,22 +95,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize our managers
-rag_manager = RAGManager()
-ft_manager = FineTuneManager()
-kg_manager = KGManager()
+# Compress large responses (brotli when available, otherwise gzip)
+app.add_middleware(CompressionMiddleware)
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    # Load shedding: reject immediately instead of queueing without bound
+    return JSONResponse({"detail": str(exc)}, status_code=exc.status_code,
+                        headers={"Retry-After": str(int(exc.retry_after))})
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    # Latency budget spent before retrieval finished and no stale result to fall back on
+    return JSONResponse({"detail": str(exc)}, status_code=504)
 
 # Set up templates and static files for the monitor UI
 templates = Jinja2Templates(directory="rag_app/templates")
 app.mount("/static", StaticFiles(directory="rag_app/static"), name="static")
 
-# Initialize the monitor
-kb_monitor = KnowledgeBaseMonitor(rag_manager.collection)
-
 # Define request and response models
+SearchResultField = Literal[SEARCH_RESULT_FIELDS]
+
 class SearchRequest(BaseModel):
     query: str
     top_k: int = 5
+    fields: Optional[List[SearchResultField]] = None  # 结果字段投影，如 ["id", "rerank_score"]；None 返回全部字段
+    deadline_ms: Optional[int] = Field(None, gt=0)  # 延迟预算（毫秒），预算不足时降级；None 使用默认预算
+
+class RerankedSearchRequest(SearchRequest):
+    mode: Literal["vector", "graph"] = "vector"  # graph：向量命中在知识图谱中扩展到相邻题目后再精排
 
 class FineTuneRequest(BaseModel):
     model_name: str
@@ -65,6 +137,7 @@ class KGQueryRequest(BaseModel):
     query: str
     mode: str = "hybrid"
     top_k: int = 60
+    use_cache: bool = True
 
 # Define API routes
 @app.get("/", response_class=HTMLResponse)
@@ -98,6 +171,18 @@ async def root():
                 <span class="method">POST</span> <a href="/search/reranked">/search/reranked</a> - Search with reranking
             </div>
             
+            <div class="endpoint">
+                <span class="method">GET</span> <a href="/healthz">/healthz</a> - Liveness check
+            </div>
+            
+            <div class="endpoint">
+                <span class="method">GET</span> <a href="/readyz">/readyz</a> - Readiness and component status
+            </div>
+            
+            <div class="endpoint">
+                <span class="method">GET</span> <a href="/executors">/executors</a> - Worker pool and endpoint load
+            </div>
+            
             <div class="endpoint">
                 <span class="method">GET</span> <a href="/monitor">/monitor</a> - Knowledge base monitor UI
             </div>
@@ -117,19 +202,57 @@ async def root():
     </html>
     """
 
+@app.get("/healthz")
+async def healthz():
+    # Liveness: the process is up and serving, even while components are still warming up
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    readiness = components.readiness()
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
 @app.post("/search")
 async def search(request: SearchRequest):
-    try:
-        return rag_manager.search(query=request.query, top_k=request.top_k)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    async with executors.limit("search"):
+        try:
+            rag_manager = await components.aget("rag")
+            result = await rag_manager.asearch(query=request.query, top_k=request.top_k,
+                                               deadline_ms=request.deadline_ms)
+            return FastJSONResponse(project_results(result, request.fields))
+        except (Overloaded, DeadlineExceeded):
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/search/reranked")
-async def search_reranked(request: SearchRequest):
-    try:
-        return rag_manager.search_with_rerank(query=request.query, top_k=request.top_k)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def search_reranked(request: RerankedSearchRequest):
+    async with executors.limit("search_reranked"):
+        try:
+            rag_manager = await components.aget("rag")
+            result = await rag_manager.asearch_with_rerank(query=request.query, top_k=request.top_k,
+                                                           mode=request.mode, deadline_ms=request.deadline_ms)
+            return FastJSONResponse(project_results(result, request.fields))
+        except (Overloaded, DeadlineExceeded):
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/reranker/health")
+async def reranker_health():
+    rag_manager = await components.aget("rag")
+    health = rag_manager.reranker_health()
+    if not health.get("healthy", False):
+        raise HTTPException(status_code=503, detail=health)
+    return health
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/executors")
+async def executor_stats():
+    return executors.stats()
 
 @app.get("/monitor")
 async def monitor_ui(request: Request):
@@ -137,86 +260,148 @@ async def monitor_ui(request: Request):
 
 @app.get("/monitor/stats")
 async def monitor_stats():
+    async with executors.limit("monitor"):
+        try:
+            kb_monitor = await components.aget("monitor")
+            return await executors.run_in("admin", kb_monitor.get_collection_stats)
+        except Overloaded:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/monitor/stream")
+async def monitor_stream():
+    kb_monitor = await components.aget("monitor")
+    return StreamingResponse(
+        kb_monitor.stream_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/monitor/stats/rebuild")
+async def monitor_stats_rebuild():
+    try:
+        kb_monitor = await components.aget("monitor")
+        return kb_monitor.start_stats_rebuild()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/monitor/duplicates/scan")
+async def monitor_duplicates_scan(threshold: Optional[float] = Query(None, description="Cosine similarity threshold")):
     try:
-        return kb_monitor.get_stats()
+        kb_monitor = await components.aget("monitor")
+        return kb_monitor.start_duplicate_scan(threshold=threshold)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/monitor/jobs/{job_id}")
+async def monitor_job(job_id: str):
+    kb_monitor = await components.aget("monitor")
+    job = kb_monitor.get_job(job_id)
+    if "error" in job:
+        raise HTTPException(status_code=404, detail=job["error"])
+    return job
+
 @app.get("/monitor/samples")
 async def monitor_samples(
     limit: int = Query(10, description="Number of samples to return"),
     offset: int = Query(0, description="Offset for pagination"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor returned as next_cursor"),
+    fields: Optional[str] = Query(None, description="Comma-separated projection: documents,metadatas; empty for ids only"),
 ):
-    try:
-        return kb_monitor.get_samples(limit=limit, offset=offset)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    async with executors.limit("monitor"):
+        try:
+            projection = None if fields is None else [f.strip() for f in fields.split(",") if f.strip()]
+            kb_monitor = await components.aget("monitor")
+            samples = await executors.run_in("admin", kb_monitor.get_data_samples, limit=limit, offset=offset,
+                                             cursor=cursor, fields=projection)
+            return FastJSONResponse(samples)
+        except Overloaded:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/monitor/queries")
+async def monitor_queries(limit: int = Query(50, description="Number of recent queries to return")):
+    kb_monitor = await components.aget("monitor")
+    return kb_monitor.get_recent_queries(limit=limit)
+
+@app.get("/monitor/queries/slow")
+async def monitor_slow_queries(limit: int = Query(50, description="Number of slow queries to return")):
+    kb_monitor = await components.aget("monitor")
+    return kb_monitor.get_slow_queries(limit=limit)
+
+@app.get("/monitor/queries/hot")
+async def monitor_hot_queries(n: int = Query(10, description="Number of top queries and documents")):
+    kb_monitor = await components.aget("monitor")
+    return kb_monitor.get_query_hotspots(n=n)
+
+def _run_finetune(ft_manager, request: FineTuneRequest) -> dict:
+    # Prepare data
+    data_dir = ft_manager.prepare_data(request.data_file)
+    
+    # Load model
+    ft_manager.load_model(request.model_name)
+    
+    # Fine-tune
+    model_path = ft_manager.fine_tune(
+        train_data_dir=data_dir,
+        training_args=request.training_args
+    )
+    
+    # Evaluate
+    eval_metrics = ft_manager.evaluate(model_path=model_path)
+    
+    return {
+        "status": "success",
+        "model_path": model_path,
+        "metrics": eval_metrics
+    }
 
 @app.post("/finetune")
 async def finetune(request: FineTuneRequest):
-    try:
-        # Prepare data
-        data_dir = ft_manager.prepare_data(request.data_file)
-        
-        # Load model
-        ft_manager.load_model(request.model_name)
-        
-        # Fine-tune
-        model_path = ft_manager.fine_tune(
-            train_data_dir=data_dir,
-            training_args=request.training_args
-        )
-        
-        # Evaluate
-        metrics = ft_manager.evaluate(model_path=model_path)
-        
-        return {
-            "status": "success",
-            "model_path": model_path,
-            "metrics": metrics
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # One fine-tuning run at a time, on the admin pool so the event loop keeps serving
+    async with executors.limit("finetune"):
+        try:
+            ft_manager = await components.aget("finetune")
+            return await executors.run_in("admin", _run_finetune, ft_manager, request)
+        except Overloaded:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/kg/insert")
 async def kg_insert(request: KGInsertRequest):
-    try:
-        # Initialize KG manager if not already initialized
-        if not hasattr(kg_manager, 'rag') or kg_manager.rag is None:
-            await kg_manager.initialize()
-        
-        # Insert text into knowledge graph
-        kg_manager.insert_text(request.text)
-        
-        return {"status": "success", "message": "Text inserted into knowledge graph"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    async with executors.limit("kg_insert"):
+        try:
+            # Runs on the server's event loop; LightRAG is initialized on first use
+            kg_manager = await components.aget("kg")
+            await kg_manager.ainsert(request.text)
+            
+            return {"status": "success", "message": "Text inserted into knowledge graph"}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/kg/query")
 async def kg_query(request: KGQueryRequest):
-    try:
-        # Initialize KG manager if not already initialized
-        if not hasattr(kg_manager, 'rag') or kg_manager.rag is None:
-            await kg_manager.initialize()
-        
-        # Query the knowledge graph
-        result = kg_manager.query(
-            query_text=request.query,
-            mode=request.mode,
-            top_k=request.top_k
-        )
-        
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    async with executors.limit("kg_query"):
+        try:
+            kg_manager = await components.aget("kg")
+            result = await kg_manager.aquery(
+                query_text=request.query,
+                mode=request.mode,
+                use_cache=request.use_cache,
+                top_k=request.top_k
+            )
+            
+            return result
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
 
 # Run the application
 if __name__ == "__main__":
-    # Get configuration from rag_app.config
-    from rag_app import config
-    
     print(f"Starting API server on {config.API_HOST}:{config.API_PORT}")
     uvicorn.run(
         "main:app",
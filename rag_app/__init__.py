@@ -1,6 +1,15 @@
 # This file makes rag_app a Python package
 
-from .rag_module import RAGManager
-from .kg_module import KGManager
+# RAGManager / KGManager are imported on first access, so importing a light submodule
+# (e.g. rag_app.config) does not pull in Chroma, LightRAG or the reranker dependencies.
+__all__ = ["RAGManager", "KGManager"]
 
-__all__ = ["RAGManager", "KGManager"] 
\ No newline at end of file
+
+def __getattr__(name):
+    if name == "RAGManager":
+        from .rag_module import RAGManager
+        return RAGManager
+    if name == "KGManager":
+        from .kg_module import KGManager
+        return KGManager
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,112 @@
+"""
+级联精排模块 - 在调用 cross-encoder 之前用廉价的打分器裁剪候选
+
+级联流程：
+1. 向量召回：由 collection.query 返回 embedding 距离排序的候选
+2. 预打分：词法重叠（字符二元组）与 embedding 相似度加权，只保留少量幸存者
+3. 精排：仅对幸存者调用 Qwen3-Reranker cross-encoder
+
+各阶段的候选规模由 config.RERANKER_CONFIG 决定。
+"""
+
+import time
+from typing import Dict, List, Optional
+
+from . import metrics
+
+
+def char_bigrams(text: str) -> set:
+    """
+    提取文本的字符二元组集合（忽略空白），对中文题干无需分词即可比较词法重叠。
+    """
+    chars = [ch for ch in text.lower() if not ch.isspace()]
+    if len(chars) < 2:
+        return set(chars)
+    return {chars[i] + chars[i + 1] for i in range(len(chars) - 1)}
+
+
+def stage_sizes(top_k: int, reranker_config: Dict) -> Dict[str, int]:
+    """
+    根据精排配置计算级联各阶段的候选数量。
+
+    参数:
+        top_k (int): 最终返回的结果数量
+        reranker_config (Dict): config.RERANKER_CONFIG
+
+    返回:
+        Dict: {"recall": 向量召回数量, "prescore_keep": 进入 cross-encoder 的候选数量}
+    """
+    recall = min(top_k * reranker_config.get("candidate_multiplier", 5),
+                 reranker_config.get("max_candidates", 30))
+    recall = max(recall, top_k)
+    keep = reranker_config.get("prescore_candidates") or recall
+    keep = max(top_k, min(keep, recall))
+    return {"recall": recall, "prescore_keep": keep}
+
+
+def prescore(query: str, candidates: List[Dict], lexical_weight: float = 0.5) -> List[Dict]:
+    """
+    对候选进行廉价预打分，并按分数降序返回（原列表中的字典会被写入 "prescore" 字段）。
+
+    预打分 = lexical_weight * 词法覆盖率 + (1 - lexical_weight) * 归一化 embedding 相似度
+    - 词法覆盖率：查询字符二元组在文档中出现的比例
+    - embedding 相似度：1 / (1 + distance)，再在候选集合内做 min-max 归一化
+
+    参数:
+        query (str): 查询文本
+        candidates (List[Dict]): 向量召回的候选，需包含 "content" 与 "distance"
+        lexical_weight (float): 词法得分的权重
+
+    返回:
+        List[Dict]: 按预打分降序排列的候选
+    """
+    if not candidates:
+        return []
+    query_grams = char_bigrams(query)
+    sims = [1.0 / (1.0 + max(c.get("distance", 0.0), 0.0)) for c in candidates]
+    lo, hi = min(sims), max(sims)
+    span = hi - lo
+    for c, sim in zip(candidates, sims):
+        if query_grams:
+            lexical = len(query_grams & char_bigrams(c["content"])) / len(query_grams)
+        else:
+            lexical = 0.0
+        semantic = (sim - lo) / span if span > 0 else 1.0
+        c["prescore"] = lexical_weight * lexical + (1.0 - lexical_weight) * semantic
+    return sorted(candidates, key=lambda x: x["prescore"], reverse=True)
+
+
+def is_decisive(scored: List[Dict], top_k: int, margin: Optional[float]) -> bool:
+    """
+    判断预打分结果是否已足够确定，可以跳过 cross-encoder（提前退出）。
+
+    只比较第 top_k 名与第 top_k+1 名之间的分差：分差不小于 margin 时，返回哪 top_k 个候选
+    已经确定（cross-encoder 只会调整它们之间的顺序）。预打分在 [0, 1] 之间，若要求 top_k 个
+    相邻分差都达到 margin，top_k >= 4 时默认 margin 永远无法满足。
+    margin 为 None 或候选数不超过 top_k（不存在分界）时不提前退出。
+    """
+    if margin is None or top_k < 1 or len(scored) <= top_k:
+        return False
+    return scored[top_k - 1]["prescore"] - scored[top_k]["prescore"] >= margin
+
+
+class StageTimer:
+    """
+    记录级联各阶段的耗时与候选数量，结果会直接放入搜索响应的 "stages" 字段，
+    同时写入阶段延迟与批大小指标。
+    """
+
+    def __init__(self):
+        self.stages: List[Dict] = []
+
+    def record(self, name: str, started: float, observe: bool = True, **fields) -> None:
+        """observe 为 False 时只写入 stages（该阶段的指标已在别处记录，如 embedding）。"""
+        elapsed = time.perf_counter() - started
+        stage = {"name": name, "elapsed_ms": round(elapsed * 1000, 3)}
+        stage.update(fields)
+        self.stages.append(stage)
+        if not observe:
+            return
+        metrics.observe_latency(name, elapsed)
+        if "candidates" in fields:
+            metrics.observe_batch(name, fields["candidates"])
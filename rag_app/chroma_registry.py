@@ -0,0 +1,102 @@
+"""
+Chroma 客户端注册表 - 进程内共享持久化客户端与集合句柄
+
+每个持久化目录只打开一次 PersistentClient（SQLite 连接与 HNSW 索引只加载一次），
+检索、入库与监视器共用同一个客户端。集合句柄按需打开并缓存，缓存数量受 LRU 上限约束。
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import chromadb
+
+from . import config, metrics
+
+
+class ChromaRegistry:
+    """
+    单个持久化目录对应的客户端与集合句柄缓存。
+    """
+
+    def __init__(self, path: str, cache_size: int = 8):
+        """
+        参数:
+            path (str): Chroma 持久化目录
+            cache_size (int): 缓存的集合句柄数量上限
+        """
+        self.path = path
+        self.cache_size = cache_size
+        self.client = chromadb.PersistentClient(path=path)
+        self._collections: "OrderedDict[str, tuple]" = OrderedDict()  # 名称 -> (句柄, embedding function)
+        self._lock = threading.Lock()
+
+    def collection(self, name: str, embedding_function=None, create: bool = False):
+        """
+        返回集合句柄，首次访问时打开并缓存。
+
+        不指定 embedding_function 时复用已缓存的句柄（包括其他调用方以 embedding function 打开的句柄），
+        因此监视器的文本查询与检索路径使用同一个 embedding 服务。
+
+        参数:
+            name (str): 集合名称
+            embedding_function: 绑定到句柄的 embedding function
+            create (bool): 集合不存在时是否创建
+
+        返回:
+            Collection: ChromaDB 集合句柄
+        """
+        with self._lock:
+            entry = self._collections.get(name)
+            if entry is not None and (embedding_function is None or entry[1] is embedding_function):
+                self._collections.move_to_end(name)
+                metrics.cache_access("chroma_collections", hit=True)
+                return entry[0]
+
+            metrics.cache_access("chroma_collections", hit=False)
+            kwargs: Dict[str, Any] = {"name": name}
+            if embedding_function is not None:
+                kwargs["embedding_function"] = embedding_function
+            if create:
+                handle = self.client.get_or_create_collection(**kwargs)
+            else:
+                handle = self.client.get_collection(**kwargs)
+            self._collections[name] = (handle, embedding_function)
+            self._collections.move_to_end(name)
+            while len(self._collections) > self.cache_size:
+                self._collections.popitem(last=False)
+            return handle
+
+    def invalidate(self, name: Optional[str] = None):
+        """丢弃缓存的集合句柄（集合被删除或重建后调用），name 为 None 时清空全部。"""
+        with self._lock:
+            if name is None:
+                self._collections.clear()
+            else:
+                self._collections.pop(name, None)
+
+    def cached_collections(self):
+        with self._lock:
+            return list(self._collections)
+
+
+_registries: Dict[str, ChromaRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(path: Optional[str] = None) -> ChromaRegistry:
+    """
+    返回进程内共享的注册表，同一持久化目录只会创建一个客户端。
+
+    参数:
+        path (str): Chroma 持久化目录，None 时使用 config.CHROMA_PATH
+    """
+    path = path or config.CHROMA_PATH
+    key = os.path.abspath(path)
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = ChromaRegistry(path, cache_size=getattr(config, "COLLECTION_CACHE_SIZE", 8))
+            _registries[key] = registry
+        return registry
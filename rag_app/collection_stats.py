@@ -0,0 +1,313 @@
+"""
+增量集合统计模块 - 为监视器维护知识库的聚合统计
+
+统计信息（文档数、内容长度分布、元数据字段画像）在入库与删除时增量更新，
+并以 JSON 持久化在 Chroma 数据目录旁，监视器读取统计时不再扫描整个集合。
+需要校正时可通过 rebuild 分页重算。
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from . import config
+from .sketches import FieldProfile
+
+# 与监视器原有的长度分布保持一致：(名称, 上界)，上界为 None 表示无上限
+LENGTH_BUCKETS = [
+    ("short (0-50)", 50),
+    ("medium (51-200)", 200),
+    ("long (201-500)", 500),
+    ("very_long (500+)", None),
+]
+
+
+def length_bucket(length: int) -> str:
+    """返回内容长度所属的分布区间名称。"""
+    for name, upper in LENGTH_BUCKETS:
+        if upper is None or length <= upper:
+            return name
+    return LENGTH_BUCKETS[-1][0]
+
+
+class CollectionStats:
+    """
+    单个集合的增量统计
+
+    - count / total_length: 文档数与内容总长度
+    - min_length / max_length: 仅在只有新增时保持精确，删除掉边界值后标记为不精确，重算后恢复
+    - length_buckets: 各长度区间的文档数
+    - fields: 元数据字段 -> FieldProfile（近似去重数 + Top-N 高频值，内存有界）
+
+    listeners 中的回调会在每次更新后以 listener(stats, delta) 调用，delta 为文档数变化量。
+    """
+
+    def __init__(self, collection_name: str, path: Optional[str] = None):
+        """
+        参数:
+            collection_name (str): 集合名称
+            path (str): 持久化文件路径，None 时只保存在内存中
+        """
+        self.collection_name = collection_name
+        self.path = path
+        self._lock = threading.RLock()
+        self._file_signature = None
+        self.listeners: List[Callable[["CollectionStats", int], None]] = []
+        self.reset()
+        self._load()
+
+    def reset(self):
+        """清空所有聚合值。"""
+        with self._lock:
+            self.count = 0
+            self.total_length = 0
+            self.min_length: Optional[int] = None
+            self.max_length: Optional[int] = None
+            self.minmax_exact = True
+            self.metadata_entries = 0
+            self.length_buckets = {name: 0 for name, _ in LENGTH_BUCKETS}
+            self.fields: Dict[str, FieldProfile] = {}
+            self.updated_at: Optional[str] = None
+
+    # ------------------------------------------------------------------
+    # 增量更新
+    # ------------------------------------------------------------------
+    def add(self, documents: Iterable[str], metadatas: Optional[Iterable[Dict]] = None, save: bool = True):
+        """
+        记录一批新入库的文档。
+
+        参数:
+            documents (Iterable[str]): 文档内容
+            metadatas (Iterable[Dict]): 对应的元数据
+            save (bool): 是否立即持久化
+        """
+        with self._lock:
+            before = self.count
+            for doc in documents:
+                length = len(doc or "")
+                self.count += 1
+                self.total_length += length
+                self.length_buckets[length_bucket(length)] += 1
+                self.min_length = length if self.min_length is None else min(self.min_length, length)
+                self.max_length = length if self.max_length is None else max(self.max_length, length)
+            for metadata in metadatas or []:
+                if not metadata:
+                    continue
+                self.metadata_entries += 1
+                for key, value in metadata.items():
+                    profile = self.fields.get(key)
+                    if profile is None:
+                        profile = self.fields[key] = self._new_profile()
+                    profile.add(value)
+            self._touch(save, self.count - before)
+
+    def remove(self, documents: Iterable[str], metadatas: Optional[Iterable[Dict]] = None, save: bool = True):
+        """
+        记录一批被删除的文档，参数与 add 相同。
+        """
+        with self._lock:
+            before = self.count
+            for doc in documents:
+                length = len(doc or "")
+                self.count = max(self.count - 1, 0)
+                self.total_length = max(self.total_length - length, 0)
+                bucket = length_bucket(length)
+                self.length_buckets[bucket] = max(self.length_buckets[bucket] - 1, 0)
+                if length in (self.min_length, self.max_length):
+                    self.minmax_exact = False
+            for metadata in metadatas or []:
+                if not metadata:
+                    continue
+                self.metadata_entries = max(self.metadata_entries - 1, 0)
+                for key, value in metadata.items():
+                    profile = self.fields.get(key)
+                    if profile is None:
+                        continue
+                    profile.remove(value)
+                    if profile.occurrences == 0:
+                        del self.fields[key]
+            if self.count == 0:
+                self.min_length = self.max_length = None
+                self.minmax_exact = True
+            self._touch(save, self.count - before)
+
+    def rebuild(self, collection, page_size: int = 1000,
+                progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """
+        分页扫描集合并重算全部统计，完成后整体替换当前聚合值。
+
+        参数:
+            collection: ChromaDB 集合
+            page_size (int): 每页读取的文档数
+            progress (Callable): 进度回调 progress(已处理数, 总数)
+
+        返回:
+            Dict: 重算后的统计快照
+        """
+        fresh = CollectionStats(self.collection_name)
+        total = collection.count()
+        offset = 0
+        while True:
+            page = collection.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            fresh.add(page.get("documents") or [], page.get("metadatas") or [], save=False)
+            offset += len(ids)
+            if progress:
+                progress(offset, total)
+            if len(ids) < page_size:
+                break
+        with self._lock:
+            before = self.count
+            for attr in ("count", "total_length", "min_length", "max_length", "minmax_exact",
+                         "metadata_entries", "length_buckets", "fields"):
+                setattr(self, attr, getattr(fresh, attr))
+            self._touch(True, self.count - before)
+        return self.snapshot()
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        返回与监视器 get_collection_stats 对齐的统计结构（不含集合名称与时间戳）。
+        """
+        monitor_config = config.MONITOR_CONFIG
+        with self._lock:
+            field_stats = {
+                field: profile.summary(top_n=monitor_config.get("top_values", 10),
+                                       max_value_length=monitor_config.get("max_value_length", 100))
+                for field, profile in self.fields.items()
+            }
+            if self.metadata_entries:
+                metadata_analysis = {
+                    "total_metadata_entries": self.metadata_entries,
+                    "field_statistics": field_stats,
+                    "available_fields": list(self.fields.keys())
+                }
+            else:
+                metadata_analysis = {"error": "没有元数据"}
+            return {
+                "total_documents": self.count,
+                "metadata_analysis": metadata_analysis,
+                "content_analysis": {
+                    "avg_length": self.total_length / self.count if self.count else 0,
+                    "min_length": self.min_length or 0,
+                    "max_length": self.max_length or 0,
+                    "min_max_exact": self.minmax_exact,
+                    "length_distribution": dict(self.length_buckets) if self.count else {}
+                },
+                "stats_updated_at": self.updated_at
+            }
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _new_profile() -> FieldProfile:
+        monitor_config = config.MONITOR_CONFIG
+        return FieldProfile(hll_precision=monitor_config.get("hll_precision", 12),
+                            top_capacity=monitor_config.get("heavy_hitter_capacity", 64))
+
+    def _touch(self, save: bool, delta: int = 0):
+        self.updated_at = datetime.now().isoformat()
+        if save:
+            self.save()
+        for listener in self.listeners:
+            try:
+                listener(self, delta)
+            except Exception as e:
+                print(f"集合统计监听回调出错: {e}")
+
+    def _signature(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _state(self) -> Dict[str, Any]:
+        return {
+            "collection_name": self.collection_name,
+            "count": self.count,
+            "total_length": self.total_length,
+            "min_length": self.min_length,
+            "max_length": self.max_length,
+            "minmax_exact": self.minmax_exact,
+            "metadata_entries": self.metadata_entries,
+            "length_buckets": self.length_buckets,
+            "fields": {field: profile.to_dict() for field, profile in self.fields.items()},
+            "updated_at": self.updated_at,
+        }
+
+    def _apply_state(self, state: Dict[str, Any]):
+        self.count = state["count"]
+        self.total_length = state["total_length"]
+        self.min_length = state["min_length"]
+        self.max_length = state["max_length"]
+        self.minmax_exact = state["minmax_exact"]
+        self.metadata_entries = state["metadata_entries"]
+        self.length_buckets.update(state["length_buckets"])
+        self.fields = {field: FieldProfile.from_dict(data) for field, data in state["fields"].items()}
+        self.updated_at = state["updated_at"]
+
+    def save(self):
+        """原子地写入持久化文件。"""
+        if self.path is None:
+            return
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_file = self.path + ".tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(self._state(), f, ensure_ascii=False)
+            os.replace(tmp_file, self.path)
+            self._file_signature = self._signature()
+
+    def _load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        self._apply_state(state)
+        self._file_signature = self._signature()
+
+    def refresh(self) -> bool:
+        """
+        若持久化文件被其他进程（如构建脚本）更新则重新加载。
+
+        返回:
+            bool: 是否重新加载
+        """
+        if self.path is None or not os.path.exists(self.path):
+            return False
+        with self._lock:
+            if self._signature() == self._file_signature:
+                return False
+            self.reset()
+            self._load()
+        return True
+
+
+_registry: Dict[str, CollectionStats] = {}
+_registry_lock = threading.Lock()
+
+
+def stats_path(collection_name: str) -> str:
+    """返回集合统计文件的路径（位于 Chroma 数据目录下）。"""
+    return os.path.join(config.MONITOR_CONFIG["stats_path"], f"{collection_name}.json")
+
+
+def get_collection_stats(collection_name: Optional[str] = None) -> CollectionStats:
+    """
+    返回进程内共享的集合统计对象，入库路径与监视器使用同一个实例。
+
+    参数:
+        collection_name (str): 集合名称，None 时使用默认集合
+    """
+    collection_name = collection_name or config.COLLECTION_NAME
+    with _registry_lock:
+        stats = _registry.get(collection_name)
+        if stats is None:
+            stats = CollectionStats(collection_name, stats_path(collection_name))
+            _registry[collection_name] = stats
+        return stats
@@ -11,11 +11,21 @@ EMBEDDING_PROVIDER = "ollama"  # 或者 "dashscope"
 # 数据和数据库路径
 CHROMA_PATH = "./chroma_db"
 COLLECTION_NAME = "exam_questions"
+COLLECTION_CACHE_SIZE = 8  # 进程内缓存的集合句柄数量上限（多集合场景按 LRU 淘汰）
 DATA_FILE = "questions.csv"
+# 采用“编号/题干/选项/答案”格式（每行一个选项）的题库文件，其余文件按 questions.csv 的格式读取
+STEM_OPTION_CSV_FILES = ["计算机组成原理客观题.csv", "数字逻辑客观题.csv"]
 
 # --- Ollama 配置 ---
+def _with_scheme(url: str) -> str:
+    """为省略协议的地址（如 "127.0.0.1:11434"）补上 http://。"""
+    url = url.strip().rstrip("/")
+    return url if "://" in url else f"http://{url}"
+
+
 OLLAMA_CONFIG = {
-    "host": "http://localhost:11434",
+    # 使用独立的 RAG_OLLAMA_HOST：OLLAMA_HOST 是 Ollama 服务自身的监听地址，常被设为 0.0.0.0 等不带协议的值
+    "host": _with_scheme(os.getenv("RAG_OLLAMA_HOST", "http://localhost:11434")),  # 压测时可指向 loadtest.stubs 的模拟服务
     "model": "dengcao/Qwen3-Embedding-0.6B:F16"  # 更新模型名称以匹配您运行的版本
 }
 
@@ -30,19 +40,177 @@ DASHSCOPE_CONFIG = {
 API_HOST = "0.0.0.0"
 API_PORT = 8000
 
+# --- API 服务启动配置 ---
+# 组件在首次使用时才初始化；服务启动后在后台预热 warmup 中的组件，/readyz 报告各组件状态
+LIFECYCLE_CONFIG = {
+    "warmup": ["rag", "monitor", "reranker"],  # 启动后后台预热的组件（可选 rag、reranker、monitor、kg、finetune）
+    "parallel_warmup": True,  # 各组件并行预热
+    "required": ["rag"]  # /readyz 返回 200 前必须就绪的组件
+}
+
+# --- 共享模型服务配置 ---
+# 多个 uvicorn 工作进程部署时，由 `python -m rag_app.model_server` 启动的一个进程持有 Qwen3-Reranker
+# （可选同时提供 embedding），API 进程通过 Unix socket 调用，每台机器只需一份模型
+MODEL_SERVER_CONFIG = {
+    "socket_path": os.getenv("RAG_MODEL_SERVER_SOCKET", ""),  # 为空时各进程自行加载模型
+    "serve_embeddings": False,  # embedding 也由模型服务计算
+    "request_timeout": 60,  # 单个请求的超时时间（秒）
+    "embed_workers": 4  # 模型服务中计算 embedding 的线程数
+}
+
+# --- 阻塞工作的线程池与接口并发配置 ---
+# 线程池排队数超过 max_queue 时返回 503；接口同时处理 max_concurrent 个请求，
+# 排队数超过 max_waiting 时返回 429，排队超过 wait_timeout 秒时返回 503
+EXECUTOR_CONFIG = {
+    "pools": {
+        "embedding": {"workers": 8, "max_queue": 64},  # 查询向量计算（Ollama / DashScope 网络 I/O）
+        "vector_search": {"workers": 4, "max_queue": 64},  # Chroma 检索、图谱扩展与预打分
+        "rerank": {"workers": 1, "max_queue": 16},  # 进程内 cross-encoder（工作进程池模式不占用此线程池）
+        "admin": {"workers": 2, "max_queue": 8}  # 监视统计、数据样本与微调步骤
+    },
+    "endpoints": {
+        "search": {"max_concurrent": 32, "max_waiting": 64, "wait_timeout": 5},
+        "search_reranked": {"max_concurrent": 8, "max_waiting": 16, "wait_timeout": 10},
+        "kg_query": {"max_concurrent": 4, "max_waiting": 8, "wait_timeout": 30},
+        "kg_insert": {"max_concurrent": 2, "max_waiting": 4, "wait_timeout": 30},
+        "monitor": {"max_concurrent": 4, "max_waiting": 8, "wait_timeout": 10},
+        "finetune": {"max_concurrent": 1, "max_waiting": 0, "wait_timeout": 0}
+    },
+    "retry_after": 1  # 429 / 503 响应的 Retry-After 秒数
+}
+
+# --- 检索请求配置 ---
+SEARCH_CONFIG = {
+    "coalesce": True,  # 相同的并发检索请求（规范化查询 + 参数相同）共享同一次计算
+    # 延迟预算：请求未指定 deadline_ms 时使用的默认预算（毫秒），None 表示不限时
+    "default_deadline_ms": None,
+    "finish_reserve_ms": 5,  # 为排序、组装与序列化响应保留的预算（毫秒）
+    "rerank_ms_per_candidate": 15,  # cross-encoder 每个候选耗时的初始估计（毫秒），之后按实测值滑动平均
+    "rerank_cost_smoothing": 0.2,  # 滑动平均中最新一次实测值的权重
+    "stale_cache_entries": 1024,  # 过期结果缓存的条目上限（预算内无法召回时返回），0 表示关闭
+    "stale_cache_ttl": 3600,  # 过期结果最长可返回多久之前的结果（秒），0 表示不限
+}
+
+# --- API 响应配置 ---
+RESPONSE_CONFIG = {
+    "compression_min_size": 1024,  # 超过该字节数的响应才压缩
+    "brotli": False,  # 可选：客户端支持时使用 brotli（需另行安装 brotli-asgi，未安装时仍用 gzip）
+    "brotli_quality": 4,  # brotli 压缩等级（0-11），较低的等级压缩更快
+    "gzip_level": 6,  # gzip 压缩等级（1-9）
+    "uncompressed_paths": ["/monitor/stream"]  # 不压缩的路径（SSE 需要逐条推送）
+}
+
 # --- 监视模块配置 ---
 MONITOR_CONFIG = {
     "enable_monitor": True,
     "default_sample_limit": 10,
-    "max_sample_limit": 50
+    "max_sample_limit": 50,
+    "stats_path": "./chroma_db/monitor_stats",  # 增量统计的持久化目录
+    "stats_rebuild_page_size": 1000,  # 后台重算统计时每页读取的文档数
+    "cursor_realign_window": 500,  # 游标锚点位置偏移时向前查找的窗口大小
+    "stream_queue_size": 100,  # /monitor/stream 每个连接缓冲的事件数，满时丢弃最旧事件
+    "stream_heartbeat_interval": 15,  # 无事件时发送保活注释的间隔（秒）
+    # 元数据画像（流式概要，内存与响应大小与文档数无关）
+    "hll_precision": 12,  # HyperLogLog精度，寄存器数为2^p，标准误差约1.6%
+    "heavy_hitter_capacity": 64,  # 每个字段跟踪的高频值数量上限
+    "top_values": 10,  # 每个字段返回的高频值数量
+    "max_value_length": 100  # 返回的字段取值最大长度，超出部分截断
+}
+
+# --- 知识图谱配置 ---
+KG_CONFIG = {
+    "working_dir": "./kg_storage",
+    "max_concurrency": 8,  # 同时执行的知识图谱插入/查询数量上限
+    "llm_max_async": 4,  # 实体/关系抽取时并发的LLM调用数
+    # 批量构建（KGBuilder）：流式切片、分批写入、可断点续建
+    "build_chunk_chars": 4000,  # 每个切片的最大字符数
+    "build_chunk_overlap": 200,  # 相邻切片的重叠字符数
+    "build_batch_size": 16,  # 每次写入LightRAG的切片数（CSV题库增量导入时为每批题目数）
+    "llm_model": "qwen-plus",  # 实体/关系抽取使用的LLM
+    "embedding_model": "text-embedding-v2",
+    "embedding_dim": 1536,  # text-embedding-v2 的向量维度
+    "max_token_size": 8192,
+    # LLM与embedding响应的持久化缓存：重建图谱时未变化的调用直接命中缓存
+    "response_cache": {
+        "path": "./llm_cache/kg_responses.sqlite",
+        "max_bytes": 512 * 1024 * 1024,  # 超出后按最近最少使用淘汰
+        "mode": os.getenv("KG_CACHE_MODE", "readwrite")  # readwrite / cache_only（离线回放，未命中即报错）/ off
+    },
+    # EMBEDDING_PROVIDER 为 "ollama" 时，实体/关系抽取与查询使用本地 Ollama（共享连接池的异步客户端）
+    "ollama": {
+        "llm_model": os.getenv("KG_OLLAMA_LLM_MODEL", "qwen3:8b"),
+        "embedding_model": OLLAMA_CONFIG["model"],
+        "embedding_dim": 1024,  # Qwen3-Embedding-0.6B 的向量维度
+        "max_connections": 16,  # 连接池大小（keep-alive 连接数）
+        "max_concurrency": 4,  # 同时发往 Ollama 的请求数上限
+        "embed_batch_size": 32,  # 每次 /api/embed 请求的文本数
+        "timeout": 300,  # 单次请求超时（秒），抽取长文本时生成较慢
+        "keep_alive": "10m",  # 两次请求之间模型保持加载的时间
+        "options": {"num_ctx": 32768}  # 默认生成参数，LightRAG 的抽取提示较长
+    },
+    # 查询结果缓存：按查询文本、模式和参数缓存 /kg/query 的结果，任何插入/删除都会清空
+    "query_cache": {
+        "max_entries": 256,  # 缓存的查询结果数量上限（LRU淘汰），0 表示关闭
+        "ttl": 600  # 结果有效期（秒），0 表示不过期
+    }
+}
+
+# --- 图谱增强检索配置（/search/reranked 的 graph 模式） ---
+GRAPH_RETRIEVAL_CONFIG = {
+    "storage_dir": KG_CONFIG["working_dir"],  # LightRAG 存储目录（题库需先通过 KGManager.aingest_csv 导入）
+    "index_path": os.path.join(KG_CONFIG["working_dir"], "graph_index.npz"),  # 题目-实体索引文件，图谱变化后自动重建
+    "seed_hits": 5,  # 作为扩展起点的向量命中数
+    "max_hops": 1,  # 扩展跳数（题目 -> 实体 -> 题目 为一跳）
+    "max_expansion": 20,  # 扩展加入的题目数量上限
+    "max_entity_questions": 50,  # 关联题目数超过该值的实体（如“对”“错”）不参与扩展
+    "hop_decay": 0.5  # 每多一跳图谱分数的衰减系数
+}
+
+# --- 近重复片段检测配置 ---
+DEDUP_CONFIG = {
+    "threshold": 0.95,  # 余弦相似度不低于该值的片段视为近重复
+    "neighbors": 10,  # 每个片段检查的近邻数量
+    "page_size": 500,  # 分块自连接时每页的片段数（决定工作内存）
+    "max_clusters": 100,  # 报告中返回的重复簇数量上限
+    "ingest_mode": None  # 入库去重：None 不去重，"drop" 丢弃重复片段，"merge" 丢弃并记录到保留片段的 merged_ids
+}
+
+# --- 查询日志配置 ---
+QUERY_LOG_CONFIG = {
+    "capacity": 1000,  # 最近查询环形缓冲区容量
+    "slow_threshold_ms": 500,  # 超过该耗时的查询记入慢查询日志
+    "slow_capacity": 200,  # 慢查询环形缓冲区容量
+    "slow_sample_rate": 1.0,  # 慢查询采样率（0-1）
+    "slow_max_per_minute": 60  # 每分钟最多写入的慢查询条数
 }
 
 # --- Qwen3-Reranker配置 ---
 RERANKER_CONFIG = {
     "model_name": "Qwen3-Reranker-4B:Q4_K_M",  # 默认使用量化模型
     "enable_reranker": True,
+    "lazy_load": True,  # 首次精排（或 API 启动后的后台预热）时才加载模型，纯向量检索无需等待
     "candidate_multiplier": 5,  # 精排时获取的候选结果倍数
-    "max_candidates": 30  # 最大候选结果数
+    "max_candidates": 30,  # 最大候选结果数
+    # 级联精排：向量召回 -> 预打分 -> cross-encoder
+    "prescore_candidates": 10,  # 预打分后送入cross-encoder的候选数上限
+    "prescore_lexical_weight": 0.5,  # 预打分中词法重叠得分的权重，其余为embedding相似度
+    "early_exit_margin": 0.25,  # 预打分第top_k名与第top_k+1名的分差不小于该值时跳过cross-encoder，None表示关闭
+    # 预分词存储：构建知识库时缓存片段的token ids，精排时不再重复分词
+    "pretokenize": True,
+    "token_store_path": "./chroma_db/rerank_tokens",
+    # 精排工作进程池：>0 时cross-encoder在独立进程中运行，API事件循环不被阻塞；0 表示在API进程内运行
+    "pool_workers": 0,
+    "pool_request_timeout": 60,  # 单个精排请求等待结果的超时时间（秒）
+    "pool_heartbeat_interval": 5,  # 工作进程心跳间隔（秒）
+    "pool_heartbeat_timeout": 30  # 超过该时间无心跳则重启工作进程（秒），也是单次前向推理的最长时间
+}
+
+
+# --- 指标配置 ---
+METRICS_CONFIG = {
+    "enabled": True,  # 关闭后所有指标记录立即返回，/metrics 返回空内容
+    "latency_buckets": [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0],  # 秒
+    "batch_buckets": [1, 2, 5, 10, 20, 50, 100, 200, 500]
 }
 
 
@@ -63,9 +231,4 @@ def validate_config():
         raise ValueError(f"错误: 无效的 EMBEDDING_PROVIDER: '{EMBEDDING_PROVIDER}'. "
                          f"请选择 'ollama' 或 'dashscope'.")
 
-# 在模块加载时执行验证
-try:
-    validate_config()
-except ValueError as e:
-    print(e)
-    exit(1) 
\ No newline at end of file
+# 验证不在模块导入时执行：RAGManager 初始化与 API 服务启动时调用 validate_config()，配置错误时抛出 ValueError
@@ -0,0 +1,61 @@
+"""
+延迟预算模块 - 检索请求的截止时间（deadline_ms）
+
+一个 Deadline 从请求开始计时，检索链路中的每个阶段（embedding、向量召回、精排）都只能
+使用剩余的预算。预算即将耗尽时由调用方降级：跳过或只对部分候选运行 cross-encoder，
+或返回同一查询最近一次的结果（过期缓存），而不是一直等待慢的 Ollama 或精排模型。
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """请求的延迟预算已用完且没有可用的降级结果。"""
+
+
+class Deadline:
+    """
+    单个请求的延迟预算；budget_ms 为 None 时不限时。
+    """
+
+    def __init__(self, budget_ms: Optional[float]):
+        self.budget_ms = budget_ms
+        self.started = time.perf_counter()
+
+    @property
+    def bounded(self) -> bool:
+        return self.budget_ms is not None
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def remaining_ms(self) -> float:
+        """剩余预算（毫秒），不限时返回无穷大。"""
+        if self.budget_ms is None:
+            return float("inf")
+        return self.budget_ms - self.elapsed_ms()
+
+    async def run(self, awaitable: Awaitable[T], stage: str, reserve_ms: float = 0.0) -> T:
+        """
+        在剩余预算内等待 awaitable，超时抛出 DeadlineExceeded。
+
+        参数:
+            awaitable: 要等待的协程或 Future（超时会被取消）
+            stage (str): 阶段名称（用于错误信息）
+            reserve_ms (float): 为后续阶段保留、本阶段不能使用的预算
+        """
+        if self.budget_ms is None:
+            return await awaitable
+        timeout = (self.remaining_ms() - reserve_ms) / 1000
+        if timeout <= 0:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise DeadlineExceeded(f"{stage} 阶段开始前延迟预算 {self.budget_ms} 毫秒已用完")
+        try:
+            return await asyncio.wait_for(awaitable, timeout=timeout)
+        except asyncio.TimeoutError as e:
+            raise DeadlineExceeded(f"{stage} 阶段超出延迟预算 {self.budget_ms} 毫秒") from e
@@ -0,0 +1,217 @@
+"""
+近重复片段检测模块 - 在已存储的 embedding 上做分块的相似度自连接
+
+做法：
+1. 分页读取集合中的 embedding（每次只保留一页）
+2. 每页作为一批查询向量，借助 Chroma 的 HNSW 索引取回每个片段的 k 个近邻及其 embedding
+3. 对 (页大小, k, 维度) 的近邻张量做一次向量化的余弦相似度计算
+4. 相似度不低于阈值的片段对用并查集合并为重复簇
+
+并查集只记录出现过重复关系的片段，内存随重复片段数量增长，与集合规模无关；
+每页的工作内存为 page_size * k * 维度 个浮点数。
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+
+class UnionFind:
+    """
+    稀疏并查集：只保存被 union 过的元素。
+    """
+
+    def __init__(self):
+        self.parent: Dict[str, str] = {}
+
+    def find(self, x: str) -> str:
+        parent = self.parent
+        root = x
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while x != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    def union(self, a: str, b: str):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return
+        # 以字典序较小的 ID 作为根，使簇的代表片段稳定
+        if rb < ra:
+            ra, rb = rb, ra
+        self.parent.setdefault(ra, ra)
+        self.parent[rb] = ra
+
+    def groups(self) -> Dict[str, List[str]]:
+        groups: Dict[str, List[str]] = {}
+        for x in list(self.parent):
+            groups.setdefault(self.find(x), []).append(x)
+        return groups
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """将向量按行归一化为单位长度（零向量保持为零）。"""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def neighbor_similarities(queries: np.ndarray, neighbor_embeddings: List) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    计算一批查询向量与各自近邻的余弦相似度。
+
+    参数:
+        queries (np.ndarray): (B, D) 的查询向量
+        neighbor_embeddings (List): 长度为 B 的列表，每项为该查询近邻的 embedding（数量可能不同）
+
+    返回:
+        Tuple[np.ndarray, np.ndarray]: (B, K) 的相似度矩阵与有效位置掩码
+    """
+    batch, dim = queries.shape
+    width = max((len(nb) for nb in neighbor_embeddings), default=0)
+    neighbors = np.zeros((batch, width, dim), dtype=np.float32)
+    mask = np.zeros((batch, width), dtype=bool)
+    for i, nb in enumerate(neighbor_embeddings):
+        if len(nb):
+            neighbors[i, :len(nb)] = np.asarray(nb, dtype=np.float32)
+            mask[i, :len(nb)] = True
+    sims = np.einsum("bkd,bd->bk", normalize_rows(neighbors), normalize_rows(queries))
+    return sims, mask
+
+
+def iter_embedding_pages(collection, page_size: int) -> Iterable[Tuple[List[str], np.ndarray]]:
+    """分页读取集合中的 (ids, embeddings)。"""
+    offset = 0
+    while True:
+        page = collection.get(limit=page_size, offset=offset, include=["embeddings"])
+        ids = page.get("ids") or []
+        if not ids:
+            return
+        yield ids, np.asarray(page["embeddings"], dtype=np.float32)
+        offset += len(ids)
+        if len(ids) < page_size:
+            return
+
+
+def find_duplicate_clusters(collection, threshold: float = 0.95, neighbors: int = 10, page_size: int = 500,
+                            max_clusters: int = 100, preview_length: int = 80,
+                            progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+    """
+    在整个集合上查找近重复片段簇。
+
+    参数:
+        collection: ChromaDB 集合
+        threshold (float): 判定为重复的余弦相似度阈值
+        neighbors (int): 每个片段检查的近邻数量
+        page_size (int): 每页读取与查询的片段数
+        max_clusters (int): 报告中返回的簇数量上限（按簇大小降序）
+        preview_length (int): 报告中片段内容预览的最大长度
+        progress (Callable): 进度回调 progress(已处理数, 总数)
+
+    返回:
+        Dict: 重复簇报告
+    """
+    total = collection.count()
+    uf = UnionFind()
+    best_similarity: Dict[str, float] = {}
+    processed = 0
+    for ids, embeddings in iter_embedding_pages(collection, page_size):
+        result = collection.query(query_embeddings=embeddings.tolist(),
+                                  n_results=min(neighbors + 1, total), include=["embeddings"])
+        sims, mask = neighbor_similarities(embeddings, result["embeddings"])
+        rows, cols = np.nonzero(mask & (sims >= threshold))
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            a, b = ids[row], result["ids"][row][col]
+            if a == b:
+                continue
+            uf.union(a, b)
+            sim = float(sims[row, col])
+            for x in (a, b):
+                if sim > best_similarity.get(x, -1.0):
+                    best_similarity[x] = sim
+        processed += len(ids)
+        if progress:
+            progress(processed, total)
+
+    groups = sorted(uf.groups().values(), key=lambda members: (-len(members), min(members)))
+    clusters = []
+    for members in groups[:max_clusters]:
+        members.sort()
+        page = collection.get(ids=members, include=["documents"])
+        documents = dict(zip(page["ids"], page.get("documents") or []))
+        clusters.append({
+            "representative": members[0],
+            "size": len(members),
+            "members": [{
+                "id": m,
+                "similarity": round(best_similarity.get(m, 0.0), 4),
+                "preview": (documents.get(m) or "")[:preview_length],
+            } for m in members],
+        })
+    duplicate_chunks = sum(len(g) for g in groups)
+    return {
+        "total_documents": total,
+        "threshold": threshold,
+        "neighbors": neighbors,
+        "cluster_count": len(groups),
+        "duplicate_chunks": duplicate_chunks,
+        # 每个簇保留一个代表片段，其余视为冗余
+        "redundant_chunks": duplicate_chunks - len(groups),
+        "clusters": clusters,
+        "clusters_truncated": len(groups) > max_clusters,
+    }
+
+
+def match_duplicates(collection, embeddings, threshold: float, groups: Optional[List[Optional[str]]] = None,
+                     group_of: Optional[Callable[[Dict], Optional[str]]] = None,
+                     neighbors: int = 10) -> List[Union[str, int, None]]:
+    """
+    为一批待入库片段查找已存在的重复片段（入库去重使用）。
+
+    同一批内部的重复也会被识别：批内靠后的片段会指向靠前的片段，调用方需按顺序处理。
+    同一分组（如同一道题的不同选项）内的片段互不视为重复：选项片段共享题干，相似度往往高于阈值。
+
+    参数:
+        collection: ChromaDB 集合
+        embeddings: (B, D) 的待入库片段 embedding
+        threshold (float): 余弦相似度阈值
+        groups (List): 每个片段所属的分组，None 表示不分组
+        group_of (Callable): 从已有片段的元数据得到其分组，与 groups 配合使用
+        neighbors (int): 分组时每个片段检查的已有近邻数量（最近的几个可能都是同组片段）
+
+    返回:
+        List: 每个片段对应的已有重复片段 ID（str）、批内更早的重复片段下标（int），无重复时为 None
+    """
+    queries = normalize_rows(embeddings)
+    matches: List[Union[str, int, None]] = [None] * len(queries)
+    if not len(queries):
+        return matches
+    groups = groups if groups is not None else [None] * len(queries)
+
+    count = collection.count()
+    if count > 0:
+        grouped = group_of is not None and any(g is not None for g in groups)
+        result = collection.query(query_embeddings=queries.tolist(),
+                                  n_results=min(neighbors, count) if grouped else 1,
+                                  include=["embeddings", "metadatas"] if grouped else ["embeddings"])
+        sims, mask = neighbor_similarities(queries, result["embeddings"])
+        for i in range(len(queries)):
+            for k in range(sims.shape[1]):
+                if not mask[i, k] or sims[i, k] < threshold:
+                    continue
+                if grouped and groups[i] is not None and group_of(result["metadatas"][i][k] or {}) == groups[i]:
+                    continue
+                matches[i] = result["ids"][i][k]
+                break
+
+    # 批内自连接：上三角部分即“与之前的片段”比较
+    intra = queries @ queries.T
+    for i in range(1, len(queries)):
+        if matches[i] is not None:
+            continue
+        earlier = [j for j in np.nonzero(intra[i, :i] >= threshold)[0]
+                   if groups[i] is None or groups[j] != groups[i]]
+        if earlier:
+            matches[i] = int(earlier[0])
+    return matches
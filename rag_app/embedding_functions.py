@@ -3,6 +3,8 @@ import dashscope
 from chromadb import Documents, EmbeddingFunction, Embeddings
 from http import HTTPStatus
 
+from . import metrics
+
 class DashScopeEmbeddingFunction(EmbeddingFunction):
     """
     一个自定义的 ChromaDB Embedding 函数，用于调用阿里云 DashScope 的 text-embedding-v4 模型。
@@ -54,4 +56,70 @@ class DashScopeEmbeddingFunction(EmbeddingFunction):
                 print(f"DashScope API 调用失败: Code: {response.code}, Message: {response.message}")
                 raise Exception(f"DashScope API 错误: {response.message}")
 
-        return embeddings 
\ No newline at end of file
+        return embeddings 
+
+
+class InstrumentedEmbeddingFunction(EmbeddingFunction):
+    """
+    包装任意 ChromaDB Embedding 函数，记录每次调用的耗时、批大小与错误数。
+    """
+    def __init__(self, inner: EmbeddingFunction, provider: str):
+        self._inner = inner
+        self._provider = provider
+
+    def __call__(self, input: Documents) -> Embeddings:
+        metrics.observe_batch("embedding", len(input), provider=self._provider)
+        with metrics.timer("embedding", provider=self._provider):
+            return self._inner(input)
+
+
+class RemoteEmbeddingFunction(EmbeddingFunction):
+    """
+    通过共享模型服务（rag_app.model_server）计算 embedding 的 ChromaDB Embedding 函数。
+
+    模型服务使用同一提供商计算向量，因此 name()/get_config() 等标识取自本地的提供商函数，
+    与 ChromaDB 为集合持久化的 embedding function 一致，本地与远程两种方式可用于同一个集合。
+    """
+    def __init__(self, client, identity: EmbeddingFunction):
+        self._client = client
+        self._identity = identity
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return self._client.embed(list(input))
+
+    def name(self) -> str:
+        return self._identity.name()
+
+    def get_config(self) -> dict:
+        return self._identity.get_config()
+
+    def is_legacy(self) -> bool:
+        return self._identity.is_legacy()
+
+    def default_space(self):
+        return self._identity.default_space()
+
+    def supported_spaces(self):
+        return self._identity.supported_spaces()
+
+
+def create_embedding_function(provider: str) -> EmbeddingFunction:
+    """
+    根据 embedding 服务提供商创建 ChromaDB Embedding 函数（RAGManager 与模型服务共用）。
+    """
+    from chromadb.utils import embedding_functions as chroma_ef
+
+    from . import config
+
+    if provider == "ollama":
+        return chroma_ef.OllamaEmbeddingFunction(
+            url=f"{config.OLLAMA_CONFIG['host']}/api/embeddings",
+            model_name=config.OLLAMA_CONFIG['model'],
+        )
+    if provider == "dashscope":
+        return DashScopeEmbeddingFunction(
+            api_key=config.DASHSCOPE_CONFIG['api_key'],
+            model=config.DASHSCOPE_CONFIG['model'],
+            dimensions=config.DASHSCOPE_CONFIG['dimensions']
+        )
+    raise ValueError(f"无效的 EMBEDDING_PROVIDER: {provider}")
@@ -0,0 +1,104 @@
+"""
+事件推送模块 - 通过 Server-Sent Events 向监视页面推送增量更新
+
+事件来自服务端的内存状态（增量统计、后台任务、查询日志），不会扫描 Chroma。
+每个事件只序列化一次，然后分发给所有订阅者的有界队列；没有订阅者时 publish
+立即返回。慢速客户端的队列满时丢弃最旧的事件，不会拖慢发布方。
+"""
+
+import asyncio
+import itertools
+import json
+import threading
+from typing import Any, AsyncIterator, Iterable, Set, Tuple
+
+
+def format_sse(event: str, data: Any, event_id: int = None) -> str:
+    """将一个事件编码为 SSE 文本帧。"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    lines.extend(f"data: {line}" for line in payload.splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
+
+
+class EventHub:
+    """
+    进程内的事件广播器，可从任意线程发布，由 asyncio 订阅者消费。
+    """
+
+    def __init__(self, queue_size: int = 100, heartbeat_interval: float = 15):
+        """
+        参数:
+            queue_size (int): 每个订阅者缓冲的事件数上限
+            heartbeat_interval (float): 无事件时发送保活注释的间隔（秒）
+        """
+        self.queue_size = queue_size
+        self.heartbeat_interval = heartbeat_interval
+        self._subscribers: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.published = 0
+        self.dropped = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event: str, data: Any):
+        """
+        发布一个事件，可在任意线程中调用。
+
+        参数:
+            event (str): 事件类型（如 stats、job、query）
+            data (Any): 可 JSON 序列化的事件内容
+        """
+        if not self._subscribers:
+            return
+        frame = format_sse(event, data, next(self._ids))
+        with self._lock:
+            subscribers = list(self._subscribers)
+        self.published += 1
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, frame)
+            except RuntimeError:
+                # 事件循环已关闭
+                self._discard(loop, queue)
+
+    def _offer(self, queue: asyncio.Queue, frame: str):
+        if queue.full():
+            queue.get_nowait()
+            self.dropped += 1
+        queue.put_nowait(frame)
+
+    def _discard(self, loop, queue):
+        with self._lock:
+            self._subscribers.discard((loop, queue))
+
+    async def stream(self, initial: Iterable[str] = ()) -> AsyncIterator[str]:
+        """
+        订阅事件流，先发送 initial 中的帧，然后持续转发新事件，断开时自动取消订阅。
+
+        参数:
+            initial (Iterable[str]): 连接建立时先发送的 SSE 帧（如当前快照）
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add((loop, queue))
+        try:
+            yield "retry: 3000\n\n"
+            for frame in initial:
+                yield frame
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), timeout=self.heartbeat_interval)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield frame
+        finally:
+            self._discard(loop, queue)
@@ -0,0 +1,220 @@
+"""
+执行器模块 - 阻塞工作的独立线程池、接口并发上限与过载保护
+
+API 的处理函数运行在事件循环上，任何阻塞调用（embedding 网络请求、Chroma 检索、
+进程内 cross-encoder、监视统计、微调步骤）都会拖住整个服务。这里为每类阻塞工作提供
+一个独立、有界的线程池，并为每个接口提供并发上限：
+
+- 线程池（EXECUTOR_CONFIG["pools"]）：排队的任务数超过 max_queue 时立即拒绝（503），
+  不会在事件循环或线程池中无限堆积
+- 接口并发（EXECUTOR_CONFIG["endpoints"]）：同时处理的请求数超过 max_concurrent 时排队，
+  排队数超过 max_waiting 时立即拒绝（429），排队超过 wait_timeout 秒时拒绝（503）
+
+被拒绝的请求抛出 Overloaded，由 main.py 转换为带 Retry-After 的 HTTP 响应，
+并计入 rag_requests_shed_total 指标。
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+
+from . import config, metrics
+
+
+class Overloaded(Exception):
+    """请求因过载被拒绝。status_code 为 429（接口排队已满）或 503（线程池已满或排队超时）。"""
+
+    def __init__(self, message: str, status_code: int = 503, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after if retry_after is not None else _config().get("retry_after", 1)
+
+
+def _config() -> Dict[str, Any]:
+    return getattr(config, "EXECUTOR_CONFIG", {})
+
+
+class BoundedExecutor:
+    """
+    线程数与排队长度都有上限的线程池。
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        """
+        参数:
+            name (str): 线程池名称（用于线程名与指标标签）
+            max_workers (int): 工作线程数
+            max_queue (int): 所有线程都忙时允许排队的任务数
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-pool")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """提交任务；排队已满时抛出 Overloaded(503)。"""
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                metrics.record_shed("pool", self.name)
+                raise Overloaded(f"线程池 {self.name} 已满（{self._pending} 个任务）", 503)
+            self._pending += 1
+        queued_at = time.perf_counter()
+
+        def task():
+            metrics.observe_latency("queue_wait", time.perf_counter() - queued_at, pool=self.name)
+            return fn(*args, **kwargs)
+
+        try:
+            future = self._executor.submit(task)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """在线程池中执行 fn 并等待结果，不阻塞事件循环。等待被取消时，尚未开始的任务会被撤销。"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def _release(self, _future: Optional[Future] = None):
+        with self._lock:
+            self._pending -= 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            pending = self._pending
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": min(pending, self.max_workers),
+            "queued": max(0, pending - self.max_workers),
+        }
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+class ConcurrencyLimiter:
+    """
+    单个接口的并发上限与排队上限。
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_waiting: int, wait_timeout: Optional[float] = None):
+        """
+        参数:
+            name (str): 接口名称
+            max_concurrent (int): 同时处理的请求数
+            max_waiting (int): 允许排队等待的请求数，超出时返回 429
+            wait_timeout (float): 最长排队秒数，超时返回 503；None 表示一直等待
+        """
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.active = 0
+        self.waiting = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _bind(self) -> asyncio.Semaphore:
+        # 信号量绑定到使用它的事件循环（测试或脚本中可能先后使用多个事件循环）
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+            self._loop = loop
+            self.active = self.waiting = 0
+        return self._semaphore
+
+    @asynccontextmanager
+    async def acquire(self):
+        """占用一个并发名额；排队已满时抛出 Overloaded(429)，排队超时抛出 Overloaded(503)。"""
+        semaphore = self._bind()
+        if semaphore.locked():
+            if self.waiting >= self.max_waiting:
+                metrics.record_shed("endpoint", self.name)
+                raise Overloaded(f"接口 {self.name} 繁忙（{self.active} 个处理中，{self.waiting} 个排队）", 429)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(semaphore.acquire(), timeout=self.wait_timeout)
+            except asyncio.TimeoutError:
+                metrics.record_shed("endpoint_timeout", self.name)
+                raise Overloaded(f"接口 {self.name} 排队超过 {self.wait_timeout} 秒", 503)
+            finally:
+                self.waiting -= 1
+        else:
+            await semaphore.acquire()
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            semaphore.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {"max_concurrent": self.max_concurrent, "max_waiting": self.max_waiting,
+                "active": self.active, "waiting": self.waiting}
+
+
+_executors: Dict[str, BoundedExecutor] = {}
+_limiters: Dict[str, ConcurrencyLimiter] = {}
+_registry_lock = threading.Lock()
+
+
+def get_executor(name: str) -> BoundedExecutor:
+    """返回名为 name 的线程池（按 EXECUTOR_CONFIG["pools"] 首次使用时创建）。"""
+    executor = _executors.get(name)
+    if executor is None:
+        with _registry_lock:
+            executor = _executors.get(name)
+            if executor is None:
+                settings = _config().get("pools", {}).get(name, {})
+                executor = _executors[name] = BoundedExecutor(
+                    name, settings.get("workers", 4), settings.get("max_queue", 64))
+    return executor
+
+
+async def run_in(pool: str, fn: Callable, *args, **kwargs):
+    """在名为 pool 的线程池中执行阻塞函数 fn。"""
+    return await get_executor(pool).run(fn, *args, **kwargs)
+
+
+def limit(endpoint: str):
+    """
+    返回接口并发上限的异步上下文管理器。
+
+    使用示例：
+        async with executors.limit("search"):
+            ...
+    """
+    limiter = _limiters.get(endpoint)
+    if limiter is None:
+        with _registry_lock:
+            limiter = _limiters.get(endpoint)
+            if limiter is None:
+                settings = _config().get("endpoints", {}).get(endpoint, {})
+                limiter = _limiters[endpoint] = ConcurrencyLimiter(
+                    endpoint, settings.get("max_concurrent", 16), settings.get("max_waiting", 32),
+                    settings.get("wait_timeout"))
+    return limiter.acquire()
+
+
+def stats() -> Dict[str, Dict]:
+    """返回各线程池与接口的当前负载。"""
+    return {
+        "pools": {name: e.stats() for name, e in _executors.items()},
+        "endpoints": {name: l.stats() for name, l in _limiters.items()},
+    }
+
+
+def shutdown():
+    """关闭所有线程池（撤销尚未开始的任务）。"""
+    with _registry_lock:
+        for executor in _executors.values():
+            executor.shutdown()
+        _executors.clear()
+        _limiters.clear()
@@ -0,0 +1,285 @@
+"""
+图谱索引模块 - 连接向量库中的题目与 LightRAG 知识图谱中的实体
+
+从 LightRAG 的存储文件（graph_chunk_entity_relation.graphml 与 kv_store_text_chunks.json）
+预先计算一个紧凑的双向索引：
+
+- 行：知识图谱中由题库导入的题目切片（文档 ID 由 kg_ingest 生成，可解析出来源文件与题目编号）
+- 题目 -> 实体、实体 -> 题目 两个 CSR 数组（int32），以及每个实体的 IDF 权重
+
+检索时按题目编号定位向量命中对应的行，沿“题目 -> 实体 -> 题目”在跳数预算内扩展，
+全部操作都是数组切片，扩展只需几毫秒。索引保存为 npz 文件，图谱文件变化后自动重建。
+"""
+
+import json
+import os
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from . import config
+from .kg_ingest import parse_doc_id
+
+GRAPH_FILE = "graph_chunk_entity_relation.graphml"
+CHUNKS_FILE = "kv_store_text_chunks.json"
+SOURCE_SEP = "<SEP>"  # LightRAG 在 source_id 中分隔多个切片 ID 的分隔符
+_GRAPHML_NS = "{http://graphml.graphdrawing.org/xmlns}"
+
+
+def metadata_field(source: str) -> str:
+    """返回题库来源在向量库元数据中记录题目编号的字段名。"""
+    return "编号" if f"{source}.csv" in config.STEM_OPTION_CSV_FILES else "question_id"
+
+
+def _stem(content: str) -> str:
+    first_line = content.split("\n", 1)[0]
+    return first_line[len("题目："):] if first_line.startswith("题目：") else first_line
+
+
+def _signature(storage_dir: str) -> Dict[str, List[int]]:
+    signature = {}
+    for name in (GRAPH_FILE, CHUNKS_FILE):
+        stat = os.stat(os.path.join(storage_dir, name))
+        signature[name] = [stat.st_size, stat.st_mtime_ns]
+    return signature
+
+
+def _csr(pairs: Iterable[Tuple[int, int]], rows: int) -> Tuple[np.ndarray, np.ndarray]:
+    """把 (行, 列) 对转换为 CSR 的 indptr 与 indices（每行的列去重并排序）。"""
+    buckets: List[set] = [set() for _ in range(rows)]
+    for row, col in pairs:
+        buckets[row].add(col)
+    indptr = np.zeros(rows + 1, dtype=np.int32)
+    indptr[1:] = np.cumsum([len(b) for b in buckets])
+    indices = np.array([c for b in buckets for c in sorted(b)], dtype=np.int32)
+    return indptr, indices
+
+
+class GraphIndex:
+    """
+    题目与实体之间的紧凑双向索引。
+    """
+
+    def __init__(self, sources: List[str], qids: List[str], stems: List[str], q_indptr: np.ndarray,
+                 q_entities: np.ndarray, e_indptr: np.ndarray, e_questions: np.ndarray,
+                 entity_weight: np.ndarray, signature: Optional[Dict] = None):
+        self.sources = sources
+        self.qids = qids
+        self.stems = stems
+        self.q_indptr = q_indptr
+        self.q_entities = q_entities
+        self.e_indptr = e_indptr
+        self.e_questions = e_questions
+        self.entity_weight = entity_weight
+        self.entity_df = np.diff(e_indptr)
+        self.signature = signature or {}
+        self._rows: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        for row, (source, qid) in enumerate(zip(sources, qids)):
+            self._rows[(metadata_field(source), qid)].append(row)
+
+    @property
+    def num_questions(self) -> int:
+        return len(self.qids)
+
+    @property
+    def num_entities(self) -> int:
+        return len(self.entity_weight)
+
+    @classmethod
+    def build(cls, storage_dir: str) -> "GraphIndex":
+        """
+        从 LightRAG 存储目录构建索引。
+
+        参数:
+            storage_dir (str): LightRAG 的工作目录（含 graphml 与文本切片 KV 文件）
+        """
+        signature = _signature(storage_dir)
+        with open(os.path.join(storage_dir, CHUNKS_FILE), "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+
+        chunk_rows: Dict[str, int] = {}
+        sources, qids, stems = [], [], []
+        for chunk_id, chunk in chunks.items():
+            parsed = parse_doc_id(chunk.get("full_doc_id", ""))
+            if parsed is None:
+                continue
+            chunk_rows[chunk_id] = len(qids)
+            sources.append(parsed[0])
+            qids.append(parsed[1])
+            stems.append(_stem(chunk.get("content", "")).strip())
+
+        pairs = []
+        num_entities = 0
+        source_key = None
+        for _, elem in ET.iterparse(os.path.join(storage_dir, GRAPH_FILE)):
+            if elem.tag == _GRAPHML_NS + "key" and elem.get("for") == "node" and elem.get("attr.name") == "source_id":
+                source_key = elem.get("id")
+            elif elem.tag == _GRAPHML_NS + "node":
+                rows = set()
+                for data in elem.findall(_GRAPHML_NS + "data"):
+                    if data.get("key") == source_key and data.text:
+                        rows = {chunk_rows[c] for c in data.text.split(SOURCE_SEP) if c in chunk_rows}
+                if rows:
+                    pairs.extend((row, num_entities) for row in rows)
+                    num_entities += 1
+                elem.clear()
+
+        q_indptr, q_entities = _csr(pairs, len(qids))
+        e_indptr, e_questions = _csr(((e, q) for q, e in pairs), num_entities)
+        df = np.diff(e_indptr).astype(np.float32)
+        entity_weight = np.log1p(max(len(qids), 1) / np.maximum(df, 1.0)).astype(np.float32)
+        return cls(sources, qids, stems, q_indptr, q_entities, e_indptr, e_questions, entity_weight, signature)
+
+    def save(self, path: str):
+        meta = {"sources": self.sources, "qids": self.qids, "stems": self.stems, "signature": self.signature}
+        # 每次保存使用独立的临时文件，多个进程同时重建时不会互相覆盖
+        fd, tmp_file = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                        dir=os.path.dirname(path) or ".")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, q_indptr=self.q_indptr, q_entities=self.q_entities, e_indptr=self.e_indptr,
+                         e_questions=self.e_questions, entity_weight=self.entity_weight,
+                         meta=np.array(json.dumps(meta, ensure_ascii=False)))
+            os.replace(tmp_file, path)
+        except BaseException:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "GraphIndex":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            return cls(meta["sources"], meta["qids"], meta["stems"], data["q_indptr"], data["q_entities"],
+                       data["e_indptr"], data["e_questions"], data["entity_weight"], meta["signature"])
+
+    def is_current(self, storage_dir: str) -> bool:
+        """图谱文件自索引构建以来是否未发生变化。"""
+        try:
+            return self.signature == _signature(storage_dir)
+        except FileNotFoundError:
+            return False
+
+    @classmethod
+    def load_or_build(cls, storage_dir: str, index_path: str) -> Optional["GraphIndex"]:
+        """
+        读取已保存的索引；图谱文件在保存后发生变化（或索引不存在）时重新构建并保存。
+        知识图谱尚未构建时返回 None。
+        """
+        try:
+            signature = _signature(storage_dir)
+        except FileNotFoundError:
+            return None
+        if os.path.exists(index_path):
+            index = cls.load(index_path)
+            if index.signature == signature:
+                return index
+        index = cls.build(storage_dir)
+        index.save(index_path)
+        print(f"图谱索引已重建: {index.num_questions} 个题目, {index.num_entities} 个实体。")
+        return index
+
+    def rows_for(self, field: str, qid: str, content: str = "") -> List[int]:
+        """
+        返回向量库中一条记录对应的索引行。
+
+        参数:
+            field (str): 记录题目编号的元数据字段（question_id 或 编号）
+            qid (str): 题目编号
+            content (str): 记录的文本；同一编号出现在多个题库时用题干区分
+        """
+        rows = self._rows.get((field, str(qid)), [])
+        if len(rows) > 1 and content:
+            matched = [r for r in rows if self.stems[r] and self.stems[r] in content]
+            return matched or rows
+        return rows
+
+    def expand(self, seeds: Dict[int, float], max_hops: int = 1, max_expansion: int = 20,
+               max_entity_questions: int = 50, hop_decay: float = 0.5) -> List[Tuple[int, float]]:
+        """
+        从种子题目出发，沿“题目 -> 实体 -> 题目”在跳数预算内扩展。
+
+        参数:
+            seeds (Dict[int, float]): 种子行及其权重
+            max_hops (int): 最大跳数
+            max_expansion (int): 返回的扩展题目数量上限
+            max_entity_questions (int): 关联题目数超过该值的实体（如“对”“错”）不参与扩展
+            hop_decay (float): 每多一跳分数乘以的衰减系数
+
+        返回:
+            List[Tuple[int, float]]: (行, 图谱分数)，按分数降序
+        """
+        visited = set(seeds)
+        scores: Dict[int, float] = {}
+        frontier = dict(seeds)
+        for hop in range(max_hops):
+            entity_scores: Dict[int, float] = defaultdict(float)
+            for row, weight in frontier.items():
+                for entity in self.q_entities[self.q_indptr[row]:self.q_indptr[row + 1]]:
+                    if self.entity_df[entity] <= max_entity_questions:
+                        entity_scores[int(entity)] += weight * float(self.entity_weight[entity])
+            reached: Dict[int, float] = defaultdict(float)
+            decay = hop_decay ** hop
+            for entity, score in entity_scores.items():
+                for row in self.e_questions[self.e_indptr[entity]:self.e_indptr[entity + 1]]:
+                    row = int(row)
+                    if row not in visited:
+                        reached[row] += score * decay
+            if not reached:
+                break
+            frontier = dict(sorted(reached.items(), key=lambda kv: kv[1], reverse=True)[:max_expansion])
+            for row, score in frontier.items():
+                scores[row] = scores.get(row, 0.0) + score
+            visited.update(frontier)
+        return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:max_expansion]
+
+
+class GraphIndexLoader:
+    """
+    检索线程共享的图谱索引：图谱文件变化后只由一个线程重建。
+
+    重建失败（如入库时 LightRAG 正在写入 graphml）时继续返回上一版索引，
+    直到图谱文件再次变化才重试，检索不会因此失败。
+    """
+
+    def __init__(self, storage_dir: str, index_path: str):
+        self.storage_dir = storage_dir
+        self.index_path = index_path
+        self._index: Optional[GraphIndex] = None
+        self._failed_signature: Optional[Dict] = None
+        self._missing_logged = False
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[GraphIndex]:
+        """返回当前的索引；知识图谱尚未构建时返回 None。"""
+        index = self._index
+        if index is not None and index.is_current(self.storage_dir):
+            return index
+        with self._lock:
+            index = self._index
+            if index is not None and index.is_current(self.storage_dir):
+                return index
+            try:
+                signature = _signature(self.storage_dir)
+            except FileNotFoundError:
+                if not self._missing_logged:
+                    print("知识图谱尚未构建，graph 模式只使用向量召回。")
+                    self._missing_logged = True
+                self._index = None
+                return None
+            if signature == self._failed_signature:
+                return index
+            try:
+                self._index = GraphIndex.load_or_build(self.storage_dir, self.index_path)
+            except Exception as e:
+                self._failed_signature = signature
+                fallback = "上一版索引" if index is not None else "纯向量召回"
+                print(f"图谱索引重建失败（图谱文件可能正在写入），继续使用{fallback}: {e}")
+                return index
+            self._failed_signature = None
+            self._missing_logged = False
+            return self._index
@@ -0,0 +1,116 @@
+"""
+后台任务模块 - 为监视器中耗时的分析任务（如统计重算）提供线程化执行与进度查询
+"""
+
+import threading
+import traceback
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+
+class BackgroundJob:
+    """
+    单个后台任务的状态。任务函数通过 update_progress 汇报进度。
+    """
+
+    def __init__(self, name: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.status = "pending"
+        self.processed = 0
+        self.total: Optional[int] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now().isoformat()
+        self.finished_at: Optional[str] = None
+        self.listeners: List[Callable[["BackgroundJob"], None]] = []
+
+    def update_progress(self, processed: int, total: Optional[int] = None):
+        """更新已处理数量与总量，并通知监听者。"""
+        self.processed = processed
+        if total is not None:
+            self.total = total
+        self._notify()
+
+    def _notify(self):
+        for listener in self.listeners:
+            try:
+                listener(self)
+            except Exception as e:
+                print(f"后台任务监听回调出错: {e}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "processed": self.processed,
+            "total": self.total,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    后台任务管理器
+
+    同名任务同一时间只会运行一个；重复提交时返回正在运行的任务。
+    """
+
+    def __init__(self, max_history: int = 50):
+        self._jobs: Dict[str, BackgroundJob] = {}
+        self._lock = threading.Lock()
+        self._max_history = max_history
+        self.listeners: List[Callable[[BackgroundJob], None]] = []
+
+    def start(self, name: str, func: Callable[[BackgroundJob], Any]) -> BackgroundJob:
+        """
+        在后台线程中运行 func(job)，返回值作为任务结果。
+
+        参数:
+            name (str): 任务名称，同名任务不会并发运行
+            func (Callable): 任务函数，接收 BackgroundJob 用于汇报进度
+
+        返回:
+            BackgroundJob: 新建或正在运行的同名任务
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if job.name == name and job.status in ("pending", "running"):
+                    return job
+            job = BackgroundJob(name)
+            job.listeners = list(self.listeners)
+            self._jobs[job.id] = job
+            self._trim()
+
+        def run():
+            job.status = "running"
+            job._notify()
+            try:
+                job.result = func(job)
+                job.status = "completed"
+            except Exception as e:
+                job.error = f"{type(e).__name__}: {e}"
+                job.status = "failed"
+                traceback.print_exc()
+            job.finished_at = datetime.now().isoformat()
+            job._notify()
+
+        threading.Thread(target=run, name=f"job-{name}", daemon=True).start()
+        return job
+
+    def get(self, job_id: str) -> Optional[BackgroundJob]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [job.to_dict() for job in self._jobs.values()]
+
+    def _trim(self):
+        finished = [j for j in self._jobs.values() if j.status in ("completed", "failed")]
+        while len(self._jobs) > self._max_history and finished:
+            self._jobs.pop(finished.pop(0).id, None)
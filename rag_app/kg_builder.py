@@ -0,0 +1,218 @@
+"""
+Batched knowledge-graph construction for large corpora.
+
+The input file is streamed into overlapping chunks (never loaded as a whole),
+chunks are grouped into batches and each batch is handed to LightRAG in a single
+``ainsert`` call, which runs entity/relation extraction for the batch with up to
+``KG_CONFIG["llm_max_async"]`` concurrent LLM calls and merges the results into
+the graph store. After every batch the number of committed chunks is written to
+a progress file, so an interrupted build resumes where it stopped.
+"""
+
+import codecs
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from . import config
+
+# Preferred split points, tried in order when a chunk has to be cut
+_BREAKS = ("\n\n", "\n", "。", "！", "？", ". ", "! ", "? ")
+
+
+def _cut_point(buffer: str, chunk_chars: int) -> int:
+    """Return where to cut ``buffer`` so the chunk ends on a natural boundary if possible."""
+    window_start = chunk_chars // 2
+    for sep in _BREAKS:
+        pos = buffer.rfind(sep, window_start, chunk_chars)
+        if pos != -1:
+            return pos + len(sep)
+    return chunk_chars
+
+
+def iter_chunks(file_path: str, chunk_chars: int = 4000, overlap: int = 200,
+                read_size: int = 1 << 16) -> Iterator[Tuple[int, str, float]]:
+    """
+    Stream a UTF-8 text file into overlapping chunks.
+
+    Args:
+        file_path (str): Path to the text file
+        chunk_chars (int): Maximum characters per chunk
+        overlap (int): Characters repeated at the start of the next chunk
+        read_size (int): Bytes read from disk at a time
+
+    Yields:
+        (index, text, fraction_read): chunk index, chunk text and the fraction of the file read so far
+    """
+    if overlap >= chunk_chars:
+        raise ValueError("overlap must be smaller than chunk_chars")
+    size = os.path.getsize(file_path) or 1
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    carried = 0  # leading characters of buffer already emitted as overlap
+    index = 0
+    bytes_read = 0
+    with open(file_path, "rb") as f:
+        while True:
+            raw = f.read(read_size)
+            bytes_read += len(raw)
+            buffer += decoder.decode(raw, final=not raw)
+            while len(buffer) >= chunk_chars:
+                cut = _cut_point(buffer, chunk_chars)
+                text = buffer[:cut].strip()
+                if text:
+                    yield index, text, bytes_read / size
+                    index += 1
+                keep_from = max(cut - overlap, 1)
+                carried = cut - keep_from
+                buffer = buffer[keep_from:]
+            if not raw:
+                if len(buffer) > carried and buffer[carried:].strip():
+                    yield index, buffer.strip(), 1.0
+                return
+
+
+class KGBuilder:
+    """
+    Build a knowledge graph from a large text file in resumable batches.
+    """
+
+    def __init__(self, kg_manager, chunk_chars: Optional[int] = None, chunk_overlap: Optional[int] = None,
+                 batch_size: Optional[int] = None, progress_dir: Optional[str] = None,
+                 on_progress: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        Args:
+            kg_manager: KGManager whose ``ainsert`` receives each batch
+            chunk_chars (int): Maximum characters per chunk
+            chunk_overlap (int): Characters of overlap between consecutive chunks
+            batch_size (int): Chunks inserted per LightRAG call
+            progress_dir (str): Directory for resume files
+            on_progress (Callable): Called with a progress dict after every batch
+        """
+        kg_config = config.KG_CONFIG
+        self.kg_manager = kg_manager
+        self.chunk_chars = chunk_chars or kg_config.get("build_chunk_chars", 4000)
+        self.chunk_overlap = chunk_overlap if chunk_overlap is not None else kg_config.get("build_chunk_overlap", 200)
+        self.batch_size = batch_size or kg_config.get("build_batch_size", 16)
+        self.progress_dir = progress_dir or os.path.join(kg_manager.working_dir, "build_progress")
+        self.on_progress = on_progress or self._print_progress
+
+    def progress_path(self, file_path: str) -> str:
+        return os.path.join(self.progress_dir, os.path.basename(file_path) + ".json")
+
+    def _signature(self, file_path: str) -> Dict[str, Any]:
+        stat = os.stat(file_path)
+        return {
+            "file": os.path.abspath(file_path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "chunk_chars": self.chunk_chars,
+            "chunk_overlap": self.chunk_overlap,
+        }
+
+    def load_progress(self, file_path: str) -> Dict[str, Any]:
+        """
+        Return the saved progress for ``file_path``, or a fresh state if the file or
+        the chunking parameters changed since the last run.
+        """
+        signature = self._signature(file_path)
+        path = self.progress_path(file_path)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if all(state.get(k) == v for k, v in signature.items()):
+                return state
+            print(f"Input or chunking changed since the last build of {file_path}; starting over.")
+        return {**signature, "completed_chunks": 0, "completed_chars": 0, "finished": False}
+
+    def _save_progress(self, file_path: str, state: Dict[str, Any]):
+        os.makedirs(self.progress_dir, exist_ok=True)
+        path = self.progress_path(file_path)
+        state["updated_at"] = datetime.now().isoformat()
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def chunk_id(self, file_path: str, index: int) -> str:
+        return f"{os.path.basename(file_path)}#chunk-{index:06d}"
+
+    async def build(self, file_path: str, resume: bool = True) -> Dict[str, Any]:
+        """
+        Stream ``file_path`` into the knowledge graph.
+
+        Args:
+            file_path (str): Path to a UTF-8 text file
+            resume (bool): Skip chunks committed by a previous run
+
+        Returns:
+            Dict with the final progress and throughput figures
+        """
+        state = self.load_progress(file_path) if resume else {
+            **self._signature(file_path), "completed_chunks": 0, "completed_chars": 0, "finished": False}
+        skip = state["completed_chunks"]
+        if skip:
+            print(f"Resuming knowledge graph build of {file_path} after {skip} chunks.")
+
+        started = time.perf_counter()
+        session = {"chunks": 0, "chars": 0, "start_fraction": None}
+        batch: List[str] = []
+        batch_ids: List[str] = []
+        fraction = 0.0
+
+        async def flush():
+            await self.kg_manager.ainsert(batch, ids=batch_ids)
+            chars = sum(len(t) for t in batch)
+            state["completed_chunks"] += len(batch)
+            state["completed_chars"] += chars
+            session["chunks"] += len(batch)
+            session["chars"] += chars
+            self._save_progress(file_path, state)
+            self.on_progress(self._report(state, session, fraction, started))
+            batch.clear()
+            batch_ids.clear()
+
+        for index, text, fraction in iter_chunks(file_path, self.chunk_chars, self.chunk_overlap):
+            if index < skip:
+                continue
+            if session["start_fraction"] is None:
+                session["start_fraction"] = fraction
+            batch.append(text)
+            batch_ids.append(self.chunk_id(file_path, index))
+            if len(batch) >= self.batch_size:
+                await flush()
+        if batch:
+            fraction = 1.0
+            await flush()
+
+        state["finished"] = True
+        self._save_progress(file_path, state)
+        report = self._report(state, session, 1.0, started)
+        print(f"Knowledge graph build of {file_path} finished: {state['completed_chunks']} chunks, "
+              f"{report['chunks_per_sec']:.2f} chunks/s.")
+        return report
+
+    @staticmethod
+    def _report(state: Dict[str, Any], session: Dict[str, int], fraction: float, started: float) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - started
+        eta = None
+        start_fraction = session["start_fraction"] or 0.0
+        if fraction > start_fraction and elapsed > 0:
+            eta = elapsed * (1.0 - fraction) / (fraction - start_fraction)
+        return {
+            "file": state["file"],
+            "completed_chunks": state["completed_chunks"],
+            "completed_chars": state["completed_chars"],
+            "fraction_read": round(fraction, 4),
+            "elapsed_sec": round(elapsed, 3),
+            "chunks_per_sec": session["chunks"] / elapsed if elapsed > 0 else 0.0,
+            "chars_per_sec": session["chars"] / elapsed if elapsed > 0 else 0.0,
+            "eta_sec": round(eta, 1) if eta is not None else None,
+        }
+
+    @staticmethod
+    def _print_progress(report: Dict[str, Any]):
+        eta = f", eta {report['eta_sec']}s" if report["eta_sec"] is not None else ""
+        print(f"[kg-build] {report['completed_chunks']} chunks ({report['fraction_read']:.1%} of file), "
+              f"{report['chunks_per_sec']:.2f} chunks/s, {report['chars_per_sec']:.0f} chars/s{eta}")
@@ -0,0 +1,189 @@
+"""
+Incremental knowledge-graph ingestion of the exam CSV question banks.
+
+Rows are read exactly as ``RAGManager.build_from_csv`` reads them and grouped
+into one document per question (stem, all options and the answer). Every
+document is fingerprinted; a manifest in the KG working directory records the
+fingerprint each question was inserted with, so re-running the ingestion only
+sends new or changed questions to entity/relation extraction.
+"""
+
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from . import config
+
+MANIFEST_NAME = "csv_ingest_manifest.json"
+
+# Document ids look like "<csv name without extension>:q<question id>@<fingerprint prefix>"
+_DOC_ID = re.compile(r"^(?P<source>.+):q(?P<qid>.+)@[0-9a-f]+$")
+
+
+def load_question_documents(csv_file_path: str) -> List[Dict[str, str]]:
+    """
+    Read a question bank CSV and return one document per question.
+
+    Args:
+        csv_file_path (str): Path to the CSV file
+
+    Returns:
+        List of {"key", "text"} dicts in file order; ``key`` is stable across runs
+    """
+    filename = os.path.basename(csv_file_path)
+    source = os.path.splitext(filename)[0]
+    df = pd.read_csv(csv_file_path)
+    questions: Dict[str, Dict[str, Any]] = {}
+
+    if filename in config.STEM_OPTION_CSV_FILES:
+        for _, row in df.iterrows():
+            qid = str(row['编号'])
+            question = questions.setdefault(qid, {"stem": str(row['题干']), "options": [], "answers": []})
+            question["options"].append(str(row['选项']))
+            # The 答案 column marks whether this option is the correct one (对/错)
+            if str(row.get('答案', '')).strip() == "对":
+                question["answers"].append(str(row['选项']))
+    else:
+        for _, row in df.iterrows():
+            qid = str(row['question_id'])
+            question = questions.setdefault(qid, {"stem": str(row['question_text']), "options": [], "answers": []})
+            option = f"{row['option_key']}. {row['option_text']}"
+            question["options"].append(option)
+            # pandas only yields bools when the whole column is clean TRUE/FALSE, so compare as text
+            if str(row['is_correct']).strip().upper() in ("TRUE", "1"):
+                question["answers"].append(option)
+
+    documents = []
+    for qid, question in questions.items():
+        lines = [f"题目：{question['stem']}"]
+        lines.extend(f"选项{option}" for option in question["options"])
+        if question["answers"]:
+            lines.append("正确答案：" + "；".join(question["answers"]))
+        documents.append({"key": f"{source}:q{qid}", "text": "\n".join(lines)})
+    return documents
+
+
+def fingerprint(text: str) -> str:
+    """Content fingerprint of a question document."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_doc_id(key: str, digest: str) -> str:
+    """LightRAG document id of a question version."""
+    return f"{key}@{digest[:16]}"
+
+
+def parse_doc_id(doc_id: str) -> Optional[Tuple[str, str]]:
+    """
+    Return ``(source, question_id)`` for a document id created by :func:`make_doc_id`,
+    or None for documents that did not come from a question bank.
+    """
+    match = _DOC_ID.match(doc_id)
+    return (match.group("source"), match.group("qid")) if match else None
+
+
+class IngestManifest:
+    """
+    JSON manifest of the questions already inserted into the knowledge graph.
+
+    ``entries`` maps question key -> {"fingerprint", "doc_id", "source", "inserted_at"}.
+    ``superseded`` lists document ids of replaced or removed questions that are
+    still waiting to be deleted from the graph.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, str]] = {}
+        self.superseded: List[str] = []
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.entries = data.get("entries", {})
+            self.superseded = data.get("superseded", [])
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_file = self.path + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"updated_at": datetime.now().isoformat(), "entries": self.entries,
+                       "superseded": self.superseded},
+                      f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.path)
+
+
+async def ingest_csv(kg_manager, csv_file_path: str, batch_size: Optional[int] = None,
+                     prune: bool = False) -> Dict[str, Any]:
+    """
+    Insert the new and changed questions of a CSV bank into the knowledge graph.
+
+    Each document id embeds the content fingerprint, so a changed question is
+    inserted as a new LightRAG document and the previous version is deleted
+    afterwards. The manifest is saved after every batch together with the ids
+    of the versions that batch replaced, so an interrupted run resumes with the
+    questions that were not inserted yet and still deletes the outdated ones.
+
+    Args:
+        kg_manager: KGManager used for insertion
+        csv_file_path (str): Path to the CSV file
+        batch_size (int): Questions per ``ainsert`` call, defaults to KG_CONFIG["build_batch_size"]
+        prune (bool): Also delete questions that disappeared from the CSV
+
+    Returns:
+        Dict with counts of new, changed, unchanged and removed questions, and of outdated
+        documents still waiting to be deleted (``pending_deletion``)
+    """
+    batch_size = batch_size or config.KG_CONFIG.get("build_batch_size", 16)
+    source = os.path.basename(csv_file_path)
+    manifest = IngestManifest(os.path.join(kg_manager.working_dir, MANIFEST_NAME))
+    documents = load_question_documents(csv_file_path)
+
+    pending = []
+    counts = {"new": 0, "changed": 0, "unchanged": 0, "removed": 0}
+    for doc in documents:
+        digest = fingerprint(doc["text"])
+        entry = manifest.entries.get(doc["key"])
+        if entry is not None and entry["fingerprint"] == digest:
+            counts["unchanged"] += 1
+            continue
+        counts["changed" if entry else "new"] += 1
+        pending.append((doc, digest))
+
+    print(f"KG ingestion of {source}: {counts['new']} new, {counts['changed']} changed, "
+          f"{counts['unchanged']} unchanged questions.")
+
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        ids = [make_doc_id(doc["key"], digest) for doc, digest in batch]
+        await kg_manager.ainsert([doc["text"] for doc, _ in batch], ids=ids)
+        now = datetime.now().isoformat()
+        for (doc, digest), doc_id in zip(batch, ids):
+            previous = manifest.entries.get(doc["key"])
+            if previous is not None:
+                manifest.superseded.append(previous["doc_id"])
+            manifest.entries[doc["key"]] = {"fingerprint": digest, "doc_id": doc_id, "source": source,
+                                            "inserted_at": now}
+        manifest.save()
+
+    if prune:
+        current = {doc["key"] for doc in documents}
+        for key in [k for k, e in manifest.entries.items() if e["source"] == source and k not in current]:
+            manifest.superseded.append(manifest.entries.pop(key)["doc_id"])
+            counts["removed"] += 1
+        manifest.save()
+
+    # Also drains deletions left over from an interrupted run; ids that could not be
+    # deleted stay in the manifest and are retried on the next run
+    if manifest.superseded:
+        deleted = set(await kg_manager.adelete_documents(list(manifest.superseded)))
+        manifest.superseded = [doc_id for doc_id in manifest.superseded if doc_id not in deleted]
+        manifest.save()
+        if manifest.superseded:
+            print(f"{len(manifest.superseded)} outdated documents are still in the knowledge graph "
+                  f"and stay queued for deletion.")
+
+    return {"source": source, "questions": len(documents), **counts, "pending_deletion": len(manifest.superseded)}
@@ -5,28 +5,55 @@ This module integrates with the existing RAG system to provide knowledge graph c
 
 import os
 import asyncio
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Optional, Union
 import numpy as np
 
 from lightrag import LightRAG, QueryParam
 from lightrag.llm.openai import openai_embed, openai_complete_if_cache
-from lightrag.utils import setup_logger
+from lightrag.utils import EmbeddingFunc, setup_logger
 
-from . import config
+from . import config, metrics
+from .kg_query_cache import QueryResultCache, query_key
+from .llm_cache import ResponseCache, cached_embedding, cached_llm
+from .ollama_client import OllamaClient
 
 
 class KGManager:
     """
     Knowledge Graph Manager using LightRAG to build and query knowledge graphs.
+
+    The native API is async (``ainsert``/``aquery``) and runs on the caller's event
+    loop, so the FastAPI handlers can await it without blocking other requests.
+    At most ``KG_CONFIG["max_concurrency"]`` operations run at once. ``insert_text``
+    and ``query`` are synchronous wrappers meant for scripts only.
     """
     
-    def __init__(self):
+    def __init__(self, working_dir: Optional[str] = None, llm_model_func: Optional[Callable] = None,
+                 embedding_func: Optional[Callable] = None, **lightrag_kwargs):
         """
         Initialize the KGManager.
+
+        Args:
+            working_dir (str): LightRAG storage directory, defaults to KG_CONFIG["working_dir"]
+            llm_model_func (Callable): Async LLM function replacing the configured provider
+                (e.g. a local stub for tests)
+            embedding_func (Callable): Async embedding function replacing the configured provider
+            **lightrag_kwargs: Extra keyword arguments passed to LightRAG (e.g. an offline tokenizer)
         """
         print("Initializing KGManager...")
         self.config = config
-        self.working_dir = "./kg_storage"
+        self.kg_config = config.KG_CONFIG
+        self.working_dir = working_dir or self.kg_config.get("working_dir", "./kg_storage")
+        self._llm_override = llm_model_func
+        self._embedding_override = embedding_func
+        self._lightrag_kwargs = lightrag_kwargs
+        self.response_cache: Optional[ResponseCache] = None
+        self.ollama: Optional[OllamaClient] = None
+        query_cache_config = self.kg_config.get("query_cache", {})
+        self.query_cache = QueryResultCache(
+            max_entries=query_cache_config.get("max_entries", 256),
+            ttl=query_cache_config.get("ttl", 600),
+        )
         
         # Create working directory if it doesn't exist
         if not os.path.exists(self.working_dir):
@@ -37,6 +64,12 @@ class KGManager:
         
         # Initialize RAG instance (will be set in initialize method)
         self.rag = None
+
+        # Created lazily so they bind to the loop that first uses them
+        self._init_lock: Optional[asyncio.Lock] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # Private loop used by the synchronous wrappers
+        self._sync_loop: Optional[asyncio.AbstractEventLoop] = None
         
         print("KGManager initialized.")
     
@@ -53,9 +86,13 @@ class KGManager:
         Uses Ollama or DashScope based on configuration.
         """
         if self.config.EMBEDDING_PROVIDER == "ollama":
-            # For Ollama, we would need to implement a proper integration
-            # This is a placeholder implementation
-            raise NotImplementedError("Ollama integration for LLM not implemented yet")
+            return await self._ollama_client().llm_model_func(
+                prompt,
+                system_prompt=system_prompt,
+                history_messages=history_messages,
+                keyword_extraction=keyword_extraction,
+                **kwargs
+            )
         elif self.config.EMBEDDING_PROVIDER == "dashscope":
             # Use DashScope API
             api_key = os.getenv("DASHSCOPE_API_KEY")
@@ -63,7 +100,7 @@ class KGManager:
                 raise ValueError("DASHSCOPE_API_KEY not set in environment variables")
             
             return await openai_complete_if_cache(
-                "qwen-plus",  # Using Qwen-Plus as default model
+                self.kg_config.get("llm_model", "qwen-plus"),  # Using Qwen-Plus as default model
                 prompt,
                 system_prompt=system_prompt,
                 history_messages=history_messages,
@@ -80,8 +117,7 @@ class KGManager:
         Uses Ollama or DashScope based on configuration.
         """
         if self.config.EMBEDDING_PROVIDER == "ollama":
-            # Placeholder for Ollama embedding integration
-            raise NotImplementedError("Ollama embedding integration not implemented yet")
+            return await self._ollama_client().embed(texts)
         elif self.config.EMBEDDING_PROVIDER == "dashscope":
             # Use DashScope embedding
             api_key = os.getenv("DASHSCOPE_API_KEY")
@@ -90,13 +126,59 @@ class KGManager:
                 
             return await openai_embed(
                 texts,
-                model="text-embedding-v2",  # Using DashScope embedding model
+                model=self.kg_config.get("embedding_model", "text-embedding-v2"),  # Using DashScope embedding model
                 api_key=api_key,
                 base_url="https://dashscope.aliyuncs.com/compatible-mode/v1"
             )
         else:
             raise ValueError(f"Unsupported EMBEDDING_PROVIDER: {self.config.EMBEDDING_PROVIDER}")
     
+    def _ollama_client(self) -> OllamaClient:
+        if self.ollama is None:
+            self.ollama = OllamaClient()
+        return self.ollama
+
+    def _model_names(self):
+        """Return the (LLM, embedding) model names of the configured provider."""
+        if self.config.EMBEDDING_PROVIDER == "ollama":
+            ollama_config = self.kg_config.get("ollama", {})
+            return (ollama_config.get("llm_model", "qwen3:8b"),
+                    ollama_config.get("embedding_model", self.config.OLLAMA_CONFIG["model"]))
+        return self.kg_config.get("llm_model", "qwen-plus"), self.kg_config.get("embedding_model", "text-embedding-v2")
+
+    def _embedding_dim(self) -> int:
+        if self.config.EMBEDDING_PROVIDER == "ollama" and self._embedding_override is None:
+            return self.kg_config.get("ollama", {}).get("embedding_dim", 1024)
+        return self.kg_config.get("embedding_dim", 1536)
+
+    def _model_functions(self):
+        """
+        Return the LLM and embedding functions handed to LightRAG, wrapped in the
+        persistent response cache unless KG_CONFIG["response_cache"]["mode"] is "off".
+        """
+        llm_func = self._llm_override or self._llm_model_func
+        embed_func = self._embedding_override or self._embedding_func
+        cache_config = self.kg_config.get("response_cache", {})
+        if cache_config.get("mode", "readwrite") == "off":
+            return llm_func, embed_func
+
+        if self.response_cache is None:
+            self.response_cache = ResponseCache(
+                cache_config.get("path", "./llm_cache/kg_responses.sqlite"),
+                max_bytes=cache_config.get("max_bytes", 512 * 1024 * 1024),
+                mode=cache_config.get("mode", "readwrite"),
+            )
+        # Overrides (e.g. local stubs) are keyed by their qualified name instead of the configured model
+        llm_name, embedding_name = self._model_names()
+        llm_model = (getattr(self._llm_override, "__qualname__", "custom-llm") if self._llm_override
+                     else f"{self.config.EMBEDDING_PROVIDER}:{llm_name}")
+        embedding_model = (getattr(self._embedding_override, "__qualname__", "custom-embedding")
+                           if self._embedding_override
+                           else f"{self.config.EMBEDDING_PROVIDER}:{embedding_name}")
+        print(f"KG response cache: {self.response_cache.path} (mode={self.response_cache.mode})")
+        return (cached_llm(llm_func, self.response_cache, llm_model),
+                cached_embedding(embed_func, self.response_cache, embedding_model))
+
     async def initialize(self):
         """
         Initialize the LightRAG instance with proper LLM and embedding functions.
@@ -104,112 +186,286 @@ class KGManager:
         print("Initializing LightRAG...")
         
         try:
+            llm_func, embed_func = self._model_functions()
             self.rag = LightRAG(
                 working_dir=self.working_dir,
-                llm_model_func=self._llm_model_func,
-                embedding_func=lambda texts: asyncio.run(self._embedding_func(texts)),
+                llm_model_func=llm_func,
+                llm_model_max_async=self.kg_config.get("llm_max_async", 4),
+                embedding_func=EmbeddingFunc(
+                    embedding_dim=self._embedding_dim(),
+                    max_token_size=self.kg_config.get("max_token_size", 8192),
+                    func=embed_func,
+                ),
+                **self._lightrag_kwargs,
             )
             
             # Initialize storage backends
             await self.rag.initialize_storages()
+            try:
+                # Newer LightRAG versions require the shared pipeline status before inserting
+                from lightrag.kg.shared_storage import initialize_pipeline_status
+            except ImportError:
+                pass
+            else:
+                await initialize_pipeline_status()
             
             print("LightRAG initialized successfully.")
         except Exception as e:
             print(f"Error initializing LightRAG: {e}")
             raise
     
-    def insert_text(self, text: str):
+    async def _ensure_initialized(self):
+        """
+        Initialize LightRAG on first use. Concurrent first requests share one initialization.
+        """
+        if self.rag is not None:
+            return
+        if self._init_lock is None:
+            self._init_lock = asyncio.Lock()
+        async with self._init_lock:
+            if self.rag is None:
+                await self.initialize()
+
+    def _limiter(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.kg_config.get("max_concurrency", 8))
+        return self._semaphore
+
+    async def ainsert(self, text: Union[str, List[str]], ids: Optional[List[str]] = None):
         """
         Insert text into the knowledge graph.
         
         Args:
-            text (str): Text to insert into the knowledge graph
+            text (str | List[str]): Text, or a batch of documents, to insert into the knowledge graph
+            ids (List[str]): Optional document ids; LightRAG skips ids it has already stored
         """
-        if self.rag is None:
-            raise RuntimeError("KGManager not initialized. Call initialize() first.")
-            
-        print(f"Inserting text into knowledge graph: {text[:100]}...")
+        await self._ensure_initialized()
+        if isinstance(text, str):
+            print(f"Inserting text into knowledge graph: {text[:100]}...")
+        else:
+            print(f"Inserting {len(text)} documents into knowledge graph...")
         try:
-            # LightRAG's insert method is async, so we need to run it in an event loop
-            asyncio.run(self.rag.insert(text))
+            async with self._limiter():
+                with metrics.timer("kg_insert"):
+                    if ids is None:
+                        await self.rag.ainsert(text)
+                    else:
+                        await self.rag.ainsert(text, ids=ids)
             print("Text inserted successfully.")
         except Exception as e:
             print(f"Error inserting text: {e}")
             raise
-    
-    def query(self, query_text: str, mode: str = "hybrid", **kwargs) -> Dict[str, Any]:
+        finally:
+            # Even a failed insert may have merged part of the batch into the graph
+            self.query_cache.invalidate()
+
+    async def aquery(self, query_text: str, mode: str = "hybrid", use_cache: bool = True, **kwargs) -> Dict[str, Any]:
         """
         Query the knowledge graph.
+
+        Results are served from the query result cache (KG_CONFIG["query_cache"])
+        until they expire or the graph changes.
         
         Args:
             query_text (str): Query text
             mode (str): Query mode (local, global, hybrid, naive, mix)
+            use_cache (bool): Look up and store the result in the query result cache
             **kwargs: Additional query parameters
             
         Returns:
             Dict containing query results
         """
-        if self.rag is None:
-            raise RuntimeError("KGManager not initialized. Call initialize() first.")
-            
+        key = query_key(query_text, mode, kwargs)
+        if use_cache:
+            cached = self.query_cache.get(key)
+            if cached is not None:
+                return {**cached, "cached": True}
+        generation = self.query_cache.generation
+
+        await self._ensure_initialized()
         print(f"Querying knowledge graph with mode '{mode}': {query_text}")
-        
         try:
-            # Create query parameters
             query_param = QueryParam(
                 mode=mode,
                 **kwargs
             )
+            async with self._limiter():
+                with metrics.timer("kg_query", mode=mode):
+                    result = await self.rag.aquery(query_text, param=query_param)
             
-            # Execute query (LightRAG query is async)
-            result = asyncio.run(self.rag.query(query_text, param=query_param))
-            
-            return {
+            response = {
                 "query": query_text,
                 "mode": mode,
                 "result": result
             }
+            if use_cache:
+                self.query_cache.put(key, response, generation)
+            return response
         except Exception as e:
             print(f"Error querying knowledge graph: {e}")
             raise
+
+    def _run_sync(self, coro):
+        """
+        Run a coroutine to completion on the manager's private loop (scripts only).
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            coro.close()
+            raise RuntimeError("Called a synchronous KGManager method inside a running event loop; "
+                               "use 'await ainsert(...)' / 'await aquery(...)' instead.")
+        if self._sync_loop is None or self._sync_loop.is_closed():
+            self._sync_loop = asyncio.new_event_loop()
+        return self._sync_loop.run_until_complete(coro)
+
+    def insert_text(self, text: str):
+        """
+        Synchronous wrapper around ``ainsert`` for scripts.
+        
+        Args:
+            text (str): Text to insert into the knowledge graph
+        """
+        return self._run_sync(self.ainsert(text))
     
-    def build_from_file(self, file_path: str):
+    def query(self, query_text: str, mode: str = "hybrid", use_cache: bool = True, **kwargs) -> Dict[str, Any]:
+        """
+        Synchronous wrapper around ``aquery`` for scripts.
+        
+        Args:
+            query_text (str): Query text
+            mode (str): Query mode (local, global, hybrid, naive, mix)
+            use_cache (bool): Look up and store the result in the query result cache
+            **kwargs: Additional query parameters
+            
+        Returns:
+            Dict containing query results
+        """
+        return self._run_sync(self.aquery(query_text, mode=mode, use_cache=use_cache, **kwargs))
+    
+    async def abuild_from_file(self, file_path: str, resume: bool = True, **builder_kwargs) -> Dict[str, Any]:
         """
         Build knowledge graph from a text file.
+
+        The file is streamed into chunks and inserted in resumable batches by
+        :class:`rag_app.kg_builder.KGBuilder`, so large corpora neither load into
+        memory at once nor restart from scratch after an interruption.
         
         Args:
             file_path (str): Path to the text file
+            resume (bool): Continue after the chunks committed by a previous run
+            **builder_kwargs: Overrides for KGBuilder (chunk_chars, chunk_overlap, batch_size, on_progress)
+
+        Returns:
+            Dict with progress and throughput figures
         """
-        if self.rag is None:
-            raise RuntimeError("KGManager not initialized. Call initialize() first.")
-            
+        from .kg_builder import KGBuilder
+
         print(f"Building knowledge graph from file: {file_path}")
-        
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                
-            # Insert content into knowledge graph
-            self.insert_text(content)
-            
+            report = await KGBuilder(self, **builder_kwargs).build(file_path, resume=resume)
             print("Knowledge graph built successfully from file.")
+            return report
         except Exception as e:
             print(f"Error building knowledge graph from file: {e}")
             raise
 
+    def build_from_file(self, file_path: str, resume: bool = True, **builder_kwargs) -> Dict[str, Any]:
+        """
+        Synchronous wrapper around ``abuild_from_file`` for scripts.
+        
+        Args:
+            file_path (str): Path to the text file
+            resume (bool): Continue after the chunks committed by a previous run
+        """
+        return self._run_sync(self.abuild_from_file(file_path, resume=resume, **builder_kwargs))
+
+    async def aclose(self):
+        """
+        Release the pooled Ollama HTTP connections and close the response cache.
+        Call once at shutdown; the manager cannot be used afterwards.
+        """
+        if self.ollama is not None:
+            await self.ollama.aclose()
+        if self.response_cache is not None:
+            self.response_cache.close()
+            self.response_cache = None
+
+    async def adelete_documents(self, doc_ids: List[str]) -> List[str]:
+        """
+        Delete documents (and the graph elements only they contributed) from the knowledge graph.
+
+        Args:
+            doc_ids (List[str]): LightRAG document ids to delete
+
+        Returns:
+            List[str]: Ids that are no longer in the graph (deleted now or already absent);
+            empty when the installed LightRAG cannot delete documents
+        """
+        await self._ensure_initialized()
+        if not hasattr(self.rag, "adelete_by_doc_id"):
+            print(f"Installed LightRAG cannot delete documents; {len(doc_ids)} outdated documents are kept.")
+            return []
+        deleted = []
+        async with self._limiter():
+            with metrics.timer("kg_delete"):
+                try:
+                    for doc_id in doc_ids:
+                        result = await self.rag.adelete_by_doc_id(doc_id)
+                        # Older LightRAG versions return None instead of a DeletionResult
+                        status = getattr(result, "status", "success")
+                        if status in ("success", "not_found"):
+                            deleted.append(doc_id)
+                        else:
+                            print(f"Could not delete document {doc_id}: {getattr(result, 'message', status)}")
+                finally:
+                    self.query_cache.invalidate()
+        print(f"Deleted {len(deleted)} documents from knowledge graph.")
+        return deleted
+
+    async def aingest_csv(self, csv_file_path: str, prune: bool = False, batch_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Incrementally ingest an exam question bank CSV into the knowledge graph.
+
+        Rows are grouped into one document per question and fingerprinted; only new
+        or changed questions are sent to extraction (see :mod:`rag_app.kg_ingest`).
+
+        Args:
+            csv_file_path (str): Path to a CSV file in one of the ``build_from_csv`` formats
+            prune (bool): Delete questions that no longer appear in the CSV
+            batch_size (int): Questions per LightRAG insert call
+
+        Returns:
+            Dict with counts of new, changed, unchanged and removed questions
+        """
+        from .kg_ingest import ingest_csv
+
+        return await ingest_csv(self, csv_file_path, batch_size=batch_size, prune=prune)
+
+    def ingest_csv(self, csv_file_path: str, prune: bool = False, batch_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Synchronous wrapper around ``aingest_csv`` for scripts.
+
+        Args:
+            csv_file_path (str): Path to the CSV file
+            prune (bool): Delete questions that no longer appear in the CSV
+        """
+        return self._run_sync(self.aingest_csv(csv_file_path, prune=prune, batch_size=batch_size))
+
 
 # Example usage (commented out)
 """
 # Initialize the KGManager
 kg_manager = KGManager()
 
-# Initialize LightRAG (async)
-await kg_manager.initialize()
+# Inside async code (LightRAG is initialized on first use)
+await kg_manager.ainsert("Alan Turing was a British mathematician and computer scientist.")
+result = await kg_manager.aquery("Who was Alan Turing?", mode="hybrid")
+print(result)
 
-# Insert text
+# From a plain script (no running event loop)
 kg_manager.insert_text("Alan Turing was a British mathematician and computer scientist.")
-
-# Query the knowledge graph
 result = kg_manager.query("Who was Alan Turing?", mode="hybrid")
-print(result)
 """
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+In-memory result cache for knowledge-graph queries.
+
+LightRAG ``local``/``global``/``hybrid`` retrieval issues a keyword-extraction
+LLM call, vector searches over entities/relations and an answer LLM call for
+every query. Results are cached by query text, mode and query parameters, with a
+TTL and an LRU bound. Any insert or delete invalidates the whole cache: a
+generation counter makes sure a query that was already running when the graph
+changed does not store its (possibly stale) result.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from . import metrics
+
+
+def query_key(query_text: str, mode: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Stable cache key for a query and its ``QueryParam`` arguments."""
+    return json.dumps({"query": query_text, "mode": mode, "params": params or {}},
+                      ensure_ascii=False, sort_keys=True, default=str)
+
+
+class QueryResultCache:
+    """
+    Thread-safe TTL + LRU cache of query results.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 600, name: str = "kg_query"):
+        """
+        Args:
+            max_entries (int): Maximum number of cached results; 0 disables the cache
+            ttl (float): Seconds a result stays valid; 0 or None means no expiry
+            name (str): Cache name used as the metrics label
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+        metrics.cache_access(self.name, hit=entry is not None)
+        return entry[1] if entry is not None else None
+
+    def put(self, key: str, value: Any, generation: int):
+        """
+        Store ``value`` unless the graph changed since ``generation`` was read.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """Drop every cached result (called after the graph changes)."""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._entries)
+        return {
+            "entries": size,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "generation": self.generation,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,155 @@
+"""
+组件生命周期模块 - 重量级组件的延迟初始化、后台预热与就绪状态
+
+API 进程启动时不再在导入阶段构建 RAGManager、精排模型等组件：每个组件注册一个工厂函数，
+首次使用时才构建（并发的首次调用共享同一次构建），也可以在服务启动后于后台线程中预热，
+预热期间 /healthz 立即可用，/readyz 报告各组件的状态。
+"""
+
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class LazyComponent:
+    """
+    按需构建的单例组件。构建失败会记录错误，下一次使用时重试。
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any], required: bool = False,
+                 close: Optional[Callable[[Any], Any]] = None):
+        """
+        参数:
+            name (str): 组件名称
+            factory (Callable): 构建组件的函数（在工作线程中执行，可以很慢）
+            required (bool): 是否为就绪检查的必需组件
+            close (Callable): 关闭服务时对组件实例调用的清理函数，可以是协程函数
+        """
+        self.name = name
+        self.factory = factory
+        self.required = required
+        self.close = close
+        self.state = PENDING
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self._instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def peek(self):
+        """返回已构建的实例，尚未构建时返回 None（不会触发构建）。"""
+        return self._instance
+
+    def get(self):
+        """返回组件实例，必要时在当前线程中构建。"""
+        if self._instance is not None:
+            return self._instance
+        with self._lock:
+            if self._instance is not None:
+                return self._instance
+            self.state = LOADING
+            started = time.perf_counter()
+            try:
+                instance = self.factory()
+            except Exception as e:
+                self.state = FAILED
+                self.error = str(e)
+                print(f"组件 {self.name} 初始化失败: {e}")
+                raise
+            self.load_seconds = round(time.perf_counter() - started, 3)
+            self.error = None
+            self._instance = instance
+            self.state = READY
+            print(f"组件 {self.name} 已就绪，耗时 {self.load_seconds} 秒。")
+            return instance
+
+    async def aget(self):
+        """get 的异步版本：构建在线程中进行，不阻塞事件循环。"""
+        if self._instance is not None:
+            return self._instance
+        return await asyncio.to_thread(self.get)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "required": self.required,
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+        }
+
+
+class ComponentRegistry:
+    """
+    API 进程中所有延迟组件的注册表。
+    """
+
+    def __init__(self):
+        self._components: Dict[str, LazyComponent] = {}
+        self.started_at = time.time()
+
+    def register(self, name: str, factory: Callable[[], Any], required: bool = False,
+                 close: Optional[Callable[[Any], Any]] = None) -> LazyComponent:
+        component = LazyComponent(name, factory, required=required, close=close)
+        self._components[name] = component
+        return component
+
+    def __getitem__(self, name: str) -> LazyComponent:
+        return self._components[name]
+
+    def get(self, name: str):
+        return self._components[name].get()
+
+    async def aget(self, name: str):
+        return await self._components[name].aget()
+
+    async def warm_up(self, names: Iterable[str], parallel: bool = True):
+        """
+        在后台线程中预先构建组件。失败只记录在组件状态中，不会抛出。
+
+        参数:
+            names (Iterable[str]): 要预热的组件名称，按顺序构建
+            parallel (bool): 是否并行构建各组件
+        """
+        async def load(name: str):
+            try:
+                await self.aget(name)
+            except Exception:
+                pass
+
+        names = [n for n in names if n in self._components]
+        if parallel:
+            await asyncio.gather(*(load(n) for n in names))
+        else:
+            for name in names:
+                await load(name)
+
+    def readiness(self) -> Dict[str, Any]:
+        """返回整体就绪状态（所有必需组件均已就绪）与各组件状态。"""
+        components = {name: c.status() for name, c in self._components.items()}
+        return {
+            "ready": all(c.ready for c in self._components.values() if c.required),
+            "uptime_seconds": round(time.time() - self.started_at, 3),
+            "components": components,
+        }
+
+    async def aclose(self):
+        """对已构建的组件按注册的逆序调用清理函数。"""
+        for component in reversed(list(self._components.values())):
+            instance = component.peek()
+            if instance is None or component.close is None:
+                continue
+            try:
+                result = component.close(instance)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                print(f"关闭组件 {component.name} 时出错: {e}")
@@ -0,0 +1,249 @@
+"""
+Persistent response cache for the LLM and embedding calls made during
+knowledge-graph extraction.
+
+Responses are stored in a single SQLite file keyed by a hash of the model name,
+the prompt (or text) and the call parameters, so rebuilding ``kg_storage`` after
+a schema or prompt tweak only pays for the calls that actually changed. The
+cache is bounded by ``max_bytes``; least recently used entries are evicted.
+The async model wrappers run their SQLite lookups and writes in a worker
+thread, one batched query per call, so the event loop never waits on disk I/O.
+
+Modes:
+    - ``readwrite``: serve hits, call the model on misses and store the result
+    - ``cache_only``: serve hits, raise :class:`CacheMissError` on misses (offline replays, tests)
+    - ``off``: bypass the cache
+"""
+
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import metrics
+
+MODES = ("readwrite", "cache_only", "off")
+# Keys per ``IN (...)`` lookup, below SQLite's default limit on bound parameters
+_LOOKUP_BATCH = 500
+
+
+class CacheMissError(RuntimeError):
+    """Raised in ``cache_only`` mode when a response is not in the cache."""
+
+
+def _jsonable(value: Any) -> bool:
+    try:
+        json.dumps(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def cache_key(kind: str, model: str, payload: Any, params: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Build a stable cache key. Parameters that are not JSON-serialisable (such as
+    storage handles LightRAG passes through ``**kwargs``) do not affect the response
+    and are ignored.
+    """
+    params = {k: v for k, v in sorted((params or {}).items()) if _jsonable(v)}
+    blob = json.dumps({"kind": kind, "model": model, "payload": payload, "params": params},
+                      ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Size-bounded, thread-safe SQLite cache of model responses.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024, mode: str = "readwrite"):
+        """
+        Args:
+            path (str): SQLite file path
+            max_bytes (int): Upper bound on the total size of stored values
+            mode (str): One of ``readwrite``, ``cache_only``, ``off``
+        """
+        if mode not in MODES:
+            raise ValueError(f"Invalid cache mode: {mode}")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, kind TEXT NOT NULL, model TEXT NOT NULL,"
+            " value BLOB NOT NULL, size INTEGER NOT NULL, last_access INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses(last_access)")
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key])[0]
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        """
+        Look up several keys with batched ``IN (...)`` queries.
+
+        Returns:
+            List[Optional[bytes]]: Cached values aligned with ``keys``, None for misses
+        """
+        found: Dict[str, bytes] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique), _LOOKUP_BATCH):
+                batch = unique[start:start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                found.update(self._conn.execute(
+                    f"SELECT key, value FROM responses WHERE key IN ({placeholders})", batch).fetchall())
+            if found:
+                now = time.time_ns()
+                self._conn.execute("BEGIN")
+                self._conn.executemany("UPDATE responses SET last_access = ? WHERE key = ?",
+                                       [(now, key) for key in found])
+                self._conn.execute("COMMIT")
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return [found.get(key) for key in keys]
+
+    def put(self, key: str, kind: str, model: str, value: bytes):
+        self.put_many([(key, kind, model, value)])
+
+    def put_many(self, entries: List[Tuple[str, str, str, bytes]]):
+        """
+        Store several ``(key, kind, model, value)`` entries in one transaction.
+        Values larger than ``max_bytes`` are skipped.
+        """
+        entries = [entry for entry in entries if len(entry[3]) <= self.max_bytes]
+        if not entries:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for key, kind, model, value in entries:
+                    old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO responses (key, kind, model, value, size, last_access)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, kind, model, value, len(value), time.time_ns()),
+                    )
+                    self._total_bytes += len(value) - (old[0] if old else 0)
+                self._evict()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._total_bytes = self._conn.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+                raise
+
+    async def aget_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        """:meth:`get_many` in a worker thread, for use on the event loop."""
+        return await asyncio.to_thread(self.get_many, keys)
+
+    async def aput_many(self, entries: List[Tuple[str, str, str, bytes]]):
+        """:meth:`put_many` in a worker thread, for use on the event loop."""
+        await asyncio.to_thread(self.put_many, entries)
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in ``max_bytes`` (caller holds the lock)."""
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access LIMIT 64").fetchall()
+            if not rows:
+                self._total_bytes = 0
+                return
+            for key, size in rows:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self.evictions += 1
+                if self._total_bytes <= self.max_bytes:
+                    return
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "path": self.path,
+            "mode": self.mode,
+            "entries": entries,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def cached_llm(func: Callable, cache: ResponseCache, model: str) -> Callable:
+    """
+    Wrap an async LightRAG ``llm_model_func`` so identical calls are answered from ``cache``.
+    """
+    @functools.wraps(func)
+    async def wrapper(prompt: str, system_prompt: Optional[str] = None, history_messages: List[Dict] = [],
+                      keyword_extraction: bool = False, **kwargs) -> str:
+        if cache.mode == "off":
+            return await func(prompt, system_prompt=system_prompt, history_messages=history_messages,
+                              keyword_extraction=keyword_extraction, **kwargs)
+        key = cache_key("llm", model, {"prompt": prompt, "system_prompt": system_prompt,
+                                       "history_messages": history_messages,
+                                       "keyword_extraction": keyword_extraction}, kwargs)
+        cached = (await cache.aget_many([key]))[0]
+        metrics.cache_access("kg_llm", hit=cached is not None)
+        if cached is not None:
+            return cached.decode("utf-8")
+        if cache.mode == "cache_only":
+            raise CacheMissError(f"LLM response for model '{model}' is not cached (cache_only mode)")
+        result = await func(prompt, system_prompt=system_prompt, history_messages=history_messages,
+                            keyword_extraction=keyword_extraction, **kwargs)
+        if isinstance(result, str):
+            await cache.aput_many([(key, "llm", model, result.encode("utf-8"))])
+        return result
+
+    return wrapper
+
+
+def cached_embedding(func: Callable, cache: ResponseCache, model: str) -> Callable:
+    """
+    Wrap an async embedding function. Texts are cached individually, so a batch
+    that only partly changed sends just the new texts to the model.
+    """
+    @functools.wraps(func)
+    async def wrapper(texts: List[str], **kwargs) -> np.ndarray:
+        if cache.mode == "off":
+            return await func(texts, **kwargs)
+        keys = [cache_key("embedding", model, text, kwargs) for text in texts]
+        vectors: List[Optional[np.ndarray]] = []
+        missing = []
+        for i, cached in enumerate(await cache.aget_many(keys)):
+            vectors.append(np.frombuffer(cached, dtype=np.float32) if cached is not None else None)
+            if cached is None:
+                missing.append(i)
+        metrics.cache_access("kg_embedding", hit=True, count=len(texts) - len(missing))
+        metrics.cache_access("kg_embedding", hit=False, count=len(missing))
+        if missing:
+            if cache.mode == "cache_only":
+                raise CacheMissError(f"{len(missing)} embeddings for model '{model}' are not cached (cache_only mode)")
+            fresh = np.asarray(await func([texts[i] for i in missing], **kwargs), dtype=np.float32)
+            for i, vector in zip(missing, fresh):
+                vectors[i] = vector
+            await cache.aput_many([(keys[i], "embedding", model, vectors[i].tobytes()) for i in missing])
+        return np.stack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+    return wrapper
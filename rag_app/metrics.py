@@ -0,0 +1,241 @@
+"""
+轻量指标模块 - 记录检索链路各阶段的延迟、批大小、缓存命中与错误数
+
+指标以 Prometheus 文本格式通过 /metrics 暴露。METRICS_CONFIG["enabled"] 为 False 时，
+所有记录函数立即返回，timer 返回共享的空上下文管理器，开销接近于零。
+
+使用示例：
+    from . import metrics
+
+    with metrics.timer("vector_query"):
+        results = collection.query(...)
+    metrics.observe_batch("embedding", len(texts))
+    metrics.cache_access("rerank_tokens", hit=True)
+"""
+
+import threading
+import time
+from typing import Dict, List, Sequence, Tuple
+
+from . import config
+
+LATENCY_METRIC = "rag_stage_latency_seconds"
+BATCH_METRIC = "rag_stage_batch_size"
+CACHE_METRIC = "rag_cache_requests_total"
+ERROR_METRIC = "rag_stage_errors_total"
+SHED_METRIC = "rag_requests_shed_total"
+COALESCED_METRIC = "rag_coalesced_requests_total"
+DEGRADED_METRIC = "rag_degraded_responses_total"
+
+_HELP = {
+    LATENCY_METRIC: ("histogram", "Latency of each retrieval stage in seconds."),
+    BATCH_METRIC: ("histogram", "Number of items processed per call of each stage."),
+    CACHE_METRIC: ("counter", "Cache lookups by cache name and result."),
+    ERROR_METRIC: ("counter", "Errors raised inside each retrieval stage."),
+    SHED_METRIC: ("counter", "Requests rejected because a worker pool or endpoint was saturated."),
+    COALESCED_METRIC: ("counter", "Requests that waited for an identical in-flight request instead of running."),
+    DEGRADED_METRIC: ("counter", "Responses degraded to stay within the request latency budget."),
+}
+
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_BATCH_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    线程安全的指标注册表，保存计数器与直方图。
+    """
+
+    def __init__(self, enabled: bool = True, latency_buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+                 batch_buckets: Sequence[float] = DEFAULT_BATCH_BUCKETS):
+        self.enabled = enabled
+        self._bucket_sets = {LATENCY_METRIC: tuple(latency_buckets), BATCH_METRIC: tuple(batch_buckets)}
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+
+    def observe(self, name: str, value: float, **labels):
+        if not self.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(self._bucket_sets.get(name, DEFAULT_LATENCY_BUCKETS))
+            histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def counter_value(self, name: str, **labels) -> float:
+        """读取单个计数器的当前值（主要用于测试与监视页面）。"""
+        with self._lock:
+            return self._counters.get(name, {}).get(tuple(sorted(labels.items())), 0)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render_prometheus(self) -> str:
+        """以 Prometheus 文本格式（0.0.4）导出所有指标。"""
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                self._header(lines, name, "histogram")
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for upper, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(key, le=_fmt(upper))} {cumulative}")
+                    lines.append(f"{name}_bucket{_labels(key, le='+Inf')} {histogram.count}")
+                    lines.append(f"{name}_sum{_labels(key)} {_fmt(histogram.sum)}")
+                    lines.append(f"{name}_count{_labels(key)} {histogram.count}")
+            for name, series in sorted(self._counters.items()):
+                self._header(lines, name, "counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_labels(key)} {_fmt(value)}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _header(lines: List[str], name: str, kind: str):
+        help_text = _HELP.get(name, (kind, name))[1]
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(key: LabelKey, **extra) -> str:
+    pairs = list(key) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in pairs) + "}"
+
+
+def _fmt(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class _Timer:
+    """记录一个阶段耗时的上下文管理器；阶段内抛出异常时同时计入错误数。"""
+
+    __slots__ = ("registry", "stage", "labels", "started")
+
+    def __init__(self, registry: MetricsRegistry, stage: str, labels: Dict[str, str]):
+        self.registry = registry
+        self.stage = stage
+        self.labels = labels
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(LATENCY_METRIC, time.perf_counter() - self.started, stage=self.stage, **self.labels)
+        if exc_type is not None:
+            self.registry.inc(ERROR_METRIC, stage=self.stage, **self.labels)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+_metrics_config = getattr(config, "METRICS_CONFIG", {})
+registry = MetricsRegistry(
+    enabled=_metrics_config.get("enabled", True),
+    latency_buckets=_metrics_config.get("latency_buckets", DEFAULT_LATENCY_BUCKETS),
+    batch_buckets=_metrics_config.get("batch_buckets", DEFAULT_BATCH_BUCKETS),
+)
+
+
+def timer(stage: str, **labels):
+    """返回记录阶段耗时的上下文管理器；指标关闭时返回空上下文管理器。"""
+    if not registry.enabled:
+        return _NULL_TIMER
+    return _Timer(registry, stage, labels)
+
+
+def observe_latency(stage: str, seconds: float, **labels):
+    """直接记录一个已测得的阶段耗时（秒）。"""
+    if registry.enabled:
+        registry.observe(LATENCY_METRIC, seconds, stage=stage, **labels)
+
+
+def observe_batch(stage: str, size: int, **labels):
+    """记录一次调用处理的条目数量。"""
+    if registry.enabled:
+        registry.observe(BATCH_METRIC, size, stage=stage, **labels)
+
+
+def cache_access(cache: str, hit: bool, count: int = 1):
+    """记录缓存命中或未命中。"""
+    if registry.enabled and count:
+        registry.inc(CACHE_METRIC, count, cache=cache, result="hit" if hit else "miss")
+
+
+def record_error(stage: str, **labels):
+    """记录一个阶段错误。"""
+    if registry.enabled:
+        registry.inc(ERROR_METRIC, stage=stage, **labels)
+
+
+def record_shed(scope: str, name: str):
+    """记录一个因过载被拒绝的请求（scope 为 pool、endpoint 或 endpoint_timeout）。"""
+    if registry.enabled:
+        registry.inc(SHED_METRIC, scope=scope, target=name)
+
+
+def record_coalesced(operation: str):
+    """记录一个合并到相同在途请求上的等待者。"""
+    if registry.enabled:
+        registry.inc(COALESCED_METRIC, operation=operation)
+
+
+def record_degraded(operation: str, degradation: str):
+    """记录一次为满足延迟预算而降级的响应。"""
+    if registry.enabled:
+        registry.inc(DEGRADED_METRIC, operation=operation, degradation=degradation)
+
+
+def render_prometheus() -> str:
+    return registry.render_prometheus()
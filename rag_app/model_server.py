@@ -0,0 +1,446 @@
+"""
+共享模型服务模块 - 多个 uvicorn 工作进程共用一份 Qwen3-Reranker（与 embedding 函数）
+
+以多个工作进程运行 main.py 时，每个进程都会加载自己的 Qwen3Reranker，内存随进程数线性增长，
+各进程还会争抢 CPU。部署时可以在每台机器上启动一个模型服务进程：
+
+    python -m rag_app.model_server --socket /run/rag/models.sock
+    RAG_MODEL_SERVER_SOCKET=/run/rag/models.sock uvicorn main:app --workers 8
+
+API 进程（MODEL_SERVER_CONFIG["socket_path"] 非空时）不再加载模型，而是通过 Unix socket
+调用模型服务；MODEL_SERVER_CONFIG["serve_embeddings"] 为 True 时 embedding 也由模型服务计算。
+
+二进制协议（小端序）：每个帧为 10 字节头 [uint8 op][uint8 flags/status][uint32 请求ID][uint32 负载长度]
+加负载。同一连接上可以有多个在途请求，响应按完成顺序返回并以请求 ID 对应。
+
+- 文本列表：[uint32 文本数 n][uint32 偏移表 × (n+1)][UTF-8 文本]
+- OP_RERANK 请求：文本列表 [查询, 片段...]；flags 含 FLAG_CHUNK_IDS 时后接片段 ID 文本列表
+  响应：n 个 float32 分数
+- OP_EMBED 请求：文本列表；响应：[uint32 n][uint32 维度][float32 × n × 维度]
+- OP_HEALTH 请求：空；响应：UTF-8 JSON
+- 响应头的第二个字节为状态：STATUS_OK，或 STATUS_ERROR（负载为 UTF-8 错误信息）
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import config
+
+_HEADER = struct.Struct("<BBII")
+_UINT32 = struct.Struct("<I")
+
+OP_RERANK = 1
+OP_EMBED = 2
+OP_HEALTH = 3
+_OP_NAMES = {OP_RERANK: "rerank", OP_EMBED: "embed", OP_HEALTH: "health"}
+
+FLAG_CHUNK_IDS = 1
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+
+def pack_text_list(texts: List[str]) -> bytes:
+    """把文本列表编码为 [uint32 n][uint32 偏移表][UTF-8 文本]。"""
+    encoded = [t.encode("utf-8") for t in texts]
+    offsets = [0]
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    return _UINT32.pack(len(texts)) + struct.pack(f"<{len(offsets)}I", *offsets) + b"".join(encoded)
+
+
+def unpack_text_list(buf, pos: int = 0) -> Tuple[List[str], int]:
+    """从 buf 的 pos 处解码文本列表，返回 (文本列表, 列表之后的位置)。"""
+    count = _UINT32.unpack_from(buf, pos)[0]
+    offsets = struct.unpack_from(f"<{count + 1}I", buf, pos + 4)
+    base = pos + 4 + 4 * (count + 1)
+    texts = [bytes(buf[base + offsets[i]:base + offsets[i + 1]]).decode("utf-8") for i in range(count)]
+    return texts, base + offsets[-1]
+
+
+def pack_embeddings(embeddings) -> bytes:
+    rows = [list(map(float, row)) for row in embeddings]
+    dim = len(rows[0]) if rows else 0
+    flat = [v for row in rows for v in row]
+    return struct.pack("<II", len(rows), dim) + struct.pack(f"<{len(flat)}f", *flat)
+
+
+def unpack_embeddings(buf) -> List[List[float]]:
+    count, dim = struct.unpack_from("<II", buf, 0)
+    flat = struct.unpack_from(f"<{count * dim}f", buf, 8)
+    return [list(flat[i * dim:(i + 1) * dim]) for i in range(count)]
+
+
+class ModelServerError(RuntimeError):
+    """模型服务返回的错误，或与模型服务的连接中断。"""
+
+
+class ModelServer:
+    """
+    在 Unix socket 上提供精排与 embedding 的模型服务。
+
+    精排在单个线程中串行执行（一份模型），embedding 在 embed_workers 个线程中执行；
+    事件循环只负责收发帧，因此多个连接上的请求可以同时排队。
+    """
+
+    def __init__(self, socket_path: str, reranker=None, embedding_function=None, embed_workers: int = 4):
+        """
+        参数:
+            socket_path (str): Unix socket 路径
+            reranker: 提供 rerank(query, chunks, chunk_ids=None) 的精排器；None 时不提供精排
+            embedding_function: 可调用对象，输入文本列表返回向量列表；None 时不提供 embedding
+            embed_workers (int): 计算 embedding 的线程数
+        """
+        self.socket_path = socket_path
+        self.reranker = reranker
+        self.embedding_function = embedding_function
+        self._rerank_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-server-rerank")
+        self._embed_executor = ThreadPoolExecutor(max_workers=embed_workers, thread_name_prefix="model-server-embed")
+        self.requests: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.connections = 0
+        self.started_at = time.time()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._handlers: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    async def start(self):
+        """开始监听 socket（已存在的旧 socket 文件会被删除）。"""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        print(f"模型服务已在 {self.socket_path} 上监听 (pid={os.getpid()}, "
+              f"精排={'是' if self.reranker is not None else '否'}, "
+              f"embedding={'是' if self.embedding_function is not None else '否'})")
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            # 关闭现有连接，等待各连接处理完已收到的请求
+            for writer in list(self._handlers.values()):
+                writer.close()
+            if self._handlers:
+                await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+        self._rerank_executor.shutdown(wait=False, cancel_futures=True)
+        self._embed_executor.shutdown(wait=False, cancel_futures=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "healthy": True,
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started_at, 3),
+            "reranker": self.reranker is not None,
+            "embeddings": self.embedding_function is not None,
+            "connections": self.connections,
+            "requests": dict(self.requests),
+            "errors": dict(self.errors),
+        }
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        self._handlers[asyncio.current_task()] = writer
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                op, flags, request_id, length = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+                payload = await reader.readexactly(length) if length else b""
+                task = asyncio.create_task(self._respond(op, flags, request_id, payload, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.connections -= 1
+            self._handlers.pop(asyncio.current_task(), None)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    async def _respond(self, op: int, flags: int, request_id: int, payload: bytes,
+                       writer: asyncio.StreamWriter, write_lock: asyncio.Lock):
+        name = _OP_NAMES.get(op, str(op))
+        self.requests[name] += 1
+        try:
+            body, status = await self._execute(op, flags, payload), STATUS_OK
+        except Exception as e:
+            self.errors[name] += 1
+            body, status = f"{type(e).__name__}: {e}".encode("utf-8"), STATUS_ERROR
+        async with write_lock:
+            try:
+                writer.write(_HEADER.pack(op, status, request_id, len(body)) + body)
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+    async def _execute(self, op: int, flags: int, payload: bytes) -> bytes:
+        loop = asyncio.get_running_loop()
+        if op == OP_RERANK:
+            if self.reranker is None:
+                raise RuntimeError("模型服务未加载精排模型")
+            texts, pos = unpack_text_list(payload)
+            chunk_ids = unpack_text_list(payload, pos)[0] if flags & FLAG_CHUNK_IDS else None
+            scores = await loop.run_in_executor(self._rerank_executor, self._rerank, texts[0], texts[1:], chunk_ids)
+            return struct.pack(f"<{len(scores)}f", *scores)
+        if op == OP_EMBED:
+            if self.embedding_function is None:
+                raise RuntimeError("模型服务未提供 embedding")
+            texts, _ = unpack_text_list(payload)
+            embeddings = await loop.run_in_executor(self._embed_executor, self.embedding_function, texts)
+            return pack_embeddings(embeddings)
+        if op == OP_HEALTH:
+            return json.dumps(self.health()).encode("utf-8")
+        raise ValueError(f"未知的操作码: {op}")
+
+    def _rerank(self, query: str, chunks: List[str], chunk_ids: Optional[List[str]]) -> List[float]:
+        if chunk_ids is None:
+            return self.reranker.rerank(query, chunks)
+        return self.reranker.rerank(query, chunks, chunk_ids=chunk_ids)
+
+
+class _AsyncConnection:
+    """事件循环中的一条多路复用连接：按请求 ID 把响应分发给等待的 Future。"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.closed = False
+        self._reader_task = asyncio.create_task(self._read_loop())
+
+    async def _read_loop(self):
+        error: Exception = ModelServerError("与模型服务的连接已关闭")
+        try:
+            while True:
+                _, status, request_id, length = _HEADER.unpack(await self.reader.readexactly(_HEADER.size))
+                body = await self.reader.readexactly(length) if length else b""
+                future = self.pending.pop(request_id, None)
+                if future is None or future.done():
+                    continue
+                if status == STATUS_OK:
+                    future.set_result(body)
+                else:
+                    future.set_exception(ModelServerError(body.decode("utf-8", "replace")))
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            error = ModelServerError(f"与模型服务的连接已断开: {e}")
+        finally:
+            self.closed = True
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self.pending.clear()
+
+    async def call(self, op: int, flags: int, request_id: int, payload: bytes, timeout: float) -> bytes:
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        try:
+            self.writer.write(_HEADER.pack(op, flags, request_id, len(payload)) + payload)
+            await self.writer.drain()
+            return await asyncio.wait_for(future, timeout=timeout)
+        finally:
+            self.pending.pop(request_id, None)
+
+    async def aclose(self):
+        self.writer.close()
+        self._reader_task.cancel()
+        try:
+            await self._reader_task
+        except asyncio.CancelledError:
+            pass
+        await self.writer.wait_closed()
+
+
+class ModelServerClient:
+    """
+    模型服务的客户端，提供与 RerankerPool 相同的 rerank / arerank / health / close 接口，
+    以及 embed / aembed。
+
+    事件循环中的调用共用每个事件循环一条多路复用连接；同步调用（脚本或线程池中）
+    每个线程使用一条阻塞连接。
+    """
+
+    def __init__(self, socket_path: str, request_timeout: float = 60.0):
+        """
+        参数:
+            socket_path (str): 模型服务的 Unix socket 路径
+            request_timeout (float): 单个请求的超时时间（秒）
+        """
+        self.socket_path = socket_path
+        self.request_timeout = request_timeout
+        self._ids = itertools.count(1)
+        self._ids_lock = threading.Lock()
+        self._local = threading.local()
+        self._conn: Optional[_AsyncConnection] = None
+        self._conn_lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _next_id(self) -> int:
+        with self._ids_lock:
+            return next(self._ids) & 0xFFFFFFFF
+
+    async def _connection(self) -> _AsyncConnection:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 连接与锁不能跨事件循环使用
+            self._loop = loop
+            self._conn_lock = asyncio.Lock()
+            self._conn = None
+        async with self._conn_lock:
+            if self._conn is None or self._conn.closed:
+                reader, writer = await asyncio.open_unix_connection(self.socket_path)
+                self._conn = _AsyncConnection(reader, writer)
+        return self._conn
+
+    async def _acall(self, op: int, payload: bytes = b"", flags: int = 0) -> bytes:
+        connection = await self._connection()
+        return await connection.call(op, flags, self._next_id(), payload, self.request_timeout)
+
+    def _call(self, op: int, payload: bytes = b"", flags: int = 0) -> bytes:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.request_timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        request_id = self._next_id()
+        try:
+            sock.sendall(_HEADER.pack(op, flags, request_id, len(payload)) + payload)
+            _, status, response_id, length = _HEADER.unpack(self._recv_exactly(sock, _HEADER.size))
+            body = self._recv_exactly(sock, length)
+        except (OSError, ModelServerError):
+            # 连接状态未知（超时或断开），下次调用重新连接
+            sock.close()
+            self._local.sock = None
+            raise
+        if response_id != request_id:
+            raise ModelServerError(f"响应 ID 不匹配: {response_id} != {request_id}")
+        if status != STATUS_OK:
+            raise ModelServerError(body.decode("utf-8", "replace"))
+        return body
+
+    @staticmethod
+    def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+        chunks = []
+        while size:
+            data = sock.recv(size)
+            if not data:
+                raise ModelServerError("与模型服务的连接已关闭")
+            chunks.append(data)
+            size -= len(data)
+        return b"".join(chunks)
+
+    @staticmethod
+    def _rerank_payload(query: str, chunks: List[str], chunk_ids: Optional[List[str]]) -> Tuple[bytes, int]:
+        payload = pack_text_list([query] + list(chunks))
+        if chunk_ids:
+            return payload + pack_text_list(list(chunk_ids)), FLAG_CHUNK_IDS
+        return payload, 0
+
+    def rerank(self, query: str, chunks: List[str], chunk_ids: Optional[List[str]] = None) -> List[float]:
+        """同步精排，返回与 chunks 对应的分数列表。"""
+        if not chunks:
+            return []
+        payload, flags = self._rerank_payload(query, chunks, chunk_ids)
+        body = self._call(OP_RERANK, payload, flags)
+        return list(struct.unpack(f"<{len(chunks)}f", body))
+
+    async def arerank(self, query: str, chunks: List[str], chunk_ids: Optional[List[str]] = None) -> List[float]:
+        """在事件循环中异步精排。"""
+        if not chunks:
+            return []
+        payload, flags = self._rerank_payload(query, chunks, chunk_ids)
+        body = await self._acall(OP_RERANK, payload, flags)
+        return list(struct.unpack(f"<{len(chunks)}f", body))
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return unpack_embeddings(self._call(OP_EMBED, pack_text_list(list(texts))))
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return unpack_embeddings(await self._acall(OP_EMBED, pack_text_list(list(texts))))
+
+    def health(self) -> Dict[str, Any]:
+        """返回模型服务的状态；连接失败时 healthy 为 False。"""
+        try:
+            return json.loads(self._call(OP_HEALTH).decode("utf-8"))
+        except (OSError, ModelServerError) as e:
+            return {"healthy": False, "error": str(e)}
+
+    async def aclose(self):
+        """关闭当前事件循环中的连接。"""
+        if self._conn is not None and self._loop is asyncio.get_running_loop():
+            await self._conn.aclose()
+            self._conn = None
+
+    def close(self):
+        """关闭当前线程的同步连接。"""
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+
+def main():
+    server_config = config.MODEL_SERVER_CONFIG
+    parser = argparse.ArgumentParser(description="共享的 Qwen3-Reranker / embedding 模型服务")
+    parser.add_argument("--socket", default=server_config.get("socket_path") or "/tmp/rag_model_server.sock",
+                        help="Unix socket 路径")
+    parser.add_argument("--no-reranker", action="store_true", help="不加载精排模型")
+    parser.add_argument("--embeddings", action="store_true", default=server_config.get("serve_embeddings", False),
+                        help="同时提供 embedding（使用 EMBEDDING_PROVIDER 配置的服务）")
+    args = parser.parse_args()
+
+    config.validate_config()
+    reranker = None
+    if not args.no_reranker:
+        from .reranker_pool import _default_factory
+
+        reranker_config = config.RERANKER_CONFIG
+        token_store_path = None
+        if reranker_config.get("pretokenize", False):
+            token_store_path = os.path.join(reranker_config["token_store_path"], config.COLLECTION_NAME)
+        reranker = _default_factory(reranker_config["model_name"], token_store_path)
+    embedding_function = None
+    if args.embeddings:
+        from .embedding_functions import create_embedding_function
+
+        embedding_function = create_embedding_function(config.EMBEDDING_PROVIDER)
+
+    server = ModelServer(args.socket, reranker=reranker, embedding_function=embedding_function,
+                         embed_workers=server_config.get("embed_workers", 4))
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,21 @@
 该模块实现了KnowledgeBaseMonitor类，用于查看RAG库中的数据片段和统计信息
 """
 
-import chromadb
+import base64
+import time
 import pandas as pd
 from typing import Dict, List, Optional, Any
 import json
 from datetime import datetime
 
 from . import config
+from .chroma_registry import get_registry
+from .collection_stats import get_collection_stats
+from .dedup import find_duplicate_clusters
+from .events import EventHub, format_sse
+from .jobs import JobManager
+from .query_log import query_log
+from .sketches import FieldProfile
 
 class KnowledgeBaseMonitor:
     """
@@ -23,8 +31,26 @@ class KnowledgeBaseMonitor:
         """
         print("正在初始化知识库监视器...")
         self.config = config
-        self.client = chromadb.PersistentClient(path=self.config.CHROMA_PATH)
+        self.registry = get_registry(self.config.CHROMA_PATH)
+        self.client = self.registry.client
+        self.jobs = JobManager()
+        self.events = EventHub(
+            queue_size=self.config.MONITOR_CONFIG.get("stream_queue_size", 100),
+            heartbeat_interval=self.config.MONITOR_CONFIG.get("stream_heartbeat_interval", 15)
+        )
+        self.jobs.listeners.append(lambda job: self.events.publish("job", job.to_dict()))
+        # 查询日志与集合统计是进程级单例，close() 时需移除这里注册的回调
+        query_log.listeners.append(self._publish_query)
+        get_collection_stats(self.config.COLLECTION_NAME).listeners.append(self._publish_stats)
         print(f"知识库监视器已连接到: {self.config.CHROMA_PATH}")
+
+    def close(self):
+        """从全局查询日志与集合统计中移除本监视器的事件回调（可重复调用）。"""
+        for listeners, listener in ((query_log.listeners, self._publish_query),
+                                    (get_collection_stats(self.config.COLLECTION_NAME).listeners,
+                                     self._publish_stats)):
+            if listener in listeners:
+                listeners.remove(listener)
     
     def get_collections_info(self) -> Dict[str, Any]:
         """
@@ -59,6 +85,9 @@ class KnowledgeBaseMonitor:
     def get_collection_stats(self, collection_name: str = None) -> Dict[str, Any]:
         """
         获取指定集合的详细统计信息
+
+        统计信息来自入库与删除时增量维护的聚合值，不会扫描集合。若聚合值尚未建立
+        （例如知识库在启用增量统计前构建）会自动启动一次后台重算。
         
         参数:
             collection_name (str): 集合名称，如果为None则使用默认集合
@@ -70,30 +99,22 @@ class KnowledgeBaseMonitor:
             if collection_name is None:
                 collection_name = self.config.COLLECTION_NAME
             
-            collection = self.client.get_collection(name=collection_name)
+            collection = self.registry.collection(collection_name)
             count = collection.count()
-            
-            # 获取所有数据用于分析
-            all_data = collection.get()
-            
-            # 分析元数据
-            metadata_analysis = self._analyze_metadata(all_data.get('metadatas', []))
-            
-            # 分析内容长度
-            content_lengths = [len(doc) for doc in all_data.get('documents', [])]
-            
+
+            collection_stats = get_collection_stats(collection_name)
+            collection_stats.refresh()
+            snapshot = collection_stats.snapshot()
+
             stats = {
                 "collection_name": collection_name,
+                **snapshot,
                 "total_documents": count,
-                "metadata_analysis": metadata_analysis,
-                "content_analysis": {
-                    "avg_length": sum(content_lengths) / len(content_lengths) if content_lengths else 0,
-                    "min_length": min(content_lengths) if content_lengths else 0,
-                    "max_length": max(content_lengths) if content_lengths else 0,
-                    "length_distribution": self._get_length_distribution(content_lengths)
-                },
+                "stats_consistent": snapshot["total_documents"] == count,
                 "timestamp": datetime.now().isoformat()
             }
+            if collection_stats.updated_at is None and count > 0:
+                stats["rebuild_job"] = self.start_stats_rebuild(collection_name)
             
             return stats
         except Exception as e:
@@ -102,15 +123,133 @@ class KnowledgeBaseMonitor:
                 "collection_name": collection_name,
                 "timestamp": datetime.now().isoformat()
             }
+
+    @staticmethod
+    def _stats_event(collection_stats, delta: int = 0) -> Dict[str, Any]:
+        return {
+            "collection_name": collection_stats.collection_name,
+            "total_documents": collection_stats.count,
+            "delta": delta,
+            "avg_length": collection_stats.total_length / collection_stats.count if collection_stats.count else 0,
+            "stats_updated_at": collection_stats.updated_at
+        }
+
+    def _publish_stats(self, collection_stats, delta: int):
+        self.events.publish("stats", self._stats_event(collection_stats, delta))
+
+    def _publish_query(self, entry: Dict[str, Any]):
+        self.events.publish("query", {
+            "timestamp": entry["timestamp"],
+            "query": entry["query"],
+            "endpoint": entry["endpoint"],
+            "latency_ms": entry["latency_ms"],
+            "result_count": len(entry["result_ids"]),
+            "error": entry["error"]
+        })
+
+    def stream_events(self):
+        """
+        返回监视页面的 SSE 事件流
+
+        连接建立时先推送一次内存中的统计快照与查询日志汇总，之后推送增量事件：
+        - stats: 文档数变化（delta）与平均长度
+        - job: 后台任务状态与进度
+        - query: 每次查询的耗时与结果数
+
+        返回:
+            AsyncIterator[str]: SSE 文本帧
+        """
+        collection_stats = get_collection_stats(self.config.COLLECTION_NAME)
+        initial = [
+            format_sse("stats", self._stats_event(collection_stats)),
+            format_sse("query_summary", query_log.summary())
+        ]
+        initial.extend(format_sse("job", job) for job in self.jobs.list() if job["status"] in ("pending", "running"))
+        return self.events.stream(initial)
+
+    def start_stats_rebuild(self, collection_name: str = None) -> Dict[str, Any]:
+        """
+        启动后台任务，分页扫描集合并重算增量统计
+
+        参数:
+            collection_name (str): 集合名称，如果为None则使用默认集合
+
+        返回:
+            Dict: 后台任务状态，可通过 get_job 查询进度
+        """
+        if collection_name is None:
+            collection_name = self.config.COLLECTION_NAME
+        collection = self.registry.collection(collection_name)
+        collection_stats = get_collection_stats(collection_name)
+        page_size = self.config.MONITOR_CONFIG.get("stats_rebuild_page_size", 1000)
+
+        def run(job):
+            return collection_stats.rebuild(collection, page_size=page_size, progress=job.update_progress)
+
+        return self.jobs.start(f"stats_rebuild:{collection_name}", run).to_dict()
+
+    def start_duplicate_scan(self, collection_name: str = None, threshold: float = None) -> Dict[str, Any]:
+        """
+        启动后台任务，在已存储的 embedding 上查找近重复片段簇
+
+        参数:
+            collection_name (str): 集合名称，如果为None则使用默认集合
+            threshold (float): 余弦相似度阈值，如果为None则使用 DEDUP_CONFIG["threshold"]
+
+        返回:
+            Dict: 后台任务状态，任务完成后 result 中包含重复簇报告
+        """
+        if collection_name is None:
+            collection_name = self.config.COLLECTION_NAME
+        dedup_config = self.config.DEDUP_CONFIG
+        if threshold is None:
+            threshold = dedup_config.get("threshold", 0.95)
+        collection = self.registry.collection(collection_name)
+
+        def run(job):
+            return find_duplicate_clusters(
+                collection,
+                threshold=threshold,
+                neighbors=dedup_config.get("neighbors", 10),
+                page_size=dedup_config.get("page_size", 500),
+                max_clusters=dedup_config.get("max_clusters", 100),
+                progress=job.update_progress
+            )
+
+        return self.jobs.start(f"duplicate_scan:{collection_name}", run).to_dict()
+
+    def get_job(self, job_id: str) -> Dict[str, Any]:
+        """
+        查询后台任务状态
+
+        参数:
+            job_id (str): 任务 ID
+
+        返回:
+            Dict: 任务状态，任务不存在时包含 error 字段
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            return {"error": f"任务不存在: {job_id}", "timestamp": datetime.now().isoformat()}
+        return job.to_dict()
     
-    def get_data_samples(self, collection_name: str = None, limit: int = 10, offset: int = 0) -> Dict[str, Any]:
+    def get_data_samples(self, collection_name: str = None, limit: int = 10, offset: int = 0,
+                         cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> Dict[str, Any]:
         """
         获取数据样本
+
+        分页直接下推到 ChromaDB 的 limit/offset，每次只读取一页数据。
+        游标模式下，游标记录下一页的位置以及上一页最后一条的 ID；并发入库只会在集合
+        末尾追加数据，游标位置保持稳定；若之前的数据被删除导致位置偏移，会在附近窗口中
+        按 ID 重新对齐。
         
         参数:
             collection_name (str): 集合名称
             limit (int): 返回的样本数量
-            offset (int): 偏移量
+            offset (int): 偏移量（提供 cursor 时忽略）
+            cursor (str): 上一页返回的 next_cursor
+            fields (List[str]): 字段投影，可选 "documents"、"metadatas"；为 None 时返回全部，
+                为空列表时只返回 ID
             
         返回:
             Dict: 包含数据样本的字典
@@ -118,36 +257,45 @@ class KnowledgeBaseMonitor:
         try:
             if collection_name is None:
                 collection_name = self.config.COLLECTION_NAME
+            limit = max(1, min(limit, self.config.MONITOR_CONFIG.get("max_sample_limit", 50)))
+            include = ["documents", "metadatas"] if fields is None else [f for f in fields if f in ("documents", "metadatas")]
             
-            collection = self.client.get_collection(name=collection_name)
-            
-            # 获取所有数据
-            all_data = collection.get()
-            
-            # 计算实际的范围
-            total_count = len(all_data.get('ids', []))
-            start_idx = min(offset, total_count)
-            end_idx = min(start_idx + limit, total_count)
+            collection = self.registry.collection(collection_name)
+            total_count = collection.count()
+
+            realigned = None
+            if cursor:
+                offset, anchor_id = self._decode_cursor(cursor)
+                offset, realigned = self._realign_cursor(collection, offset, anchor_id, limit)
+
+            page = collection.get(limit=limit, offset=offset, include=include)
+            ids = page.get('ids') or []
             
             samples = []
-            for i in range(start_idx, end_idx):
-                sample = {
-                    "id": all_data['ids'][i],
-                    "content": all_data['documents'][i],
-                    "metadata": all_data['metadatas'][i],
-                    "index": i
-                }
+            for i, doc_id in enumerate(ids):
+                sample = {"id": doc_id, "index": offset + i}
+                if "documents" in include:
+                    sample["content"] = page['documents'][i]
+                if "metadatas" in include:
+                    sample["metadata"] = page['metadatas'][i]
                 samples.append(sample)
+
+            end_idx = offset + len(ids)
+            has_more = len(ids) == limit and end_idx < total_count
+            pagination = {
+                "total": total_count,
+                "limit": limit,
+                "offset": offset,
+                "has_more": has_more,
+                "next_cursor": self._encode_cursor(end_idx, ids[-1]) if has_more else None
+            }
+            if realigned is not None:
+                pagination["cursor_realigned"] = realigned
             
             return {
                 "collection_name": collection_name,
                 "samples": samples,
-                "pagination": {
-                    "total": total_count,
-                    "limit": limit,
-                    "offset": offset,
-                    "has_more": end_idx < total_count
-                },
+                "pagination": pagination,
                 "timestamp": datetime.now().isoformat()
             }
         except Exception as e:
@@ -156,10 +304,44 @@ class KnowledgeBaseMonitor:
                 "collection_name": collection_name,
                 "timestamp": datetime.now().isoformat()
             }
+
+    @staticmethod
+    def _encode_cursor(offset: int, last_id: str) -> str:
+        """把下一页位置与上一页最后一条 ID 编码为不透明游标。"""
+        raw = json.dumps({"o": offset, "id": last_id}, ensure_ascii=False).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii")
+
+    @staticmethod
+    def _decode_cursor(cursor: str):
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            return int(data["o"]), data["id"]
+        except Exception:
+            raise ValueError("无效的分页游标")
+
+    def _realign_cursor(self, collection, offset: int, anchor_id: str, limit: int):
+        """
+        确认游标锚点仍位于 offset - 1，否则在附近窗口中查找锚点并返回新的 offset。
+
+        返回:
+            tuple: (offset, 是否发生了重新对齐)
+        """
+        if offset <= 0:
+            return 0, False
+        probe = collection.get(limit=1, offset=offset - 1, include=[])
+        if probe.get('ids') == [anchor_id]:
+            return offset, False
+        window = self.config.MONITOR_CONFIG.get("cursor_realign_window", 500)
+        start = max(offset - 1 - window, 0)
+        nearby = collection.get(limit=window + 1 + limit, offset=start, include=[]).get('ids') or []
+        if anchor_id in nearby:
+            return start + nearby.index(anchor_id) + 1, True
+        # 锚点本身已被删除，只能从原位置继续
+        return offset, True
     
     def search_and_monitor(self, query: str, top_k: int = 5) -> Dict[str, Any]:
         """
-        执行搜索并返回详细的监控信息
+        执行搜索并返回详细的监控信息，查询同时写入查询日志（endpoint 为 monitor_search）
         
         参数:
             query (str): 搜索查询
@@ -168,8 +350,9 @@ class KnowledgeBaseMonitor:
         返回:
             Dict: 包含搜索结果和监控信息的字典
         """
+        started = time.perf_counter()
         try:
-            collection = self.client.get_collection(name=self.config.COLLECTION_NAME)
+            collection = self.registry.collection(self.config.COLLECTION_NAME)
             results = collection.query(query_texts=[query], n_results=top_k)
             
             search_results = []
@@ -183,7 +366,9 @@ class KnowledgeBaseMonitor:
                         "rank": i + 1
                     }
                     search_results.append(result)
-            
+
+            query_log.record(query, "monitor_search", (time.perf_counter() - started) * 1000, top_k=top_k,
+                             result_ids=[r["id"] for r in search_results])
             return {
                 "query": query,
                 "results": search_results,
@@ -196,50 +381,132 @@ class KnowledgeBaseMonitor:
                 "timestamp": datetime.now().isoformat()
             }
         except Exception as e:
+            query_log.record(query, "monitor_search", (time.perf_counter() - started) * 1000, top_k=top_k,
+                             error=str(e))
             return {
                 "error": f"搜索监控失败: {str(e)}",
                 "query": query,
                 "timestamp": datetime.now().isoformat()
             }
     
-    def _analyze_metadata(self, metadatas: List[Dict]) -> Dict[str, Any]:
+    def get_recent_queries(self, limit: int = 50) -> Dict[str, Any]:
+        """
+        获取最近的查询日志
+
+        参数:
+            limit (int): 返回的条目数量
+
+        返回:
+            Dict: 最近查询（最新在前）与日志汇总
+        """
+        return {
+            "queries": query_log.recent(limit),
+            "summary": query_log.summary(),
+            "timestamp": datetime.now().isoformat()
+        }
+
+    def get_slow_queries(self, limit: int = 50) -> Dict[str, Any]:
+        """
+        获取慢查询日志（按采样率与每分钟上限写入）
+
+        参数:
+            limit (int): 返回的条目数量
+
+        返回:
+            Dict: 慢查询（最新在前）与日志汇总
+        """
+        return {
+            "queries": query_log.slow(limit),
+            "summary": query_log.summary(),
+            "timestamp": datetime.now().isoformat()
+        }
+
+    def get_query_hotspots(self, n: int = 10) -> Dict[str, Any]:
+        """
+        获取最近流量中的高频查询与高频命中文档，可用于缓存预热
+
+        参数:
+            n (int): 每个列表返回的条目数量
+
+        返回:
+            Dict: top_queries 与 hot_documents
+        """
+        return {
+            "top_queries": query_log.top_queries(n),
+            "hot_documents": query_log.hot_documents(n),
+            "timestamp": datetime.now().isoformat()
+        }
+
+    def _analyze_metadata(self, metadatas) -> Dict[str, Any]:
         """
         分析元数据
+
+        使用流式概要（HyperLogLog 去重计数 + Space-Saving 高频值）逐条处理，
+        可以传入分页读取的生成器，内存与结果大小不随文档数增长。
         
         参数:
-            metadatas (List[Dict]): 元数据列表
+            metadatas (Iterable[Dict]): 元数据列表或按页产出元数据的可迭代对象
             
         返回:
             Dict: 元数据分析结果
         """
-        if not metadatas:
-            return {"error": "没有元数据"}
-        
-        # 统计字段出现频率
-        field_counts = {}
+        monitor_config = self.config.MONITOR_CONFIG
+        profiles: Dict[str, FieldProfile] = {}
+        total = 0
         for metadata in metadatas:
+            if not metadata:
+                continue
+            total += 1
             for key, value in metadata.items():
-                if key not in field_counts:
-                    field_counts[key] = {}
-                if value not in field_counts[key]:
-                    field_counts[key][value] = 0
-                field_counts[key][value] += 1
+                profile = profiles.get(key)
+                if profile is None:
+                    profile = profiles[key] = FieldProfile(
+                        hll_precision=monitor_config.get("hll_precision", 12),
+                        top_capacity=monitor_config.get("heavy_hitter_capacity", 64))
+                profile.add(value)
+
+        if not total:
+            return {"error": "没有元数据"}
         
-        # 计算字段统计信息
-        field_stats = {}
-        for field, values in field_counts.items():
-            field_stats[field] = {
-                "unique_values": len(values),
-                "total_occurrences": sum(values.values()),
-                "most_common": max(values.items(), key=lambda x: x[1]) if values else None,
-                "value_distribution": values
-            }
+        field_stats = {
+            field: profile.summary(top_n=monitor_config.get("top_values", 10),
+                                   max_value_length=monitor_config.get("max_value_length", 100))
+            for field, profile in profiles.items()
+        }
         
         return {
-            "total_metadata_entries": len(metadatas),
+            "total_metadata_entries": total,
             "field_statistics": field_stats,
-            "available_fields": list(field_counts.keys())
+            "available_fields": list(profiles.keys())
         }
+
+    def profile_metadata(self, collection_name: str = None, page_size: int = None) -> Dict[str, Any]:
+        """
+        分页扫描集合并生成元数据画像，每次只在内存中保留一页元数据
+
+        参数:
+            collection_name (str): 集合名称，如果为None则使用默认集合
+            page_size (int): 每页读取的文档数
+
+        返回:
+            Dict: 元数据分析结果
+        """
+        if collection_name is None:
+            collection_name = self.config.COLLECTION_NAME
+        page_size = page_size or self.config.MONITOR_CONFIG.get("stats_rebuild_page_size", 1000)
+        collection = self.registry.collection(collection_name)
+
+        def pages():
+            offset = 0
+            while True:
+                page = collection.get(limit=page_size, offset=offset, include=["metadatas"])
+                metadatas = page.get('metadatas') or []
+                yield from metadatas
+                offset += len(metadatas)
+                if len(metadatas) < page_size:
+                    return
+
+        return self._analyze_metadata(pages())
     
     def _get_length_distribution(self, lengths: List[int]) -> Dict[str, int]:
         """
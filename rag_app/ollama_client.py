@@ -0,0 +1,203 @@
+"""
+Native async Ollama backend for the knowledge-graph LLM and embedding calls.
+
+All requests share one pooled ``httpx.AsyncClient`` (keep-alive connections to
+the local Ollama server), in-flight requests are bounded by a semaphore, and
+embedding inputs are sent to ``/api/embed`` in batches. Completions can be
+streamed, in which case an async iterator of text fragments is returned (the
+form LightRAG expects for streaming query responses).
+"""
+
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+import httpx
+import numpy as np
+
+from . import config, metrics
+
+# LightRAG / OpenAI-style parameters that map onto Ollama generation options
+_OPTION_ALIASES = {"temperature": "temperature", "top_p": "top_p", "top_k": "top_k", "seed": "seed",
+                   "max_tokens": "num_predict", "num_predict": "num_predict", "stop": "stop"}
+
+
+class OllamaClient:
+    """
+    Async client for the Ollama ``/api/chat`` and ``/api/embed`` endpoints.
+
+    The HTTP client and the concurrency semaphore are created lazily and bound to
+    the event loop that uses them, so the same instance works from the FastAPI
+    loop and from the KGManager's private loop used by the synchronous wrappers.
+    """
+
+    def __init__(self, host: Optional[str] = None, llm_model: Optional[str] = None,
+                 embedding_model: Optional[str] = None, max_connections: Optional[int] = None,
+                 max_concurrency: Optional[int] = None, embed_batch_size: Optional[int] = None,
+                 timeout: Optional[float] = None, keep_alive: Optional[str] = None,
+                 options: Optional[Dict[str, Any]] = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        """
+        Args:
+            host (str): Ollama base URL, defaults to OLLAMA_CONFIG["host"]
+            llm_model (str): Chat model used for extraction and answers
+            embedding_model (str): Embedding model
+            max_connections (int): Size of the HTTP connection pool
+            max_concurrency (int): Requests in flight at once
+            embed_batch_size (int): Texts per ``/api/embed`` request
+            timeout (float): Request timeout in seconds
+            keep_alive (str): How long Ollama keeps the models loaded between requests
+            options (dict): Default generation options (e.g. ``num_ctx``)
+            transport (httpx.AsyncBaseTransport): Custom transport (tests)
+        """
+        ollama_config = config.KG_CONFIG.get("ollama", {})
+        self.host = (host or ollama_config.get("host") or config.OLLAMA_CONFIG["host"]).rstrip("/")
+        self.llm_model = llm_model or ollama_config.get("llm_model", "qwen3:8b")
+        self.embedding_model = embedding_model or ollama_config.get("embedding_model", config.OLLAMA_CONFIG["model"])
+        self.max_connections = max_connections or ollama_config.get("max_connections", 16)
+        self.max_concurrency = max_concurrency or ollama_config.get("max_concurrency", 4)
+        self.embed_batch_size = embed_batch_size or ollama_config.get("embed_batch_size", 32)
+        self.timeout = timeout or ollama_config.get("timeout", 300)
+        self.keep_alive = keep_alive or ollama_config.get("keep_alive", "10m")
+        self.options = dict(ollama_config.get("options", {}), **(options or {}))
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _bind(self):
+        """Return the pooled client and semaphore for the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            # A client cannot be shared across event loops; the previous one is left to the garbage collector
+            self._client = httpx.AsyncClient(
+                base_url=self.host,
+                timeout=httpx.Timeout(self.timeout, connect=10.0),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                transport=self._transport,
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._client, self._semaphore
+
+    def _chat_payload(self, prompt: str, system_prompt: Optional[str], history_messages: Optional[List[Dict]],
+                      json_format: bool, stream: bool, options: Dict[str, Any]) -> Dict[str, Any]:
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.extend(history_messages or [])
+        messages.append({"role": "user", "content": prompt})
+        payload = {
+            "model": self.llm_model,
+            "messages": messages,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+            "options": {**self.options, **options},
+        }
+        if json_format:
+            payload["format"] = "json"
+        return payload
+
+    async def chat(self, prompt: str, system_prompt: Optional[str] = None,
+                   history_messages: Optional[List[Dict]] = None, json_format: bool = False,
+                   stream: bool = False, **options) -> Union[str, AsyncIterator[str]]:
+        """
+        Run a chat completion.
+
+        Args:
+            prompt (str): User message
+            system_prompt (str): Optional system message
+            history_messages (List[Dict]): Earlier ``{"role", "content"}`` messages
+            json_format (bool): Constrain the output to JSON
+            stream (bool): Return an async iterator of text fragments instead of the full text
+            **options: Generation options (temperature, num_predict, ...)
+
+        Returns:
+            The completion text, or an async iterator of fragments when ``stream`` is true
+        """
+        payload = self._chat_payload(prompt, system_prompt, history_messages, json_format, stream, options)
+        if stream:
+            return self._stream_chat(payload)
+        client, semaphore = self._bind()
+        async with semaphore:
+            with metrics.timer("ollama_chat", model=self.llm_model):
+                try:
+                    response = await client.post("/api/chat", json=payload)
+                    response.raise_for_status()
+                except httpx.HTTPError:
+                    metrics.record_error("ollama_chat", model=self.llm_model)
+                    raise
+        return response.json()["message"]["content"]
+
+    async def _stream_chat(self, payload: Dict[str, Any]) -> AsyncIterator[str]:
+        client, semaphore = self._bind()
+        async with semaphore:
+            with metrics.timer("ollama_chat", model=self.llm_model):
+                async with client.stream("POST", "/api/chat", json=payload) as response:
+                    if response.is_error:
+                        await response.aread()
+                        metrics.record_error("ollama_chat", model=self.llm_model)
+                        response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.strip():
+                            continue
+                        chunk = json.loads(line)
+                        if "error" in chunk:
+                            raise RuntimeError(f"Ollama error: {chunk['error']}")
+                        content = chunk.get("message", {}).get("content")
+                        if content:
+                            yield content
+                        if chunk.get("done"):
+                            break
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed ``texts``; batches of ``embed_batch_size`` are sent concurrently
+        (bounded by ``max_concurrency``).
+
+        Returns:
+            float32 array of shape (len(texts), dim)
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        client, semaphore = self._bind()
+
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                metrics.observe_batch("ollama_embed", len(batch), model=self.embedding_model)
+                with metrics.timer("ollama_embed", model=self.embedding_model):
+                    try:
+                        response = await client.post("/api/embed", json={
+                            "model": self.embedding_model, "input": batch, "keep_alive": self.keep_alive})
+                        response.raise_for_status()
+                    except httpx.HTTPError:
+                        metrics.record_error("ollama_embed", model=self.embedding_model)
+                        raise
+            embeddings = response.json()["embeddings"]
+            if len(embeddings) != len(batch):
+                raise ValueError("Ollama returned a different number of embeddings than inputs.")
+            return embeddings
+
+        size = self.embed_batch_size
+        batches = await asyncio.gather(*(embed_batch(texts[i:i + size]) for i in range(0, len(texts), size)))
+        return np.asarray([vector for batch in batches for vector in batch], dtype=np.float32)
+
+    async def llm_model_func(self, prompt: str, system_prompt: Optional[str] = None,
+                             history_messages: List[Dict] = [], keyword_extraction: bool = False,
+                             **kwargs) -> Union[str, AsyncIterator[str]]:
+        """
+        LightRAG ``llm_model_func`` adapter. LightRAG-internal keyword arguments
+        (storage handles, priorities) are ignored; sampling parameters become Ollama options.
+        """
+        response_format = kwargs.get("response_format") or {}
+        json_format = keyword_extraction or response_format.get("type") in ("json_object", "json_schema")
+        options = {_OPTION_ALIASES[k]: v for k, v in kwargs.items() if k in _OPTION_ALIASES and v is not None}
+        return await self.chat(prompt, system_prompt=system_prompt, history_messages=history_messages,
+                               json_format=json_format, stream=bool(kwargs.get("stream")), **options)
+
+    async def aclose(self):
+        """Close the pooled HTTP client (call from the loop that used it)."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._loop = None
@@ -0,0 +1,155 @@
+"""
+查询日志模块 - 记录线上检索流量，供监视器查看
+
+- 最近查询：固定容量的环形缓冲区，保存每次查询的阶段耗时与结果 ID
+- 慢查询：超过延迟阈值的查询按采样率与每分钟上限写入独立的环形缓冲区，
+  高负载下不会无限增长
+- 热点：从最近查询中统计高频查询与高频命中文档，可用于缓存预热
+"""
+
+import random
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from . import config
+# 与请求合并使用同一规范化，高频查询的统计口径与合并键一致
+from .singleflight import normalize_query
+
+
+class QueryLog:
+    """
+    有界的查询日志，所有操作线程安全。
+    """
+
+    def __init__(self, capacity: int = 1000, slow_threshold_ms: float = 500, slow_capacity: int = 200,
+                 slow_sample_rate: float = 1.0, slow_max_per_minute: int = 60):
+        """
+        参数:
+            capacity (int): 最近查询环形缓冲区容量
+            slow_threshold_ms (float): 慢查询阈值（毫秒）
+            slow_capacity (int): 慢查询环形缓冲区容量
+            slow_sample_rate (float): 慢查询采样率（0-1）
+            slow_max_per_minute (int): 每分钟最多写入的慢查询条数
+        """
+        self.slow_threshold_ms = slow_threshold_ms
+        self.slow_sample_rate = slow_sample_rate
+        self.slow_max_per_minute = slow_max_per_minute
+        self._recent = deque(maxlen=capacity)
+        self._slow = deque(maxlen=slow_capacity)
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self.listeners = []
+        self.recorded = 0
+        self.slow_seen = 0
+        self.slow_dropped = 0
+
+    def record(self, query: str, endpoint: str, latency_ms: float, top_k: Optional[int] = None,
+               stages: Optional[List[Dict]] = None, result_ids: Optional[List[str]] = None,
+               error: Optional[str] = None) -> Dict[str, Any]:
+        """
+        记录一次查询。
+
+        参数:
+            query (str): 查询文本
+            endpoint (str): 查询入口（如 search、search_with_rerank）
+            latency_ms (float): 总耗时（毫秒）
+            top_k (int): 请求的结果数量
+            stages (List[Dict]): 各阶段耗时
+            result_ids (List[str]): 返回结果的 ID
+            error (str): 查询失败时的错误信息
+
+        返回:
+            Dict: 写入的日志条目
+        """
+        entry = {
+            "timestamp": datetime.now().isoformat(),
+            "query": query,
+            "endpoint": endpoint,
+            "top_k": top_k,
+            "latency_ms": round(latency_ms, 3),
+            "stages": stages or [],
+            "result_ids": result_ids or [],
+            "error": error,
+        }
+        with self._lock:
+            self.recorded += 1
+            self._recent.append(entry)
+            if latency_ms >= self.slow_threshold_ms:
+                self.slow_seen += 1
+                if self._admit_slow():
+                    self._slow.append(entry)
+                else:
+                    self.slow_dropped += 1
+        for listener in self.listeners:
+            try:
+                listener(entry)
+            except Exception as e:
+                print(f"查询日志监听回调出错: {e}")
+        return entry
+
+    def _admit_slow(self) -> bool:
+        """按采样率与每分钟上限决定是否写入慢查询日志（调用方持有锁）。"""
+        now = time.monotonic()
+        if now - self._window_start >= 60:
+            self._window_start = now
+            self._window_count = 0
+        if self._window_count >= self.slow_max_per_minute:
+            return False
+        if self.slow_sample_rate < 1.0 and random.random() >= self.slow_sample_rate:
+            return False
+        self._window_count += 1
+        return True
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """返回最近的查询，最新的在前。"""
+        with self._lock:
+            return list(reversed(self._recent))[:limit]
+
+    def slow(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """返回最近的慢查询，最新的在前。"""
+        with self._lock:
+            return list(reversed(self._slow))[:limit]
+
+    def top_queries(self, n: int = 10) -> List[Dict[str, Any]]:
+        """统计最近查询中出现最多的查询（按归一化文本）。"""
+        with self._lock:
+            counts = Counter(normalize_query(e["query"]) for e in self._recent if not e["error"])
+        return [{"query": q, "count": c} for q, c in counts.most_common(n)]
+
+    def hot_documents(self, n: int = 10) -> List[Dict[str, Any]]:
+        """统计最近查询结果中出现最多的文档 ID。"""
+        with self._lock:
+            counts = Counter(doc_id for e in self._recent for doc_id in e["result_ids"])
+        return [{"id": doc_id, "count": c} for doc_id, c in counts.most_common(n)]
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(e["latency_ms"] for e in self._recent)
+            buffered, slow_buffered = len(self._recent), len(self._slow)
+
+        def pct(p):
+            return latencies[min(int(p * len(latencies)), len(latencies) - 1)] if latencies else None
+
+        return {
+            "recorded": self.recorded,
+            "buffered": buffered,
+            "slow_seen": self.slow_seen,
+            "slow_buffered": slow_buffered,
+            "slow_dropped": self.slow_dropped,
+            "slow_threshold_ms": self.slow_threshold_ms,
+            "latency_ms": {"p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99)},
+        }
+
+
+_log_config = config.QUERY_LOG_CONFIG
+query_log = QueryLog(
+    capacity=_log_config.get("capacity", 1000),
+    slow_threshold_ms=_log_config.get("slow_threshold_ms", 500),
+    slow_capacity=_log_config.get("slow_capacity", 200),
+    slow_sample_rate=_log_config.get("slow_sample_rate", 1.0),
+    slow_max_per_minute=_log_config.get("slow_max_per_minute", 60),
+)
@@ -1,12 +1,32 @@
-import chromadb
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import TYPE_CHECKING, List, Optional
+
+import numpy as np
 import pandas as pd
-from chromadb.utils import embedding_functions as chroma_ef
 import ollama
 
 # 在同一个包/文件夹下的其他模块
-from . import config
-from .embedding_functions import DashScopeEmbeddingFunction
-from .reranker import Qwen3Reranker
+from . import config, executors, metrics
+from .chroma_registry import get_registry
+from .cascade import StageTimer, is_decisive, prescore, stage_sizes
+from .collection_stats import get_collection_stats
+from .deadline import Deadline, DeadlineExceeded
+from .dedup import match_duplicates
+from .graph_index import GraphIndexLoader, metadata_field
+from .kg_query_cache import QueryResultCache, query_key
+from .query_log import query_log
+from .singleflight import SingleFlight, normalize_query
+from .embedding_functions import InstrumentedEmbeddingFunction, RemoteEmbeddingFunction, create_embedding_function
+from .model_server import ModelServerClient
+from .reranker_pool import RerankerPool
+from .token_store import TokenStore
+
+if TYPE_CHECKING:
+    # reranker 导入 torch/transformers，仅在精排时延迟加载
+    from .reranker import RerankerPromptEncoder
 
 class RAGManager:
     """
@@ -17,57 +37,138 @@ class RAGManager:
         """
         初始化 RAGManager。
         - 设置基于 config.py 的配置。
-        - 初始化 ChromaDB 客户端。
+        - 从进程内共享的注册表获取 ChromaDB 客户端。
         - 根据配置选择并初始化 embedding function。
         - 获取或创建 ChromaDB 集合。
         """
         print("正在初始化 RAGManager...")
         self.config = config
+        self.config.validate_config()
+        # 集合绑定提供商自己的 embedding function：ChromaDB 1.x 会持久化它的 name()/get_config()，
+        # 重新打开集合时比对，包装过的函数会与已有知识库冲突。检索与入库时的向量由 self._embedding_function
+        # 显式计算（记录指标，可由共享模型服务计算）后再传给集合
+        self._provider_embedding_function = create_embedding_function(self.config.EMBEDDING_PROVIDER)
         self._embedding_function = self._get_embedding_function()
         
-        self.client = chromadb.PersistentClient(path=self.config.CHROMA_PATH)
-        self.collection = self.client.get_or_create_collection(
-            name=self.config.COLLECTION_NAME,
-            embedding_function=self._embedding_function
+        self.registry = get_registry(self.config.CHROMA_PATH)
+        self.client = self.registry.client
+        self.collection = self.registry.collection(
+            self.config.COLLECTION_NAME,
+            embedding_function=self._provider_embedding_function,
+            create=True
         )
         print(f"ChromaDB 集合 '{self.config.COLLECTION_NAME}' 已准备就绪。")
+        self.stats = get_collection_stats(self.config.COLLECTION_NAME)
         
+        # 相同的并发检索请求共享同一次计算（每个接口一个，指标按 operation 区分）
+        self._single_flights = {operation: SingleFlight(operation) for operation in ("search", "search_with_rerank")}
+        # 延迟预算：召回超出预算时返回的最近结果，以及 cross-encoder 每候选耗时的估计（毫秒）
+        search_config = self.config.SEARCH_CONFIG
+        self._stale_results = QueryResultCache(max_entries=search_config.get("stale_cache_entries", 1024),
+                                               ttl=search_config.get("stale_cache_ttl", 3600), name="stale_search")
+        self._rerank_ms_per_candidate = float(search_config.get("rerank_ms_per_candidate", 15))
+
+        # 图谱增强检索使用的题目-实体索引，首次 graph 模式检索时加载
+        self.graph_config = self.config.GRAPH_RETRIEVAL_CONFIG
+        self._graph_index = GraphIndexLoader(self.graph_config["storage_dir"], self.graph_config["index_path"])
+
         # 如果需要，保留一个Ollama客户端以备直接使用
         if self.config.EMBEDDING_PROVIDER == "ollama":
             self.ollama_client = ollama.Client(host=self.config.OLLAMA_CONFIG['host'])
             print("Ollama 客户端已初始化。")
         
-        # 初始化重排序器
-        self.qwen3_reranker = Qwen3Reranker()
-        print("Qwen3-Reranker已初始化。")
+        # 重排序器（精排关闭时不加载 cross-encoder）
+        # 配置了 MODEL_SERVER_CONFIG["socket_path"] 时使用共享模型服务；
+        # pool_workers > 0 时模型运行在独立的工作进程中，否则在当前进程内加载；
+        # lazy_load 为 True 时推迟到首次精排（或后台预热）时加载，纯向量检索无需等待模型
+        self.reranker_config = self.config.RERANKER_CONFIG
+        self.qwen3_reranker = None
+        self.reranker_pool = None
+        self.remote_reranker = None
+        self.token_store = None
+        self._prompt_encoder = None
+        self._reranker_loaded = False
+        self._reranker_lock = threading.Lock()
+        enabled = self.reranker_config.get("enable_reranker", True)
+        if enabled and self.reranker_config.get("pretokenize", False):
+            store_path = os.path.join(self.reranker_config["token_store_path"], self.config.COLLECTION_NAME)
+            self.token_store = TokenStore(store_path)
+            print(f"预分词存储已加载: {store_path} ({len(self.token_store)} 个片段)")
+        if not enabled:
+            print("Qwen3-Reranker已在配置中关闭，精排将只使用预打分。")
+        elif not self.reranker_config.get("lazy_load", False):
+            self.load_reranker()
+
+    def load_reranker(self):
+        """
+        加载 cross-encoder（工作进程池或进程内模型），重复调用只加载一次，可在任意线程中调用。
+
+        返回:
+            当前使用的 cross-encoder；精排关闭时为 None
+        """
+        if self._reranker_loaded:
+            return self._reranker()
+        with self._reranker_lock:
+            if self._reranker_loaded:
+                return self._reranker()
+            enabled = self.reranker_config.get("enable_reranker", True)
+            if enabled and self._model_server_client() is not None:
+                # 多工作进程部署：精排模型由共享模型服务进程持有
+                self.remote_reranker = self._model_server_client()
+                print(f"Qwen3-Reranker使用共享模型服务: {self.remote_reranker.socket_path}")
+            elif enabled and self.reranker_config.get("pool_workers", 0) > 0:
+                self.reranker_pool = RerankerPool(
+                    num_workers=self.reranker_config["pool_workers"],
+                    model_name=self.reranker_config["model_name"],
+                    request_timeout=self.reranker_config.get("pool_request_timeout", 60),
+                    heartbeat_interval=self.reranker_config.get("pool_heartbeat_interval", 5),
+                    heartbeat_timeout=self.reranker_config.get("pool_heartbeat_timeout", 30),
+                    token_store_path=self.token_store.path if self.token_store is not None else None,
+                )
+                print("Qwen3-Reranker工作进程池已启动。")
+            elif enabled:
+                from .reranker import Qwen3Reranker
+
+                self.qwen3_reranker = Qwen3Reranker(
+                    model_name=self.reranker_config["model_name"],
+                    token_store=self.token_store
+                )
+                print("Qwen3-Reranker已初始化。")
+            self._reranker_loaded = True
+        return self._reranker()
 
     def _get_embedding_function(self):
         """
-        根据配置文件动态选择并返回相应的 embedding function。
+        根据配置文件动态选择并返回计算向量用的 embedding function（带指标记录）。
         """
         provider = self.config.EMBEDDING_PROVIDER
         print(f"选择的 embedding 服务提供商: {provider}")
-        if provider == "ollama":
-            return chroma_ef.OllamaEmbeddingFunction(
-                url=f"{self.config.OLLAMA_CONFIG['host']}/api/embeddings",
-                model_name=self.config.OLLAMA_CONFIG['model'],
-            )
-        elif provider == "dashscope":
-            return DashScopeEmbeddingFunction(
-                api_key=self.config.DASHSCOPE_CONFIG['api_key'],
-                model=self.config.DASHSCOPE_CONFIG['model'],
-                dimensions=self.config.DASHSCOPE_CONFIG['dimensions']
-            )
+        if self._model_server_client() is not None and self.config.MODEL_SERVER_CONFIG.get("serve_embeddings"):
+            print(f"embedding 由共享模型服务计算: {self.config.MODEL_SERVER_CONFIG['socket_path']}")
+            embedding_function = RemoteEmbeddingFunction(self._model_server_client(), self._provider_embedding_function)
         else:
-            raise ValueError(f"无效的 EMBEDDING_PROVIDER: {provider}")
+            embedding_function = self._provider_embedding_function
+        return InstrumentedEmbeddingFunction(embedding_function, provider)
+
+    def _model_server_client(self):
+        """返回共享模型服务的客户端；未配置 MODEL_SERVER_CONFIG["socket_path"] 时返回 None。"""
+        socket_path = self.config.MODEL_SERVER_CONFIG.get("socket_path")
+        if not socket_path:
+            return None
+        if getattr(self, "_model_server", None) is None:
+            self._model_server = ModelServerClient(
+                socket_path, request_timeout=self.config.MODEL_SERVER_CONFIG.get("request_timeout", 60))
+        return self._model_server
 
-    def build_from_csv(self, csv_file_path: str):
+    def build_from_csv(self, csv_file_path: str, dedup: str = None):
         """
         从 CSV 文件读取数据，进行语义切片，生成向量，并存入 ChromaDB 知识库。
         此函数是幂等的，不会重复添加已存在的条目。
 
         参数:
             csv_file_path (str): CSV 文件的路径。
+            dedup (str): 入库去重方式，"drop" 丢弃近重复片段，"merge" 丢弃并把其 ID 记录到保留片段的
+                         merged_ids 元数据中；None 时使用 DEDUP_CONFIG["ingest_mode"]。
         """
         print(f"--- 正在从 {csv_file_path} 构建知识库 ---")
         import os
@@ -82,7 +183,7 @@ class RAGManager:
         documents, metadatas, ids = [], [], []
 
         # 针对指定的两个表格，采用精细化切片逻辑
-        if filename in ["计算机组成原理客观题.csv", "数字逻辑客观题.csv"]:
+        if filename in self.config.STEM_OPTION_CSV_FILES:
             for _, row in df.iterrows():
                 # 只拼接题干+选项
                 doc = f"{row['题干']} {row['选项']}"
@@ -103,7 +204,7 @@ class RAGManager:
                 })
                 ids.append(f"q{row['question_id']}_{row['option_key']}")
         
-        existing_ids_set = set(self.collection.get(ids=ids)['ids'])
+        existing_ids_set = set(self.collection.get(ids=ids, include=[])['ids'])
         new_documents, new_metadatas, new_ids = [], [], []
 
         for i, doc_id in enumerate(ids):
@@ -114,33 +215,193 @@ class RAGManager:
         
         if not new_documents:
             print("文件中的所有数据均已存在于知识库中，无需添加。")
+            self._pretokenize(ids, documents)
             print("--- 知识库构建完成 ---")
             return
 
+        dedup = dedup if dedup is not None else self.config.DEDUP_CONFIG.get("ingest_mode")
         try:
             print(f"正在向 ChromaDB 添加 {len(new_documents)} 条新知识...")
-            self.collection.add(documents=new_documents, metadatas=new_metadatas, ids=new_ids)
-            print(f"成功添加 {len(new_documents)} 条。")
+            if dedup:
+                skipped = self._add_deduplicated(new_documents, new_metadatas, new_ids, dedup)
+                documents = [doc for doc, doc_id in zip(documents, ids) if doc_id not in skipped]
+                ids = [doc_id for doc_id in ids if doc_id not in skipped]
+                print(f"成功添加 {len(new_documents) - len(skipped)} 条，跳过近重复片段 {len(skipped)} 条（{dedup}）。")
+            else:
+                self.collection.add(documents=new_documents, metadatas=new_metadatas, ids=new_ids,
+                                    embeddings=self._embed_documents(new_documents))
+                self.stats.add(new_documents, new_metadatas)
+                print(f"成功添加 {len(new_documents)} 条。")
         except Exception as e:
             print(f"向 ChromaDB 添加数据时出错。请检查您的 '{self.config.EMBEDDING_PROVIDER}' 服务。")
             print(f"详细错误: {e}")
+            existing_ids_set = set(self.collection.get(ids=ids, include=[])['ids'])
+            documents = [doc for doc, doc_id in zip(documents, ids) if doc_id in existing_ids_set]
+            ids = [doc_id for doc_id in ids if doc_id in existing_ids_set]
 
+        self._pretokenize(ids, documents)
         print("--- 知识库构建完成 ---")
 
-    def search(self, query: str, top_k: int = 5) -> dict:
+    def _add_deduplicated(self, documents: list, metadatas: list, ids: list, mode: str) -> dict:
+        """
+        分块入库并跳过与已有片段（或本次更早入库的片段）近重复的片段。
+
+        同一道题的各选项片段共享题干，彼此不参与重复匹配。
+
+        每块先计算一次 embedding，用于查找重复，保留的片段直接携带该 embedding 入库，不会重复计算。
+
+        参数:
+            documents (list): 待入库的片段内容
+            metadatas (list): 对应的元数据
+            ids (list): 对应的片段 ID
+            mode (str): "drop" 或 "merge"
+
+        返回:
+            dict: 被跳过的片段 ID -> 保留的片段 ID
+        """
+        if mode not in ("drop", "merge"):
+            raise ValueError(f"无效的去重方式: {mode}")
+        dedup_config = self.config.DEDUP_CONFIG
+        threshold = dedup_config.get("threshold", 0.95)
+        block_size = dedup_config.get("page_size", 500)
+        skipped = {}
+        for start in range(0, len(ids), block_size):
+            block_ids = ids[start:start + block_size]
+            block_docs = documents[start:start + block_size]
+            block_metas = metadatas[start:start + block_size]
+            embeddings = self._embed_documents(block_docs)
+            matches = match_duplicates(self.collection, embeddings, threshold,
+                                       groups=[_question_group(m) for m in block_metas],
+                                       group_of=_question_group,
+                                       neighbors=dedup_config.get("neighbors", 10))
+
+            keep, merged = [], {}
+            for i, match in enumerate(matches):
+                if match is None:
+                    keep.append(i)
+                    continue
+                target = block_ids[match] if isinstance(match, int) else match
+                target = skipped.get(target, target)
+                skipped[block_ids[i]] = target
+                merged.setdefault(target, []).append(block_ids[i])
+
+            if keep:
+                self.collection.add(
+                    ids=[block_ids[i] for i in keep],
+                    documents=[block_docs[i] for i in keep],
+                    metadatas=[block_metas[i] for i in keep],
+                    embeddings=[embeddings[i] for i in keep]
+                )
+                self.stats.add([block_docs[i] for i in keep], [block_metas[i] for i in keep])
+            if mode == "merge" and merged:
+                self._record_merged(merged)
+        return skipped
+
+    def _record_merged(self, merged: dict):
+        """
+        把被合并的重复片段 ID 写入保留片段的 merged_ids 元数据（逗号分隔）。
+
+        参数:
+            merged (dict): 保留的片段 ID -> 被合并的片段 ID 列表
+        """
+        existing = self.collection.get(ids=list(merged), include=["metadatas"])
+        old_metadatas, new_metadatas = [], []
+        for doc_id, metadata in zip(existing['ids'], existing.get('metadatas') or []):
+            metadata = dict(metadata or {})
+            old_metadatas.append(dict(metadata))
+            aliases = [a for a in (metadata.get("merged_ids") or "").split(",") if a]
+            aliases += [a for a in merged[doc_id] if a not in aliases]
+            metadata["merged_ids"] = ",".join(aliases)
+            new_metadatas.append(metadata)
+        if not new_metadatas:
+            return
+        self.collection.update(ids=existing['ids'], metadatas=new_metadatas)
+        self.stats.remove([], old_metadatas, save=False)
+        self.stats.add([], new_metadatas)
+
+    def delete(self, ids: list) -> int:
+        """
+        从知识库中删除指定片段，并同步更新集合统计、预分词存储与过期结果缓存。
+
+        参数:
+            ids (list): 要删除的片段 ID 列表
+
+        返回:
+            int: 实际删除的片段数量
+        """
+        existing = self.collection.get(ids=ids, include=["documents", "metadatas"])
+        found_ids = existing.get('ids') or []
+        if not found_ids:
+            return 0
+        self.collection.delete(ids=found_ids)
+        self.stats.remove(existing.get('documents') or [], existing.get('metadatas') or [])
+        if self.token_store is not None:
+            self.token_store.discard(found_ids)
+        # 过期结果缓存中可能包含已删除的片段
+        self._stale_results.invalidate()
+        print(f"已从知识库删除 {len(found_ids)} 条。")
+        return len(found_ids)
+
+    def _pretokenize(self, ids: list, documents: list, batch_size: int = 256):
+        """
+        为已入库但尚未缓存的片段计算精排用的 token ids 并写入预分词存储。
+
+        参数:
+            ids (list): 片段 ID 列表
+            documents (list): 与 ids 对应的片段文本
+            batch_size (int): 每批分词的片段数量
+        """
+        if self.token_store is None:
+            return
+        pending = [(doc_id, doc) for doc_id, doc in zip(ids, documents) if doc_id not in self.token_store]
+        if not pending:
+            return
+        print(f"正在为 {len(pending)} 个片段预分词...")
+        encoder = self._get_prompt_encoder()
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            token_lists = encoder.encode_chunks([doc for _, doc in batch])
+            self.token_store.put_many([doc_id for doc_id, _ in batch], token_lists)
+        print(f"预分词完成，存储中共有 {len(self.token_store)} 个片段。")
+
+    def _get_prompt_encoder(self) -> "RerankerPromptEncoder":
+        """返回精排提示词编码器；工作进程池模式或模型尚未加载时只在当前进程加载分词器。"""
+        if self.qwen3_reranker is not None:
+            return self.qwen3_reranker.encoder
+        if self._prompt_encoder is None:
+            from .reranker import RerankerPromptEncoder
+
+            self._prompt_encoder = RerankerPromptEncoder.from_pretrained(self.reranker_config["model_name"])
+        return self._prompt_encoder
+
+    def search(self, query: str, top_k: int = 5, query_embedding: Optional[List[float]] = None,
+               started: Optional[float] = None) -> dict:
         """
         在知识库中执行语义搜索。
 
         参数:
             query (str): 搜索查询文本。
             top_k (int): 返回的最相关结果数量。
+            query_embedding (List[float]): 已计算好的查询向量；None 时按配置的 embedding 服务计算。
+            started (float): 请求开始时间（time.perf_counter()）；调用方已单独计算查询向量时传入，
+                使延迟与查询日志包含 embedding 耗时。None 时从调用本方法开始计时。
 
         返回:
             dict: 包含搜索结果的字典。
         """
         print(f"正在为查询执行搜索: '{query}' (top_k={top_k})")
+        if started is None:
+            started = time.perf_counter()
         try:
-            results = self.collection.query(query_texts=[query], n_results=top_k)
+            try:
+                if query_embedding is None:
+                    query_embedding = self._embed_query(query)
+                results = self.collection.query(query_embeddings=[query_embedding], n_results=top_k)
+            except Exception:
+                metrics.record_error("search")
+                raise
+            finally:
+                metrics.observe_latency("search", time.perf_counter() - started)
             
             response_data = []
             if results and results.get('ids') and results['ids'][0]:
@@ -151,77 +412,453 @@ class RAGManager:
                         "metadata": results['metadatas'][0][i],
                         "distance": results['distances'][0][i]
                     })
+            query_log.record(query, "search", (time.perf_counter() - started) * 1000, top_k=top_k,
+                             result_ids=[r["id"] for r in response_data])
             return {
                 "provider": self.config.EMBEDDING_PROVIDER,
                 "query": query,
                 "results": response_data
             }
         except Exception as e:
+            query_log.record(query, "search", (time.perf_counter() - started) * 1000, top_k=top_k, error=str(e))
             print(f"搜索过程中发生错误: {e}")
             raise
     
-    def search_with_rerank(self, query: str, top_k: int = 5) -> dict:
+    def search_with_rerank(self, query: str, top_k: int = 5, mode: str = "vector") -> dict:
         """
-        在知识库中执行语义搜索并用Qwen3-Reranker cross-encoder进行精排。
-        
-        精排流程：
-        1. 使用embedding模型进行初步召回，获取较多候选结果
-        2. 使用Qwen3-Reranker cross-encoder对每个候选进行相关性打分
-        3. 按相关性分数降序排序，返回top_k个最相关的结果
-        
+        在知识库中执行级联精排搜索。
+
+        精排流程（各阶段规模见 config.RERANKER_CONFIG）：
+        1. 向量召回：embedding 检索 min(top_k * candidate_multiplier, max_candidates) 个候选
+           mode 为 "graph" 时，再以前 seed_hits 个命中为起点，在知识图谱中沿共享实体扩展到相邻题目
+           （见 config.GRAPH_RETRIEVAL_CONFIG），扩展题目按其 embedding 与查询的距离重新打分后并入候选
+        2. 预打分：词法重叠 + embedding 相似度的廉价打分，只保留 prescore_candidates 个幸存者
+        3. 精排：Qwen3-Reranker cross-encoder 只对幸存者打分；当预打分第 top_k 名与第 top_k+1 名的
+           分差已足够明显（early_exit_margin）或 enable_reranker 关闭时跳过此阶段
+        4. 按分数降序排序，返回 top_k 个最相关的结果
+
         Args:
             query (str): 搜索查询文本
             top_k (int): 返回的最相关结果数量
-            
+            mode (str): 召回方式，"vector"（仅向量召回）或 "graph"（向量召回 + 图谱扩展）
+
         Returns:
             dict: 包含精排后搜索结果的字典，包含以下字段：
                 - provider: embedding服务提供商
                 - query: 原始查询
-                - rerank_strategy: 精排策略名称
+                - mode: 召回方式
+                - rerank_strategy: 精排策略名称（qwen3-reranker 或 prescore）
+                - early_exit: 是否因预打分分差明显而跳过了 cross-encoder
+                - stages: 各阶段的名称、耗时（毫秒）与候选数量
                 - results: 精排后的结果列表，每个结果包含：
                     - id: 知识片段ID
                     - content: 知识片段内容
                     - metadata: 元数据
                     - distance: embedding初步检索距离
-                    - original_rank: embedding初步检索排名
-                    - rerank_score: Qwen3-Reranker相关性分数（越大越相关）
+                    - original_rank: embedding初步检索排名（图谱扩展的候选排在向量命中之后）
+                    - graph_score: 图谱扩展分数（仅图谱扩展加入的候选）
+                    - prescore: 预打分分数
+                    - rerank_score: 最终排序分数（cross-encoder 跳过时等于 prescore）
                     - final_rank: 精排后最终排名
         """
-        print(f"正在为查询执行Qwen3-Reranker精排搜索: '{query}' (top_k={top_k})")
+        print(f"正在为查询执行Qwen3-Reranker精排搜索: '{query}' (top_k={top_k}, mode={mode})")
+        started = time.perf_counter()
         try:
-            # 1. 先用embedding检索，取较多候选
-            initial_top_k = min(top_k * 5, 30)
-            results = self.collection.query(query_texts=[query], n_results=initial_top_k)
-            candidates = []
-            if results and results.get('ids') and results['ids'][0]:
-                for i in range(len(results['ids'][0])):
-                    candidates.append({
-                        "id": results['ids'][0][i],
-                        "content": results['documents'][0][i],
-                        "metadata": results['metadatas'][0][i],
-                        "distance": results['distances'][0][i],
-                        "original_rank": i + 1
-                    })
-            if not candidates:
-                return {"query": query, "results": []}
+            plan = self._prepare_rerank(query, top_k, mode, started=started)
+            if plan["survivors"] and plan["use_cross_encoder"]:
+                stage_started = time.perf_counter()
+                texts = [c["content"] for c in plan["survivors"]]
+                chunk_ids = [c["id"] for c in plan["survivors"]]
+                scores = self._reranker().rerank(query, texts, chunk_ids=chunk_ids)
+                plan["timer"].record("cross_encoder", stage_started, candidates=len(texts))
+            else:
+                scores = None
+            return self._finish_rerank(plan, scores)
+        except Exception as e:
+            metrics.record_error("search_with_rerank")
+            query_log.record(query, "search_with_rerank", (time.perf_counter() - started) * 1000,
+                             top_k=top_k, error=str(e))
+            print(f"Qwen3-Reranker精排搜索过程中发生错误: {e}")
+            raise
 
-            # 2. 用Qwen3-Reranker对每个候选打分
-            texts = [c["content"] for c in candidates]
-            scores = self.qwen3_reranker.rerank(query, texts)
-            for c, s in zip(candidates, scores):
-                c["rerank_score"] = s
+    def _embed_query(self, query: str) -> List[float]:
+        """计算查询向量（embedding 服务的网络请求）。"""
+        return self._embed_documents([query])[0]
 
-            # 3. 按分数排序，取top_k
-            reranked = sorted(candidates, key=lambda x: x["rerank_score"], reverse=True)[:top_k]
-            for i, c in enumerate(reranked):
-                c["final_rank"] = i + 1
+    def _embed_documents(self, documents: list) -> List[List[float]]:
+        """计算一批文本的向量，转换为集合可直接写入的 float 列表。"""
+        return [[float(v) for v in embedding] for embedding in self._embedding_function(documents)]
 
-            return {
-                "provider": self.config.EMBEDDING_PROVIDER,
-                "query": query,
-                "rerank_strategy": "qwen3-reranker",
-                "results": reranked
-            }
+    async def _coalesced(self, operation: str, params: tuple, query: str, fn, *args) -> dict:
+        """
+        同一 operation 的相同并发请求（规范化查询 + params 相同）共享 fn(*args) 的同一次计算，
+        合并进来的等待者得到带 "coalesced": True 的结果副本。
+        """
+        if not self.config.SEARCH_CONFIG.get("coalesce", True):
+            return await fn(*args)
+        result, coalesced = await self._single_flights[operation].do((normalize_query(query),) + params, fn, *args)
+        return {**result, "coalesced": True} if coalesced else result
+
+    def _deadline_ms(self, deadline_ms: Optional[float]) -> Optional[float]:
+        """请求的延迟预算，未指定时使用 SEARCH_CONFIG["default_deadline_ms"]。"""
+        return deadline_ms if deadline_ms is not None else self.config.SEARCH_CONFIG.get("default_deadline_ms")
+
+    def _stale_fallback(self, operation: str, key: str, error: DeadlineExceeded) -> dict:
+        """
+        召回阶段超出延迟预算时返回同一查询最近一次的结果；没有可用结果时抛出原异常。
+        """
+        entry = self._stale_results.get(key)
+        if entry is None:
+            raise error
+        stored_at, response = entry
+        print(f"{error}，返回 {time.time() - stored_at:.0f} 秒前的结果。")
+        metrics.record_degraded(operation, "stale_cache")
+        return {**response, "degraded": ["stale_cache"] + response.get("degraded", []),
+                "stale_age_s": round(time.time() - stored_at, 1)}
+
+    async def asearch(self, query: str, top_k: int = 5, deadline_ms: Optional[float] = None) -> dict:
+        """
+        search 的异步版本：查询向量在 embedding 线程池中计算，向量检索在 vector_search 线程池中执行，
+        不阻塞事件循环；线程池已满时抛出 executors.Overloaded。
+        相同的并发请求只计算一次（SEARCH_CONFIG["coalesce"]）。
+
+        deadline_ms 为延迟预算（毫秒）：预算内未完成时返回同一查询最近一次的结果
+        （"degraded": ["stale_cache"]），没有可用结果时抛出 DeadlineExceeded。
+        """
+        deadline_ms = self._deadline_ms(deadline_ms)
+        return await self._coalesced("search", (top_k, deadline_ms), query, self._asearch, query, top_k, deadline_ms)
+
+    async def _asearch(self, query: str, top_k: int, deadline_ms: Optional[float] = None) -> dict:
+        started = time.perf_counter()
+        deadline = Deadline(deadline_ms)
+        key = query_key(normalize_query(query), "search", {"top_k": top_k})
+        generation = self._stale_results.generation
+        reserve_ms = self.config.SEARCH_CONFIG.get("finish_reserve_ms", 0)
+        try:
+            query_embedding = await deadline.run(executors.run_in("embedding", self._embed_query, query),
+                                                 "embedding", reserve_ms)
+            response = await deadline.run(executors.run_in("vector_search", self.search, query, top_k,
+                                                           query_embedding, started), "vector_search", reserve_ms)
+        except DeadlineExceeded as e:
+            return self._stale_fallback("search", key, e)
+        response = {**response, "deadline_ms": deadline_ms, "degraded": []}
+        self._stale_results.put(key, (time.time(), response), generation)
+        return response
+
+    async def asearch_with_rerank(self, query: str, top_k: int = 5, mode: str = "vector",
+                                  deadline_ms: Optional[float] = None) -> dict:
+        """
+        search_with_rerank 的异步版本，供 FastAPI 等事件循环环境调用。
+
+        查询向量在 embedding 线程池中计算，向量召回与预打分在 vector_search 线程池中执行；
+        cross-encoder 使用工作进程池时直接 await 其结果，否则在 rerank 线程池中运行进程内模型。
+        线程池已满时抛出 executors.Overloaded。返回结构与 search_with_rerank 相同。
+        相同的并发请求只计算一次（SEARCH_CONFIG["coalesce"]），合并的请求结果带 "coalesced": True。
+
+        deadline_ms 为延迟预算（毫秒），预算不足时降级而不是失败，响应的 "degraded" 列出所用的降级：
+            - stale_cache: embedding 或向量召回超出预算，返回同一查询最近一次的结果
+              （没有可用结果时抛出 DeadlineExceeded）
+            - skip_rerank: 剩余预算不够 cross-encoder 处理 top_k 个候选，按预打分排序
+            - partial_rerank: cross-encoder 只对预打分排名靠前、预算内处理得完的候选打分
+            - rerank_timeout: cross-encoder 未在预算内返回，按预打分排序
+        """
+        deadline_ms = self._deadline_ms(deadline_ms)
+        return await self._coalesced("search_with_rerank", (top_k, mode, deadline_ms), query,
+                                     self._asearch_with_rerank, query, top_k, mode, deadline_ms)
+
+    async def _asearch_with_rerank(self, query: str, top_k: int, mode: str,
+                                   deadline_ms: Optional[float] = None) -> dict:
+        print(f"正在为查询执行Qwen3-Reranker精排搜索: '{query}' (top_k={top_k}, mode={mode})")
+        started = time.perf_counter()
+        deadline = Deadline(deadline_ms)
+        key = query_key(normalize_query(query), "search_with_rerank", {"top_k": top_k, "mode": mode})
+        generation = self._stale_results.generation
+        reserve_ms = self.config.SEARCH_CONFIG.get("finish_reserve_ms", 0)
+        try:
+            try:
+                timer = StageTimer()
+                query_embedding = await deadline.run(executors.run_in("embedding", self._embed_query, query),
+                                                     "embedding", reserve_ms)
+                timer.record("embedding", started, observe=False)
+                plan = await deadline.run(executors.run_in("vector_search", self._prepare_rerank, query, top_k,
+                                                           mode, query_embedding, started, timer),
+                                          "vector_search", reserve_ms)
+            except DeadlineExceeded as e:
+                return self._stale_fallback("search_with_rerank", key, e)
+            plan["deadline_ms"] = deadline_ms
+            degraded = plan["degraded"]
+            scores = None
+            if plan["survivors"] and plan["use_cross_encoder"]:
+                survivors = plan["survivors"]
+                affordable = (deadline.remaining_ms() - reserve_ms) / self._rerank_ms_per_candidate
+                if affordable < min(top_k, len(survivors)):
+                    degraded.append("skip_rerank")
+                elif affordable < len(survivors):
+                    # 预打分已按分数降序，只保留预算内处理得完的靠前候选
+                    survivors = plan["survivors"] = survivors[:int(affordable)]
+                    degraded.append("partial_rerank")
+                if "skip_rerank" not in degraded:
+                    stage_started = time.perf_counter()
+                    texts = [c["content"] for c in survivors]
+                    chunk_ids = [c["id"] for c in survivors]
+                    remote = self.remote_reranker or self.reranker_pool
+                    if remote is not None:
+                        pending = remote.arerank(query, texts, chunk_ids)
+                    else:
+                        pending = executors.run_in("rerank", self.qwen3_reranker.rerank, query, texts, chunk_ids)
+                    try:
+                        scores = await deadline.run(pending, "cross_encoder", reserve_ms)
+                        self._observe_rerank_cost((time.perf_counter() - stage_started) * 1000 / len(texts))
+                    except DeadlineExceeded:
+                        # 进程内模型无法中断，线程会继续算完；响应改用预打分排序
+                        degraded.append("rerank_timeout")
+                        # 实际耗时至少是已等待的时间，按下界修正估计，避免下次继续超时
+                        self._observe_rerank_cost((time.perf_counter() - stage_started) * 1000 / len(texts),
+                                                  lower_bound=True)
+                    plan["timer"].record("cross_encoder", stage_started, candidates=len(texts))
+            for degradation in degraded:
+                metrics.record_degraded("search_with_rerank", degradation)
+            response = self._finish_rerank(plan, scores)
+            self._stale_results.put(key, (time.time(), response), generation)
+            return response
+        except executors.Overloaded:
+            raise
         except Exception as e:
+            metrics.record_error("search_with_rerank")
+            query_log.record(query, "search_with_rerank", (time.perf_counter() - started) * 1000,
+                             top_k=top_k, error=str(e))
             print(f"Qwen3-Reranker精排搜索过程中发生错误: {e}")
-            raise 
\ No newline at end of file
+            raise
+
+    def _observe_rerank_cost(self, ms_per_candidate: float, lower_bound: bool = False):
+        """
+        按实测的每候选耗时更新 cross-encoder 耗时估计（指数滑动平均）。
+
+        参数:
+            ms_per_candidate (float): 实测的每候选耗时（毫秒）
+            lower_bound (bool): 实测值只是下界（调用超时），仅在高于当前估计时更新
+        """
+        if lower_bound and ms_per_candidate <= self._rerank_ms_per_candidate:
+            return
+        alpha = self.config.SEARCH_CONFIG.get("rerank_cost_smoothing", 0.2)
+        self._rerank_ms_per_candidate += alpha * (ms_per_candidate - self._rerank_ms_per_candidate)
+
+    def _reranker(self):
+        """返回当前使用的 cross-encoder（共享模型服务、工作进程池或进程内模型）。"""
+        if self.remote_reranker is not None:
+            return self.remote_reranker
+        return self.reranker_pool if self.reranker_pool is not None else self.qwen3_reranker
+
+    def close(self):
+        """关闭精排工作进程池与模型服务连接（如有），并压缩预分词存储的日志。"""
+        if self.reranker_pool is not None:
+            self.reranker_pool.close()
+        if getattr(self, "_model_server", None) is not None:
+            self._model_server.close()
+        if self.token_store is not None:
+            self.token_store.close()
+
+    def reranker_health(self) -> dict:
+        """
+        返回精排器的健康状态。
+
+        返回:
+            dict: 共享模型服务模式下为模型服务的状态，工作进程池模式下为各工作进程的状态，
+                  否则说明精排器运行在进程内或已关闭
+        """
+        if self.remote_reranker is not None:
+            return {"mode": "model_server", "socket_path": self.remote_reranker.socket_path,
+                    **self.remote_reranker.health()}
+        if self.reranker_pool is not None:
+            return {"mode": "pool", **self.reranker_pool.health()}
+        if self.qwen3_reranker is not None:
+            return {"mode": "in_process", "healthy": True}
+        if self.reranker_config.get("enable_reranker", True) and not self._reranker_loaded:
+            # 延迟加载：首次精排或后台预热时才加载模型
+            return {"mode": "not_loaded", "healthy": True}
+        return {"mode": "disabled", "healthy": True}
+
+    def _prepare_rerank(self, query: str, top_k: int, mode: str = "vector",
+                        query_embedding: Optional[List[float]] = None, started: Optional[float] = None,
+                        timer: Optional[StageTimer] = None) -> dict:
+        """
+        执行级联精排中 cross-encoder 之前的阶段（查询向量、向量召回、图谱扩展与预打分）。
+        query_embedding 为已计算好的查询向量，None 时在此计算；已计算时调用方传入请求开始时间
+        started 与记录了 embedding 阶段的 timer，使总延迟与 stages 包含 embedding 耗时。
+
+        返回:
+            dict: 精排计划，包含幸存候选、是否需要 cross-encoder 以及阶段计时器
+        """
+        if mode not in ("vector", "graph"):
+            raise ValueError(f"无效的检索模式: {mode}")
+        if started is None:
+            started = time.perf_counter()
+        timer = timer if timer is not None else StageTimer()
+        sizes = stage_sizes(top_k, self.reranker_config)
+
+        # 1. 查询向量与向量召回（查询向量在 graph 模式下供扩展候选重新打分复用）
+        if query_embedding is None:
+            stage_started = time.perf_counter()
+            query_embedding = self._embed_query(query)
+            timer.record("embedding", stage_started, observe=False)
+        stage_started = time.perf_counter()
+        results = self.collection.query(query_embeddings=[list(query_embedding)], n_results=sizes["recall"])
+        candidates = []
+        if results and results.get('ids') and results['ids'][0]:
+            for i in range(len(results['ids'][0])):
+                candidates.append({
+                    "id": results['ids'][0][i],
+                    "content": results['documents'][0][i],
+                    "metadata": results['metadatas'][0][i],
+                    "distance": results['distances'][0][i],
+                    "original_rank": i + 1
+                })
+        timer.record("vector_recall", stage_started, candidates=len(candidates))
+
+        if mode == "graph":
+            stage_started = time.perf_counter()
+            expanded = self._graph_expand(np.asarray(query_embedding, dtype=np.float32), candidates)
+            candidates.extend(expanded)
+            timer.record("graph_expand", stage_started, candidates=len(expanded))
+
+        # 2. 廉价预打分，裁剪送入 cross-encoder 的候选
+        stage_started = time.perf_counter()
+        scored = prescore(query, candidates, self.reranker_config.get("prescore_lexical_weight", 0.5))
+        survivors = scored[:sizes["prescore_keep"]]
+        timer.record("prescore", stage_started, candidates=len(scored), kept=len(survivors))
+
+        early_exit = is_decisive(scored, top_k, self.reranker_config.get("early_exit_margin"))
+        use_cross_encoder = not early_exit and self.load_reranker() is not None
+        return {
+            "query": query,
+            "top_k": top_k,
+            "mode": mode,
+            "survivors": survivors,
+            "early_exit": early_exit,
+            "use_cross_encoder": use_cross_encoder,
+            "timer": timer,
+            "started": started,
+            "degraded": [],
+        }
+
+    def _load_graph_index(self):
+        """返回题目-实体索引，知识图谱文件变化后重新加载；图谱尚未构建时返回 None。"""
+        return self._graph_index.get()
+
+    def _graph_expand(self, query_embedding: np.ndarray, candidates: list) -> list:
+        """
+        以排名靠前的向量命中为起点，在知识图谱中扩展到共享实体的相邻题目。
+
+        扩展题目的全部选项片段一次性从 Chroma 取回（含 embedding），按与查询向量的距离
+        重新打分，与向量命中使用同一距离度量，因此可以直接参与预打分与精排。
+
+        参数:
+            query_embedding (np.ndarray): 查询向量
+            candidates (list): 向量召回的候选
+
+        返回:
+            list: 新增的候选（不含已在向量命中中的片段），按距离升序
+        """
+        index = self._load_graph_index()
+        if index is None:
+            return []
+
+        seeds = {}
+        for c in candidates[:self.graph_config.get("seed_hits", 5)]:
+            metadata = c["metadata"] or {}
+            field = "question_id" if "question_id" in metadata else "编号"
+            if field not in metadata:
+                continue
+            weight = 1.0 / (1.0 + max(c["distance"], 0.0))
+            for row in index.rows_for(field, metadata[field], c["content"]):
+                seeds[row] = max(seeds.get(row, 0.0), weight)
+        neighbors = index.expand(
+            seeds,
+            max_hops=self.graph_config.get("max_hops", 1),
+            max_expansion=self.graph_config.get("max_expansion", 20),
+            max_entity_questions=self.graph_config.get("max_entity_questions", 50),
+            hop_decay=self.graph_config.get("hop_decay", 0.5),
+        ) if seeds else []
+        if not neighbors:
+            return []
+
+        # 按元数据字段分组，每组一次 get 取回扩展题目的所有选项片段
+        wanted = defaultdict(dict)  # 字段 -> 题目编号 -> (索引行, 图谱分数)
+        for row, score in neighbors:
+            wanted[metadata_field(index.sources[row])][index.qids[row]] = (row, score)
+        known = {c["id"] for c in candidates}
+        space = (self.collection.metadata or {}).get("hnsw:space", "l2")
+        expanded = []
+        for field, questions in wanted.items():
+            got = self.collection.get(where={field: {"$in": list(questions)}},
+                                      include=["documents", "metadatas", "embeddings"])
+            for doc_id, doc, metadata, embedding in zip(got["ids"], got["documents"], got["metadatas"],
+                                                        got["embeddings"]):
+                row, score = questions[str(metadata[field])]
+                # 同一编号可能属于另一个题库，用题干确认
+                if doc_id in known or (index.stems[row] and index.stems[row] not in doc):
+                    continue
+                known.add(doc_id)
+                expanded.append({
+                    "id": doc_id,
+                    "content": doc,
+                    "metadata": metadata,
+                    "distance": _vector_distance(query_embedding, np.asarray(embedding, dtype=np.float32), space),
+                    "graph_score": round(score, 4),
+                })
+        expanded.sort(key=lambda c: c["distance"])
+        for i, c in enumerate(expanded):
+            c["original_rank"] = len(candidates) + i + 1
+        return expanded
+
+    def _finish_rerank(self, plan: dict, scores) -> dict:
+        """
+        根据 cross-encoder 分数（为 None 时使用预打分）排序并组装精排响应。
+        """
+        survivors = plan["survivors"]
+        if scores is None:
+            for c in survivors:
+                c["rerank_score"] = c["prescore"]
+        else:
+            for c, s in zip(survivors, scores):
+                c["rerank_score"] = s
+
+        reranked = sorted(survivors, key=lambda x: x["rerank_score"], reverse=True)[:plan["top_k"]]
+        for i, c in enumerate(reranked):
+            c["final_rank"] = i + 1
+        elapsed = time.perf_counter() - plan["started"]
+        metrics.observe_latency("search_with_rerank", elapsed)
+        query_log.record(plan["query"], "search_with_rerank", elapsed * 1000, top_k=plan["top_k"],
+                         stages=plan["timer"].stages, result_ids=[c["id"] for c in reranked])
+
+        return {
+            "provider": self.config.EMBEDDING_PROVIDER,
+            "query": plan["query"],
+            "mode": plan["mode"],
+            "rerank_strategy": "qwen3-reranker" if scores is not None else "prescore",
+            "early_exit": plan["early_exit"],
+            "deadline_ms": plan.get("deadline_ms"),
+            "degraded": plan["degraded"],
+            "stages": plan["timer"].stages,
+            "results": reranked
+        }
+
+
+def _vector_distance(query: np.ndarray, embedding: np.ndarray, space: str) -> float:
+    """按集合的 hnsw:space 计算与 Chroma 查询结果一致的距离。"""
+    if space == "cosine":
+        denom = float(np.linalg.norm(query) * np.linalg.norm(embedding)) or 1.0
+        return 1.0 - float(np.dot(query, embedding)) / denom
+    if space == "ip":
+        return 1.0 - float(np.dot(query, embedding))
+    diff = query - embedding
+    return float(np.dot(diff, diff))
+
+
+def _question_group(metadata: dict):
+    """片段所属的题目（编号 / question_id 元数据），用于避免同一题的选项互相去重。"""
+    metadata = metadata or {}
+    for field in ("question_id", "编号"):
+        if field in metadata:
+            return f"{field}:{metadata[field]}"
+    return None
@@ -13,10 +13,89 @@ Cross-encoder模型通过直接对"查询-文档"对进行打分，比双塔模
     reranker = Qwen3Reranker()
     scores = reranker.rerank("查询文本", ["文档1", "文档2", "文档3"])
     # scores: [0.92, 0.45, 0.78] - 分数越高表示相关性越强
+
+    # 附带预分词存储时，按片段ID直接使用缓存的token ids
+    reranker = Qwen3Reranker(token_store=TokenStore("./chroma_db/rerank_tokens/exam_questions"))
+    scores = reranker.rerank("查询文本", chunks, chunk_ids=ids)
 """
 from transformers import AutoModelForCausalLM, AutoTokenizer
 import torch
 
+from . import metrics
+
+SYSTEM_PROMPT = "<|im_start|>system 请判断以下文档是否满足检索要求。<|im_end|>"
+INSTRUCTION = "判断文档与查询的语义相关性"
+MAX_LENGTH = 512
+
+
+class RerankerPromptEncoder:
+    """
+    精排输入的分段编码器
+
+    提示词被拆成固定的前缀、查询、连接段、文档与后缀五部分，固定部分只编码一次，
+    文档部分可以直接使用预分词存储中的token ids，查询每次请求只编码一次。
+    只依赖分词器，因此也可以在不加载模型的进程中用于构建预分词存储。
+
+    分段拼接的结果必须与对完整提示词分词一致。分词器的预切分会把"："与其后的文字切成一段，
+    因此切分点放在"："之前，"："随查询与文档一起编码。
+    """
+
+    def __init__(self, tokenizer, max_length=MAX_LENGTH):
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        self.prefix_ids = self._encode(f"{SYSTEM_PROMPT}<|im_start|>user 指令：{INSTRUCTION} 查询")
+        self.middle_ids = self._encode(" 文档")
+        self.suffix_ids = self._encode("<|im_end|>")
+        pad_id = tokenizer.pad_token_id
+        self.pad_id = pad_id if pad_id is not None else tokenizer.eos_token_id or 0
+
+    @classmethod
+    def from_pretrained(cls, model_name):
+        """只加载分词器构建编码器。"""
+        return cls(AutoTokenizer.from_pretrained(model_name))
+
+    def _encode(self, text):
+        return self.tokenizer(text, add_special_tokens=False)["input_ids"]
+
+    def encode_chunks(self, chunks):
+        """
+        批量编码文档片段
+
+        Args:
+            chunks (list): 文档片段文本列表
+
+        Returns:
+            list: 每个片段的token ids（以连接段末尾的"："开头）
+        """
+        if not chunks:
+            return []
+        return self.tokenizer([f"：{chunk}" for chunk in chunks], add_special_tokens=False)["input_ids"]
+
+    def build_batch(self, query, chunk_token_lists):
+        """
+        拼接查询与各文档的token ids，左侧填充为批量张量
+
+        超长时只截断文档部分，保证后缀始终保留在最后一个位置（打分读取最后一个token）。
+
+        Args:
+            query (str): 用户查询
+            chunk_token_lists (list): 每个文档片段的token ids
+
+        Returns:
+            dict: 包含input_ids与attention_mask的张量
+        """
+        head = self.prefix_ids + self._encode(f"：{query}") + self.middle_ids
+        budget = max(self.max_length - len(head) - len(self.suffix_ids), 0)
+        sequences = [head + list(tokens[:budget]) + self.suffix_ids for tokens in chunk_token_lists]
+        width = max(len(seq) for seq in sequences)
+        input_ids = [[self.pad_id] * (width - len(seq)) + seq for seq in sequences]
+        attention_mask = [[0] * (width - len(seq)) + [1] * len(seq) for seq in sequences]
+        return {
+            "input_ids": torch.tensor(input_ids, dtype=torch.long),
+            "attention_mask": torch.tensor(attention_mask, dtype=torch.long),
+        }
+
+
 class Qwen3Reranker:
     """
     Qwen3-Reranker Cross-Encoder 重排序器
@@ -25,16 +104,19 @@ class Qwen3Reranker:
     支持本地量化模型，显存占用低，推理速度快。
     """
     
-    def __init__(self, model_name="Qwen3-Reranker-4B:Q4_K_M", device=None):
+    def __init__(self, model_name="Qwen3-Reranker-4B:Q4_K_M", device=None, token_store=None):
         """
         初始化Qwen3-Reranker模型
         
         Args:
             model_name (str): 模型名称，默认使用量化版本
             device (str): 设备类型，None表示自动选择
+            token_store (TokenStore): 可选的预分词文档存储，命中时跳过文档分词
         """
         print(f"正在加载Qwen3-Reranker模型: {model_name}")
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.encoder = RerankerPromptEncoder(self.tokenizer)
+        self.token_store = token_store
         self.model = AutoModelForCausalLM.from_pretrained(
             model_name,
             device_map="auto" if device is None else device,
@@ -58,35 +140,47 @@ class Qwen3Reranker:
         Returns:
             str: 格式化的输入文本
         """
-        system_prompt = "<|im_start|>system 请判断以下文档是否满足检索要求。<|im_end|>"
-        instruction = "判断文档与查询的语义相关性"
-        return f"{system_prompt}<|im_start|>user 指令：{instruction} 查询：{query} 文档：{chunk}<|im_end|>"
+        return f"{SYSTEM_PROMPT}<|im_start|>user 指令：{INSTRUCTION} 查询：{query} 文档：{chunk}<|im_end|>"
 
-    def rerank(self, query, chunks):
+    def encode_chunks(self, chunks):
+        """批量编码文档片段，供构建预分词存储使用。"""
+        return self.encoder.encode_chunks(chunks)
+
+    def rerank(self, query, chunks, chunk_ids=None):
         """
         对候选文档进行重排序打分
         
         Args:
             query (str): 用户查询
             chunks (list): 候选文档列表
+            chunk_ids (list): 可选的候选片段ID，配合token_store使用缓存的token ids
             
         Returns:
             list: 相关性分数列表，分数越高表示相关性越强
         """
-        # 构建所有输入
-        inputs = [self.build_input(query, chunk) for chunk in chunks]
-        
-        # 批量编码
-        encodings = self.tokenizer(
-            inputs, 
-            return_tensors="pt", 
-            padding=True, 
-            truncation=True, 
-            max_length=512
-        ).to(self.model.device)
+        if not chunks:
+            return []
+
+        with metrics.timer("rerank_tokenize"):
+            # 优先使用预分词存储，只对未命中的片段分词
+            if self.token_store is not None and chunk_ids is not None:
+                chunk_tokens = self.token_store.get_many(chunk_ids)
+            else:
+                chunk_tokens = [None] * len(chunks)
+            missing = [i for i, tokens in enumerate(chunk_tokens) if tokens is None]
+            if self.token_store is not None:
+                metrics.cache_access("rerank_tokens", hit=True, count=len(chunks) - len(missing))
+                metrics.cache_access("rerank_tokens", hit=False, count=len(missing))
+            if missing:
+                for i, tokens in zip(missing, self.encoder.encode_chunks([chunks[i] for i in missing])):
+                    chunk_tokens[i] = tokens
+
+            # 拼接查询与文档token并批量编码
+            encodings = {k: v.to(self.model.device) for k, v in self.encoder.build_batch(query, chunk_tokens).items()}
         
         # 推理
-        with torch.no_grad():
+        metrics.observe_batch("rerank_forward", len(chunks))
+        with metrics.timer("rerank_forward"), torch.no_grad():
             outputs = self.model(**encodings)
             logits = outputs.logits[:, -1, :]  # 取每个输入最后一个token的logits
         
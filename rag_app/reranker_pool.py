@@ -0,0 +1,365 @@
+"""
+Qwen3-Reranker 进程池模块
+
+将 cross-encoder 的前向推理放到一个或多个独立的工作进程中运行，API 进程只负责
+投递任务并异步等待结果，因此 PyTorch 推理不会阻塞 FastAPI 的事件循环。
+
+传输方式：
+- 每个请求分配一块共享内存，布局为 [n 个 float32 分数][uint32 文本数][uint32 偏移表][UTF-8 文本]
+  其中文本依次为查询与各候选片段，工作进程把分数直接写回同一块共享内存
+- IPC 队列中只传递请求 ID 与共享内存名称
+
+健康检查：工作进程在任务循环中发送心跳（空闲时定期发送，每完成一个请求也视为一次心跳），
+卡在前向推理中的进程因此会表现为心跳超时。监督线程发现进程退出或心跳超时后会重启该进程，
+并让其未完成的请求以异常结束。
+
+使用示例：
+    pool = RerankerPool(num_workers=2)
+    scores = pool.rerank("查询文本", ["文档1", "文档2"])
+    scores = await pool.arerank("查询文本", ["文档1", "文档2"])
+"""
+
+import asyncio
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import struct
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional
+
+_UINT32 = struct.Struct("<I")
+
+
+def _pack_texts(texts: List[str], n_scores: int) -> shared_memory.SharedMemory:
+    """
+    把文本写入一块新的共享内存，并在头部预留 n_scores 个 float32 分数的位置。
+    """
+    encoded = [t.encode("utf-8") for t in texts]
+    offsets = [0]
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    header = 4 * n_scores + 4 + 4 * len(offsets)
+    shm = shared_memory.SharedMemory(create=True, size=max(header + offsets[-1], 1))
+    pos = 4 * n_scores
+    _UINT32.pack_into(shm.buf, pos, len(texts))
+    struct.pack_into(f"<{len(offsets)}I", shm.buf, pos + 4, *offsets)
+    shm.buf[header:header + offsets[-1]] = b"".join(encoded)
+    return shm
+
+
+def _unpack_texts(buf, n_scores: int) -> List[str]:
+    """从共享内存中读出 _pack_texts 写入的文本列表。"""
+    pos = 4 * n_scores
+    count = _UINT32.unpack_from(buf, pos)[0]
+    offsets = struct.unpack_from(f"<{count + 1}I", buf, pos + 4)
+    base = pos + 4 + 4 * (count + 1)
+    return [bytes(buf[base + offsets[i]:base + offsets[i + 1]]).decode("utf-8") for i in range(count)]
+
+
+def _default_factory(model_name: str, token_store_path: Optional[str] = None):
+    """在工作进程中加载 Qwen3-Reranker，并按需打开只读的预分词存储。"""
+    from .reranker import Qwen3Reranker
+    from .token_store import TokenStore
+    token_store = TokenStore(token_store_path) if token_store_path else None
+    return Qwen3Reranker(model_name=model_name, token_store=token_store)
+
+
+def _worker_main(index: int, factory: Callable, factory_args: tuple, tasks, results, heartbeat_interval: float):
+    """
+    工作进程入口：加载精排模型后循环处理任务，任务为 (request_id, shm_name, n_chunks, chunk_ids)，
+    收到 None 时退出。
+
+    加载模型期间由后台线程发送心跳；进入任务循环后只在循环中发送，前向推理卡住时心跳随之停止。
+    """
+    loaded = threading.Event()
+
+    def heartbeat():
+        while not loaded.wait(heartbeat_interval):
+            results.put(("heartbeat", index, time.time()))
+
+    results.put(("heartbeat", index, time.time()))
+    threading.Thread(target=heartbeat, daemon=True).start()
+    try:
+        reranker = factory(*factory_args)
+    finally:
+        loaded.set()
+    results.put(("ready", index, os.getpid()))
+
+    while True:
+        try:
+            task = tasks.get(timeout=heartbeat_interval)
+        except queue.Empty:
+            results.put(("heartbeat", index, time.time()))
+            continue
+        if task is None:
+            break
+        request_id, shm_name, n_chunks, chunk_ids = task
+        error = None
+        try:
+            shm = shared_memory.SharedMemory(name=shm_name)
+        except FileNotFoundError:
+            # 请求已被 API 进程取消并回收
+            continue
+        try:
+            texts = _unpack_texts(shm.buf, n_chunks)
+            if chunk_ids is None:
+                scores = reranker.rerank(texts[0], texts[1:])
+            else:
+                scores = reranker.rerank(texts[0], texts[1:], chunk_ids=chunk_ids)
+            struct.pack_into(f"<{n_chunks}f", shm.buf, 0, *scores)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            shm.close()
+        results.put(("done", index, request_id, error))
+
+
+class _WorkerHandle:
+    """API 进程中对单个工作进程的记录。"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process = None
+        self.tasks = None
+        self.pid = None
+        self.ready = False
+        self.started_at = 0.0
+        self.last_heartbeat = 0.0
+        self.inflight = set()
+        self.restarts = 0
+
+
+class RerankerPool:
+    """
+    Qwen3-Reranker 工作进程池
+
+    与 Qwen3Reranker 提供相同的 rerank(query, chunks) 接口，并额外提供可在事件循环中
+    直接 await 的 arerank。
+    """
+
+    def __init__(self, num_workers: int = 1, model_name: str = "Qwen3-Reranker-4B:Q4_K_M",
+                 request_timeout: float = 60.0, heartbeat_interval: float = 5.0,
+                 heartbeat_timeout: float = 30.0, token_store_path: Optional[str] = None,
+                 factory: Optional[Callable] = None, factory_args: Optional[tuple] = None):
+        """
+        初始化并启动工作进程
+
+        Args:
+            num_workers (int): 工作进程数量
+            model_name (str): 精排模型名称
+            request_timeout (float): 单个请求等待结果的超时时间（秒）
+            heartbeat_interval (float): 工作进程空闲时发送心跳的间隔（秒）
+            heartbeat_timeout (float): 超过该时间未收到心跳则认为进程挂死并重启（秒），
+                同时也是单次前向推理允许的最长时间
+            token_store_path (str): 预分词存储目录，工作进程以只读方式打开
+            factory (Callable): 在工作进程中构造精排器的可 pickle 函数，默认加载 Qwen3Reranker
+            factory_args (tuple): 传给 factory 的参数，默认 (model_name, token_store_path)
+        """
+        if num_workers < 1:
+            raise ValueError("num_workers 必须大于 0")
+        print(f"正在启动 {num_workers} 个Qwen3-Reranker工作进程...")
+        self.request_timeout = request_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self._factory = factory or _default_factory
+        self._factory_args = factory_args if factory_args is not None else (model_name, token_store_path)
+        self._ctx = mp.get_context("spawn")
+        self._results = self._ctx.Queue()
+        self._pending: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._closed = False
+
+        self._workers = [_WorkerHandle(i) for i in range(num_workers)]
+        for worker in self._workers:
+            self._start_worker(worker)
+
+        self._listener = threading.Thread(target=self._listen, name="reranker-pool-listener", daemon=True)
+        self._listener.start()
+        self._supervisor = threading.Thread(target=self._supervise, name="reranker-pool-supervisor", daemon=True)
+        self._supervisor.start()
+
+    # ------------------------------------------------------------------
+    # 对外接口
+    # ------------------------------------------------------------------
+    def submit(self, query: str, chunks: List[str], chunk_ids: Optional[List[str]] = None) -> Future:
+        """
+        投递一个精排请求，返回 concurrent.futures.Future，结果为分数列表。
+
+        chunk_ids 会随任务一起发送，工作进程据此从预分词存储读取文档 token ids。
+        """
+        future = Future()
+        if not chunks:
+            future.set_result([])
+            return future
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("RerankerPool 已关闭")
+            alive = [w for w in self._workers if w.process is not None and w.process.is_alive()]
+            if not alive:
+                raise RuntimeError("没有可用的Qwen3-Reranker工作进程")
+            worker = min(alive, key=lambda w: (not w.ready, len(w.inflight)))
+            request_id = next(self._ids)
+            shm = _pack_texts([query] + list(chunks), len(chunks))
+            self._pending[request_id] = (future, shm, worker.index, len(chunks))
+            worker.inflight.add(request_id)
+            worker.tasks.put((request_id, shm.name, len(chunks), list(chunk_ids) if chunk_ids else None))
+        return future
+
+    def rerank(self, query: str, chunks: List[str], chunk_ids: Optional[List[str]] = None) -> List[float]:
+        """同步等待精排结果，供脚本或线程池中调用。"""
+        return self.submit(query, chunks, chunk_ids).result(timeout=self.request_timeout)
+
+    async def arerank(self, query: str, chunks: List[str], chunk_ids: Optional[List[str]] = None) -> List[float]:
+        """在事件循环中异步等待精排结果，不阻塞其他请求。"""
+        future = self.submit(query, chunks, chunk_ids)
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.request_timeout)
+
+    def health(self) -> Dict:
+        """
+        返回工作进程池的健康状态
+
+        Returns:
+            dict: 包含每个工作进程的 pid、存活/就绪状态、在途请求数、重启次数和心跳间隔
+        """
+        now = time.time()
+        with self._lock:
+            workers = [{
+                "index": w.index,
+                "pid": w.pid,
+                "alive": w.process is not None and w.process.is_alive(),
+                "ready": w.ready,
+                "inflight": len(w.inflight),
+                "restarts": w.restarts,
+                "seconds_since_heartbeat": round(now - w.last_heartbeat, 3) if w.last_heartbeat else None,
+            } for w in self._workers]
+            pending = len(self._pending)
+        return {
+            "healthy": all(w["alive"] for w in workers),
+            "ready_workers": sum(1 for w in workers if w["ready"]),
+            "pending_requests": pending,
+            "workers": workers,
+        }
+
+    def close(self):
+        """停止所有工作进程并让未完成的请求以异常结束。"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            for worker in self._workers:
+                if worker.tasks is not None:
+                    worker.tasks.put(None)
+        for worker in self._workers:
+            if worker.process is not None:
+                worker.process.join(timeout=5)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+        with self._lock:
+            for request_id in list(self._pending):
+                self._fail(request_id, RuntimeError("RerankerPool 已关闭"))
+        self._results.put(None)
+
+    # ------------------------------------------------------------------
+    # 内部实现
+    # ------------------------------------------------------------------
+    def _start_worker(self, worker: _WorkerHandle):
+        worker.tasks = self._ctx.Queue()
+        worker.ready = False
+        worker.started_at = time.time()
+        worker.last_heartbeat = 0.0
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker.index, self._factory, self._factory_args, worker.tasks,
+                  self._results, self.heartbeat_interval),
+            name=f"reranker-worker-{worker.index}",
+            daemon=True,
+        )
+        worker.process.start()
+        worker.pid = worker.process.pid
+
+    def _fail(self, request_id: int, error: Exception):
+        """在持有锁的情况下让一个请求以异常结束并回收其共享内存。"""
+        future, shm, worker_index, _ = self._pending.pop(request_id)
+        self._workers[worker_index].inflight.discard(request_id)
+        shm.close()
+        shm.unlink()
+        if not future.done():
+            future.set_exception(error)
+
+    def _listen(self):
+        while True:
+            message = self._results.get()
+            if message is None:
+                return
+            kind, index = message[0], message[1]
+            with self._lock:
+                worker = self._workers[index]
+                if kind == "heartbeat":
+                    worker.last_heartbeat = message[2]
+                elif kind == "ready":
+                    worker.ready = True
+                    worker.pid = message[2]
+                    print(f"Qwen3-Reranker工作进程 {index} (pid={worker.pid}) 已就绪")
+                elif kind == "done":
+                    # 完成一个请求说明任务循环仍在运转
+                    worker.last_heartbeat = time.time()
+                    _, _, request_id, error = message
+                    entry = self._pending.pop(request_id, None)
+                    if entry is None:
+                        continue
+                    future, shm, _, n_scores = entry
+                    worker.inflight.discard(request_id)
+                    scores = None if error else list(struct.unpack_from(f"<{n_scores}f", shm.buf, 0))
+                    shm.close()
+                    shm.unlink()
+                    if future.done():
+                        continue
+                    if error:
+                        future.set_exception(RuntimeError(f"Qwen3-Reranker工作进程出错: {error}"))
+                    else:
+                        future.set_result(scores)
+
+    def _supervise(self):
+        while True:
+            time.sleep(self.heartbeat_interval)
+            stopped = []
+            with self._lock:
+                if self._closed:
+                    return
+                now = time.time()
+                for worker in self._workers:
+                    if worker.process is None:
+                        continue
+                    alive = worker.process.is_alive()
+                    last_seen = worker.last_heartbeat or worker.started_at
+                    if alive and now - last_seen <= self.heartbeat_timeout:
+                        continue
+                    reason = "已退出" if not alive else "心跳超时"
+                    print(f"Qwen3-Reranker工作进程 {worker.index} {reason}，正在重启...")
+                    if alive:
+                        worker.process.terminate()
+                    stopped.append((worker, worker.process))
+                    # 重启前不再向该进程投递请求
+                    worker.process = None
+                    worker.ready = False
+                    for request_id in list(worker.inflight):
+                        self._fail(request_id, RuntimeError(f"Qwen3-Reranker工作进程{reason}"))
+            if not stopped:
+                continue
+            # 在锁外等待旧进程退出，避免阻塞请求投递与结果监听
+            for _, process in stopped:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.kill()
+                    process.join()
+            with self._lock:
+                if self._closed:
+                    return
+                for worker, _ in stopped:
+                    worker.restarts += 1
+                    self._start_worker(worker)
@@ -0,0 +1,82 @@
+"""
+响应模块 - 基于 orjson 的快速 JSON 序列化、检索结果字段投影与响应压缩
+
+- FastJSONResponse：用 orjson 序列化（支持 numpy 标量与数组），序列化耗时计入 serialize 阶段指标；
+  处理函数直接返回该响应时还可跳过 FastAPI 的 jsonable_encoder
+- project_results：按请求中的 fields 只保留检索结果的部分字段（如只要 ID 与分数、不要元数据），
+  题库每个选项行都重复携带 question_text 等元数据，投影后负载可以小很多
+- CompressionMiddleware：超过 compression_min_size 字节的响应按客户端的 Accept-Encoding
+  使用 gzip 压缩；RESPONSE_CONFIG["brotli"] 开启且安装了可选依赖 brotli-asgi 时优先使用 brotli。
+  SSE 等流式路径不压缩
+"""
+
+from typing import Any, Dict, Iterable, Optional
+
+import orjson
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import JSONResponse
+
+from . import config, metrics
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:  # brotli 为可选依赖，未安装时只使用 gzip
+    BrotliMiddleware = None
+
+# 检索结果中可投影的字段（/search 与 /search/reranked 的结果字段并集）
+SEARCH_RESULT_FIELDS = ("id", "content", "metadata", "distance", "original_rank", "graph_score",
+                        "prescore", "rerank_score", "final_rank")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    orjson 序列化的 JSON 响应，支持 numpy 类型与非字符串键。
+    """
+
+    def render(self, content: Any) -> bytes:
+        with metrics.timer("serialize"):
+            return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+def project_results(response: Dict[str, Any], fields: Optional[Iterable[str]]) -> Dict[str, Any]:
+    """
+    只保留检索结果中 fields 列出的字段，其余顶层字段（query、stages 等）不变。
+
+    参数:
+        response (Dict): search / search_with_rerank 的返回值
+        fields (Iterable[str]): 要保留的结果字段；None 时原样返回
+
+    返回:
+        Dict: 投影后的响应
+    """
+    if fields is None:
+        return response
+    keep = tuple(fields)
+    results = [{k: r[k] for k in keep if k in r} for r in response.get("results", [])]
+    return {**response, "results": results}
+
+
+class CompressionMiddleware:
+    """
+    按 Accept-Encoding 压缩较大的响应：开启 RESPONSE_CONFIG["brotli"] 且安装了 brotli-asgi 时优先 brotli，否则 gzip。
+    RESPONSE_CONFIG["uncompressed_paths"] 中的路径（如 SSE 推送）直接透传。
+    """
+
+    def __init__(self, app, minimum_size: Optional[int] = None, uncompressed_paths: Optional[Iterable[str]] = None):
+        response_config = getattr(config, "RESPONSE_CONFIG", {})
+        minimum_size = minimum_size if minimum_size is not None else response_config.get("compression_min_size", 1024)
+        self.app = app
+        self.uncompressed_paths = set(uncompressed_paths if uncompressed_paths is not None
+                                      else response_config.get("uncompressed_paths", []))
+        if BrotliMiddleware is not None and response_config.get("brotli", False):
+            self.compressed = BrotliMiddleware(app, quality=response_config.get("brotli_quality", 4),
+                                               minimum_size=minimum_size, gzip_fallback=True)
+        else:
+            self.compressed = GZipMiddleware(app, minimum_size=minimum_size,
+                                             compresslevel=response_config.get("gzip_level", 6))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") in self.uncompressed_paths:
+            await self.app(scope, receive, send)
+            return
+        await self.compressed(scope, receive, send)
@@ -0,0 +1,63 @@
+"""
+请求合并模块 - 相同的并发检索请求共享同一次计算（single-flight）
+
+考试开始时，大量客户端会在同一秒内提交完全相同的题目。每个请求各自计算 embedding、
+查询向量库、运行 cross-encoder 是纯粹的浪费。SingleFlight 以“规范化查询 + 参数”为键：
+某个键已有计算在进行时，后到的请求直接等待这次计算的结果，不再重复执行，
+等待者的数量计入 rag_coalesced_requests_total 指标。
+
+计算在独立的任务中运行，发起它的请求被取消（客户端断开）时，其他等待者仍能拿到结果。
+"""
+
+import asyncio
+import unicodedata
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from . import metrics
+
+
+def normalize_query(query: str) -> str:
+    """规范化查询文本：全角/半角统一（NFKC）、合并空白、忽略大小写。"""
+    return " ".join(unicodedata.normalize("NFKC", query).split()).casefold()
+
+
+class SingleFlight:
+    """
+    按键合并同一事件循环中的并发异步调用。
+    """
+
+    def __init__(self, name: str):
+        """
+        参数:
+            name (str): 名称（指标标签）
+        """
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Tuple[Any, bool]:
+        """
+        执行 fn(*args, **kwargs)；相同 key 的调用正在进行时等待它的结果。
+
+        返回:
+            Tuple[Any, bool]: (结果, 是否为合并的等待者)。异常同样会传给所有等待者
+        """
+        task = self._calls.get(key)
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            metrics.record_coalesced(self.name)
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(fn(*args, **kwargs))
+        self._calls[key] = task
+        task.add_done_callback(lambda t: self._forget(key, t))
+        return await asyncio.shield(task), False
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # 所有等待者都已取消时，避免“异常未被获取”的警告
+            task.exception()
+
+    def inflight(self) -> int:
+        """当前正在进行的计算数量。"""
+        return len(self._calls)
@@ -0,0 +1,168 @@
+"""
+流式概要数据结构 - 以固定内存对元数据字段做画像
+
+- HyperLogLog: 近似去重计数，内存为 2^p 字节，与数据量无关
+- SpaceSaving: 近似 Top-N 高频值，最多跟踪 capacity 个取值
+- FieldProfile: 组合两者，描述单个元数据字段
+
+所有结构都可以序列化为 JSON 友好的字典，用于持久化增量统计。
+"""
+
+import base64
+import hashlib
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    """
+    HyperLogLog 近似去重计数器，标准误差约为 1.04 / sqrt(2^p)。
+    """
+
+    def __init__(self, p: int = 12):
+        if not 4 <= p <= 16:
+            raise ValueError("p 必须在 4 到 16 之间")
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    def add(self, value: str):
+        x = _hash64(value)
+        index = x >> (64 - self.p)
+        rest = x & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog"):
+        if other.p != self.p:
+            raise ValueError("只能合并精度相同的 HyperLogLog")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self) -> int:
+        """返回去重数量的估计值。"""
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"p": self.p, "registers": base64.b64encode(bytes(self.registers)).decode("ascii")}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HyperLogLog":
+        hll = cls(data["p"])
+        hll.registers = bytearray(base64.b64decode(data["registers"]))
+        return hll
+
+
+class SpaceSaving:
+    """
+    Space-Saving 高频值概要：最多跟踪 capacity 个取值，计数的高估量不超过 error。
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.capacity = capacity
+        self.counters: Dict[str, List[int]] = {}  # 取值 -> [计数, 误差上界]
+
+    def add(self, value: str, weight: int = 1):
+        counter = self.counters.get(value)
+        if counter is not None:
+            counter[0] += weight
+        elif len(self.counters) < self.capacity:
+            self.counters[value] = [weight, 0]
+        else:
+            victim = min(self.counters, key=lambda k: self.counters[k][0])
+            floor = self.counters.pop(victim)[0]
+            self.counters[value] = [floor + weight, floor]
+
+    def remove(self, value: str, weight: int = 1):
+        """删除时尽量修正计数（只能修正仍被跟踪的取值）。"""
+        counter = self.counters.get(value)
+        if counter is None:
+            return
+        counter[0] -= weight
+        if counter[0] <= 0:
+            del self.counters[value]
+
+    def top(self, n: int) -> List[Tuple[str, int, int]]:
+        """返回 (取值, 计数, 误差上界) 列表，按计数降序。"""
+        items = sorted(self.counters.items(), key=lambda kv: kv[1][0], reverse=True)[:n]
+        return [(value, c[0], c[1]) for value, c in items]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"capacity": self.capacity, "counters": self.counters}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SpaceSaving":
+        sketch = cls(data["capacity"])
+        sketch.counters = {k: list(v) for k, v in data["counters"].items()}
+        return sketch
+
+
+class FieldProfile:
+    """
+    单个元数据字段的有界画像：出现次数、近似去重数与 Top-N 高频值。
+    """
+
+    def __init__(self, hll_precision: int = 12, top_capacity: int = 64):
+        self.occurrences = 0
+        self.removals = 0
+        self.distinct = HyperLogLog(hll_precision)
+        self.heavy_hitters = SpaceSaving(top_capacity)
+
+    def add(self, value: Any):
+        key = str(value)
+        self.occurrences += 1
+        self.distinct.add(key)
+        self.heavy_hitters.add(key)
+
+    def remove(self, value: Any):
+        self.occurrences = max(self.occurrences - 1, 0)
+        self.removals += 1
+        self.heavy_hitters.remove(str(value))
+
+    def summary(self, top_n: int = 10, max_value_length: Optional[int] = 100) -> Dict[str, Any]:
+        """
+        返回可直接序列化给前端的字段统计，大小只取决于 top_n 与 max_value_length。
+        """
+        def clip(value: str) -> str:
+            if max_value_length and len(value) > max_value_length:
+                return value[:max_value_length] + "…"
+            return value
+
+        top = [{"value": clip(v), "count": c, "max_overcount": e}
+               for v, c, e in self.heavy_hitters.top(top_n)]
+        return {
+            "unique_values": min(self.distinct.count(), self.occurrences),
+            "unique_values_approximate": True,
+            "total_occurrences": self.occurrences,
+            "most_common": (top[0]["value"], top[0]["count"]) if top else None,
+            "top_values": top,
+            # HyperLogLog 不支持删除，发生删除后去重数只能作为上界
+            "unique_values_upper_bound": self.removals > 0,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "occurrences": self.occurrences,
+            "removals": self.removals,
+            "distinct": self.distinct.to_dict(),
+            "heavy_hitters": self.heavy_hitters.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FieldProfile":
+        profile = cls()
+        profile.occurrences = data["occurrences"]
+        profile.removals = data.get("removals", 0)
+        profile.distinct = HyperLogLog.from_dict(data["distinct"])
+        profile.heavy_hitters = SpaceSaving.from_dict(data["heavy_hitters"])
+        return profile
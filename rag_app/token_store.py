@@ -0,0 +1,253 @@
+"""
+预分词文档存储 - 为精排缓存知识片段的 token ids
+
+知识片段在入库后不会再变化，因此在 build_from_csv 时一次性把片段文本分词，
+精排时直接拼接缓存的 token 数组与查询的 token，省去热路径上的重复分词。
+
+存储布局（位于 CHROMA_PATH 旁的独立目录），两个文件都只追加写：
+- tokens.bin: 所有片段的 token ids，按 uint32 紧凑地顺序追加
+- ids.log: 每行一条记录，"片段ID\t起始位置\ttoken 数量" 表示写入，"片段ID\t-" 表示移除；
+  close() 时把日志压缩为只含有效片段的版本
+
+写入一批片段只追加这批的记录，入库的总写入量与片段数成线性关系。
+"""
+
+import os
+import sys
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence
+
+# 旧版布局的索引文件；其中的 token ids 按旧的提示词切分方式编码，打开时直接丢弃
+_LEGACY_INDEX = "index.json"
+
+
+class TokenStore:
+    """
+    以片段 ID 为键、数组为后端的 token ids 存储。
+
+    写入只发生在知识库构建时（追加写）；读取方（包括精排工作进程）在遇到未知 ID 时
+    会检查日志是否更新并读取新增的记录。
+    """
+
+    def __init__(self, path: str):
+        """
+        参数:
+            path (str): 存储目录，不存在时自动创建
+        """
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+        self._tokens_file = os.path.join(self.path, "tokens.bin")
+        self._log_file = os.path.join(self.path, "ids.log")
+        self._lock = threading.Lock()
+        self._tokens = array("I")
+        # 片段 ID -> 行号，行号索引起始位置与长度数组
+        self._rows: Dict[str, int] = {}
+        self._starts = array("Q")
+        self._lengths = array("I")
+        self._records = 0
+        self._log_pos = 0
+        self._log_signature = None
+        self.hits = 0
+        self.misses = 0
+        self._drop_legacy()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._rows
+
+    def _drop_legacy(self):
+        """删除旧版布局（index.json）留下的文件，对应片段会在下次构建知识库时重新预分词。"""
+        legacy = os.path.join(self.path, _LEGACY_INDEX)
+        if not os.path.exists(legacy) or os.path.exists(self._log_file):
+            return
+        for file in (legacy, self._tokens_file):
+            try:
+                os.remove(file)
+            except FileNotFoundError:
+                pass
+        print(f"已丢弃旧版预分词存储: {self.path}")
+
+    def _signature(self):
+        stat = os.stat(self._log_file)
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def _load(self):
+        """从磁盘完整加载 token 数组与索引。"""
+        self._tokens = array("I")
+        self._rows, self._starts, self._lengths = {}, array("Q"), array("I")
+        self._records = 0
+        self._log_pos = 0
+        self._log_signature = None
+        if os.path.exists(self._log_file):
+            self._read_tail()
+
+    def _read_tail(self):
+        """读取日志与 token 文件中上次读取之后追加的部分。"""
+        signature = self._signature()
+        with open(self._log_file, "rb") as f:
+            f.seek(self._log_pos)
+            data = f.read()
+        # 只消费完整的行，末尾可能是写入到一半的记录
+        complete = data.rfind(b"\n") + 1
+        for line in data[:complete].decode("utf-8").splitlines():
+            self._apply(line)
+        self._log_pos += complete
+        self._log_signature = signature
+
+        appended = array("I")
+        if not os.path.exists(self._tokens_file):
+            return
+        with open(self._tokens_file, "rb") as f:
+            f.seek(len(self._tokens) * self._tokens.itemsize)
+            data = f.read()
+        appended.frombytes(data[:len(data) - len(data) % appended.itemsize])
+        if sys.byteorder != "little":
+            appended.byteswap()
+        self._tokens.extend(appended)
+
+    def _apply(self, line: str):
+        """把一条日志记录应用到内存索引。"""
+        fields = line.rsplit("\t", 2)
+        if len(fields) == 2 and fields[1] == "-":
+            self._rows.pop(fields[0], None)
+            self._records += 1
+        elif len(fields) == 3 and fields[1].isdigit() and fields[2].isdigit():
+            self._rows[fields[0]] = len(self._starts)
+            self._starts.append(int(fields[1]))
+            self._lengths.append(int(fields[2]))
+            self._records += 1
+
+    def refresh(self) -> bool:
+        """
+        如果日志已被其他进程更新则读取新增记录（日志被压缩重写时完整重新加载）。
+
+        返回:
+            bool: 是否读取了更新
+        """
+        if not os.path.exists(self._log_file):
+            return False
+        with self._lock:
+            signature = self._signature()
+            if signature == self._log_signature:
+                return False
+            if self._log_signature is None or signature[0] != self._log_signature[0] \
+                    or signature[1] < self._log_pos:
+                self._load()
+            else:
+                self._read_tail()
+        return True
+
+    def _append_log(self, lines: List[str]):
+        """追加日志记录；调用方需持有锁。"""
+        payload = "".join(line + "\n" for line in lines).encode("utf-8")
+        with open(self._log_file, "ab") as f:
+            # 上次异常退出可能留下半行记录，另起一行避免与之粘连
+            if f.tell() != self._log_pos:
+                payload = b"\n" + payload
+            f.write(payload)
+            self._log_pos = f.tell()
+        self._log_signature = self._signature()
+
+    def put_many(self, chunk_ids: Sequence[str], token_lists: Iterable[Sequence[int]]):
+        """
+        追加写入一批片段的 token ids，已存在的片段 ID 会被跳过。
+
+        参数:
+            chunk_ids (Sequence[str]): 片段 ID 列表
+            token_lists (Iterable[Sequence[int]]): 与 chunk_ids 一一对应的 token ids
+        """
+        with self._lock:
+            appended = array("I")
+            start = len(self._tokens)
+            lines = []
+            for chunk_id, tokens in zip(chunk_ids, token_lists):
+                if chunk_id in self._rows:
+                    continue
+                offset = start + len(appended)
+                self._apply(f"{chunk_id}\t{offset}\t{len(tokens)}")
+                lines.append(f"{chunk_id}\t{offset}\t{len(tokens)}")
+                appended.extend(tokens)
+            if not lines:
+                return
+            self._tokens.extend(appended)
+            on_disk = appended
+            if sys.byteorder != "little":
+                on_disk = array("I", appended)
+                on_disk.byteswap()
+            # 先写 token 再写日志：读取方看到的每条记录都指向已落盘的 token
+            with open(self._tokens_file, "ab") as f:
+                f.write(on_disk.tobytes())
+            self._append_log(lines)
+
+    def discard(self, chunk_ids: Sequence[str]):
+        """
+        从索引中移除片段（对应的 token 数据保留在文件中，不再被引用）。
+        """
+        with self._lock:
+            removed = [chunk_id for chunk_id in chunk_ids if chunk_id in self._rows]
+            if not removed:
+                return
+            lines = [f"{chunk_id}\t-" for chunk_id in removed]
+            for line in lines:
+                self._apply(line)
+            self._append_log(lines)
+
+    def compact(self):
+        """把日志重写为只包含有效片段的版本（已移除片段的记录与 token 引用被丢弃）。"""
+        with self._lock:
+            if self._records == len(self._rows):
+                return
+            lines = [f"{chunk_id}\t{self._starts[row]}\t{self._lengths[row]}"
+                     for chunk_id, row in self._rows.items()]
+            tmp_file = self._log_file + ".tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                f.writelines(line + "\n" for line in lines)
+            os.replace(tmp_file, self._log_file)
+            self._load()
+
+    def close(self):
+        """关闭存储，压缩日志。"""
+        self.compact()
+
+    def get(self, chunk_id: str) -> Optional[array]:
+        """返回单个片段的 token ids，不存在时返回 None。"""
+        return self.get_many([chunk_id])[0]
+
+    def get_many(self, chunk_ids: Sequence[str]) -> List[Optional[array]]:
+        """
+        批量读取 token ids。
+
+        参数:
+            chunk_ids (Sequence[str]): 片段 ID 列表
+
+        返回:
+            List[Optional[array]]: 与输入对齐的 token 数组，缺失的片段为 None
+        """
+        if any(chunk_id not in self._rows for chunk_id in chunk_ids):
+            self.refresh()
+        results = []
+        with self._lock:
+            tokens, rows, starts, lengths = self._tokens, self._rows, self._starts, self._lengths
+            for chunk_id in chunk_ids:
+                row = rows.get(chunk_id)
+                if row is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.hits += 1
+                    results.append(tokens[starts[row]:starts[row] + lengths[row]])
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        """返回存储规模与命中统计。"""
+        return {
+            "chunks": len(self._rows),
+            "tokens": len(self._tokens),
+            "bytes": len(self._tokens) * self._tokens.itemsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
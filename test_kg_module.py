@@ -34,11 +34,11 @@ async def test_kg_functionality():
         of theoretical computer science and artificial intelligence.
         """
         
-        kg_manager.insert_text(sample_text)
+        await kg_manager.ainsert(sample_text)
         print("✓ Sample text inserted into knowledge graph")
         
         # Query the knowledge graph
-        query_result = kg_manager.query("Who was Alan Turing?", mode="hybrid")
+        query_result = await kg_manager.aquery("Who was Alan Turing?", mode="hybrid")
         print("✓ Knowledge graph query executed successfully")
         print("Query result:", query_result["result"])
         
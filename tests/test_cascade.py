@@ -0,0 +1,52 @@
+"""
+Tests for the cascade reranking helpers.
+"""
+
+import unittest
+
+from rag_app import config
+from rag_app.cascade import char_bigrams, is_decisive, prescore, stage_sizes
+
+
+class TestCascade(unittest.TestCase):
+    """Test cases for the cascade pre-scoring stage."""
+
+    def test_stage_sizes_follow_config(self):
+        """Stage sizes come from RERANKER_CONFIG and never drop below top_k."""
+        config = {"candidate_multiplier": 5, "max_candidates": 30, "prescore_candidates": 10}
+        self.assertEqual(stage_sizes(3, config), {"recall": 15, "prescore_keep": 10})
+        self.assertEqual(stage_sizes(10, config), {"recall": 30, "prescore_keep": 10})
+        self.assertEqual(stage_sizes(12, config), {"recall": 30, "prescore_keep": 12})
+
+    def test_prescore_prefers_lexical_overlap(self):
+        """A candidate sharing the query's characters outranks a closer but unrelated one."""
+        candidates = [
+            {"id": "a", "content": "总线仲裁方式", "distance": 0.30},
+            {"id": "b", "content": "Cache映射方式有哪些", "distance": 0.35},
+        ]
+        scored = prescore("Cache映射方式", candidates, lexical_weight=0.8)
+        self.assertEqual([c["id"] for c in scored], ["b", "a"])
+
+    def test_is_decisive(self):
+        """Early exit compares the gap between rank top_k and top_k + 1 with the margin."""
+        scored = [{"prescore": 0.9}, {"prescore": 0.5}, {"prescore": 0.45}]
+        self.assertTrue(is_decisive(scored, 1, 0.3))
+        self.assertFalse(is_decisive(scored, 2, 0.3))
+        self.assertFalse(is_decisive(scored, 1, None))
+        self.assertFalse(is_decisive(scored, 3, 0.3))
+
+    def test_is_decisive_with_default_config(self):
+        """The default margin can trigger at the default top_k of 5."""
+        margin = config.RERANKER_CONFIG["early_exit_margin"]
+        top = [{"prescore": 0.9 - 0.02 * i} for i in range(5)]
+        rest = [{"prescore": 0.4 - 0.02 * i} for i in range(5)]
+        self.assertTrue(is_decisive(top + rest, 5, margin))
+        close = [{"prescore": 0.9 - 0.02 * i} for i in range(10)]
+        self.assertFalse(is_decisive(close, 5, margin))
+
+    def test_char_bigrams_ignores_whitespace(self):
+        self.assertEqual(char_bigrams("a b"), {"ab"})
+
+
+if __name__ == '__main__':
+    unittest.main()
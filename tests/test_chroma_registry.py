@@ -0,0 +1,47 @@
+"""
+Tests for the shared Chroma client and collection handle registry.
+"""
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+from rag_app import chroma_registry
+from rag_app.chroma_registry import ChromaRegistry
+
+
+class TestChromaRegistry(unittest.TestCase):
+    """Test cases for ChromaRegistry and get_registry."""
+
+    def setUp(self):
+        patcher = patch('rag_app.chroma_registry.chromadb.PersistentClient')
+        self.client_cls = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client_cls.return_value.get_collection.side_effect = lambda name, **kwargs: MagicMock(name=name)
+
+    def test_client_opened_once_per_path(self):
+        chroma_registry._registries.clear()
+        self.addCleanup(chroma_registry._registries.clear)
+        first = chroma_registry.get_registry("./db")
+        self.assertIs(chroma_registry.get_registry("./db"), first)
+        self.assertEqual(self.client_cls.call_count, 1)
+
+    def test_handles_are_cached_and_shared(self):
+        registry = ChromaRegistry("./db")
+        ef = object()
+        bound = registry.collection("exam", embedding_function=ef)
+        self.assertIs(registry.collection("exam"), bound)
+        self.assertEqual(registry.client.get_collection.call_count, 1)
+
+    def test_lru_bound(self):
+        registry = ChromaRegistry("./db", cache_size=2)
+        registry.collection("a")
+        registry.collection("b")
+        registry.collection("a")
+        registry.collection("c")
+        self.assertEqual(registry.cached_collections(), ["a", "c"])
+        registry.collection("b")
+        self.assertEqual(registry.client.get_collection.call_count, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Tests for the incrementally maintained collection statistics.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from rag_app.collection_stats import CollectionStats
+
+
+class _FakeCollection:
+    """Minimal stand-in for a Chroma collection supporting paged get()."""
+
+    def __init__(self, documents, metadatas):
+        self.documents = documents
+        self.metadatas = metadatas
+
+    def count(self):
+        return len(self.documents)
+
+    def get(self, limit=None, offset=0, include=None):
+        end = len(self.documents) if limit is None else offset + limit
+        return {
+            "ids": [f"id{i}" for i in range(offset, min(end, len(self.documents)))],
+            "documents": self.documents[offset:end],
+            "metadatas": self.metadatas[offset:end],
+        }
+
+
+class TestCollectionStats(unittest.TestCase):
+    """Test cases for the CollectionStats class."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "exam_questions.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_add_and_remove(self):
+        stats = CollectionStats("exam_questions", self.path)
+        stats.add(["a" * 10, "b" * 100], [{"编号": "1"}, {"编号": "1"}])
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot["total_documents"], 2)
+        self.assertEqual(snapshot["content_analysis"]["length_distribution"]["medium (51-200)"], 1)
+        field = snapshot["metadata_analysis"]["field_statistics"]["编号"]
+        self.assertEqual(field["most_common"], ("1", 2))
+        self.assertEqual(field["unique_values"], 1)
+        self.assertNotIn("value_distribution", field)
+
+        stats.remove(["b" * 100], [{"编号": "1"}])
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot["total_documents"], 1)
+        self.assertEqual(snapshot["content_analysis"]["avg_length"], 10)
+        self.assertFalse(snapshot["content_analysis"]["min_max_exact"])
+
+    def test_persistence(self):
+        CollectionStats("exam_questions", self.path).add(["abc"], [{"option_key": "A"}])
+        reloaded = CollectionStats("exam_questions", self.path)
+        self.assertEqual(reloaded.count, 1)
+        self.assertEqual(reloaded.fields["option_key"].heavy_hitters.top(1), [("A", 1, 0)])
+
+    def test_paged_rebuild(self):
+        stats = CollectionStats("exam_questions", self.path)
+        stats.add(["stale"], [{"x": "y"}])
+        collection = _FakeCollection(["a" * i for i in range(1, 8)], [{"k": str(i % 2)} for i in range(7)])
+        progress = []
+        snapshot = stats.rebuild(collection, page_size=3, progress=lambda done, total: progress.append(done))
+        self.assertEqual(progress, [3, 6, 7])
+        self.assertEqual(snapshot["total_documents"], 7)
+        self.assertEqual(snapshot["content_analysis"]["max_length"], 7)
+        self.assertNotIn("x", stats.fields)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""
+Tests for per-request latency budgets.
+"""
+
+import asyncio
+import time
+import unittest
+
+from rag_app.deadline import Deadline, DeadlineExceeded
+
+
+class TestDeadline(unittest.TestCase):
+    def test_unbounded_deadline_waits(self):
+        deadline = Deadline(None)
+
+        async def slow():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        self.assertFalse(deadline.bounded)
+        self.assertEqual(deadline.remaining_ms(), float("inf"))
+        self.assertEqual(asyncio.run(deadline.run(slow(), "embedding")), "done")
+
+    def test_stage_past_budget_raises_and_is_cancelled(self):
+        cancelled = []
+
+        async def slow():
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        async def run():
+            deadline = Deadline(30)
+            started = time.perf_counter()
+            with self.assertRaises(DeadlineExceeded):
+                await deadline.run(slow(), "cross_encoder")
+            return time.perf_counter() - started
+
+        self.assertLess(asyncio.run(run()), 0.5)
+        self.assertEqual(cancelled, [True])
+
+    def test_reserve_leaves_budget_for_later_stages(self):
+        async def fast():
+            return 1
+
+        async def run():
+            deadline = Deadline(50)
+            self.assertEqual(await deadline.run(fast(), "embedding", reserve_ms=10), 1)
+            with self.assertRaises(DeadlineExceeded):
+                await deadline.run(fast(), "vector_search", reserve_ms=100)
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Tests for near-duplicate chunk detection.
+"""
+
+import unittest
+
+import numpy as np
+
+from rag_app.dedup import UnionFind, find_duplicate_clusters, match_duplicates
+
+
+class _VectorCollection:
+    """Stand-in collection with brute-force k-NN over stored embeddings."""
+
+    def __init__(self, rows):
+        self.rows = rows  # (id, document, embedding[, metadata])
+
+    def count(self):
+        return len(self.rows)
+
+    def get(self, ids=None, limit=None, offset=0, include=None):
+        rows = [r for r in self.rows if r[0] in ids] if ids is not None else self.rows[offset:offset + limit]
+        return {
+            "ids": [r[0] for r in rows],
+            "documents": [r[1] for r in rows],
+            "embeddings": np.array([r[2] for r in rows], dtype=np.float32),
+        }
+
+    def query(self, query_embeddings, n_results, include=None):
+        stored = np.array([r[2] for r in self.rows], dtype=np.float32)
+        ids, embeddings, metadatas = [], [], []
+        for q in query_embeddings:
+            order = np.argsort(np.linalg.norm(stored - np.asarray(q), axis=1))[:n_results]
+            ids.append([self.rows[i][0] for i in order])
+            embeddings.append(stored[order])
+            metadatas.append([self.rows[i][3] if len(self.rows[i]) > 3 else None for i in order])
+        return {"ids": ids, "embeddings": embeddings, "metadatas": metadatas}
+
+
+class TestDedup(unittest.TestCase):
+    """Test cases for the blocked similarity self-join."""
+
+    def setUp(self):
+        self.collection = _VectorCollection([
+            ("a", "doc a", [1.0, 0.0, 0.0]),
+            ("b", "doc b", [0.99, 0.01, 0.0]),
+            ("c", "doc c", [0.0, 1.0, 0.0]),
+            ("d", "doc d", [0.0, 0.0, 1.0]),
+            ("e", "doc e", [1.0, 0.02, 0.0]),
+        ])
+
+    def test_clusters_across_pages(self):
+        progress = []
+        report = find_duplicate_clusters(self.collection, threshold=0.99, neighbors=3, page_size=2,
+                                         progress=lambda done, total: progress.append(done))
+        self.assertEqual(report["cluster_count"], 1)
+        self.assertEqual(report["redundant_chunks"], 2)
+        cluster = report["clusters"][0]
+        self.assertEqual(cluster["representative"], "a")
+        self.assertEqual([m["id"] for m in cluster["members"]], ["a", "b", "e"])
+        self.assertEqual(progress, [2, 4, 5])
+
+    def test_match_duplicates_at_ingest(self):
+        new = [[0.0, 0.999, 0.01], [0.5, 0.5, 0.7], [0.5, 0.5, 0.71]]
+        self.assertEqual(match_duplicates(self.collection, new, threshold=0.99), ["c", None, 1])
+
+    def test_options_of_one_question_are_not_duplicates(self):
+        def group_of(metadata):
+            return metadata.get("编号")
+
+        collection = _VectorCollection([
+            ("q1_A", "题干 A. 对", [1.0, 0.0, 0.0], {"编号": "1"}),
+            ("q2_A", "另一题干 A. 对", [0.0, 1.0, 0.0], {"编号": "2"}),
+        ])
+        # "q1_B" is closest to its sibling q1_A and must not be dropped; q3_A repeats q2_A
+        new = [[0.999, 0.02, 0.0], [0.0, 0.999, 0.02], [0.0, 0.998, 0.03]]
+        matches = match_duplicates(collection, new, threshold=0.99, groups=["1", "3", "3"], group_of=group_of)
+        self.assertEqual(matches, [None, "q2_A", "q2_A"])
+        # Within a block, the options of question 4 are kept while question 5 repeats question 4
+        block = [[0.0, 0.0, 1.0], [0.0, 0.01, 1.0], [0.0, 0.005, 1.0]]
+        matches = match_duplicates(collection, block, threshold=0.99, groups=["4", "4", "5"], group_of=group_of)
+        self.assertEqual(matches, [None, None, 0])
+
+    def test_union_find_uses_smallest_id_as_root(self):
+        uf = UnionFind()
+        uf.union("z", "y")
+        uf.union("y", "x")
+        self.assertEqual({root: sorted(members) for root, members in uf.groups().items()}, {"x": ["x", "y", "z"]})
+
+
+if __name__ == '__main__':
+    unittest.main()
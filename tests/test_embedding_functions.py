@@ -0,0 +1,86 @@
+"""
+Tests for the embedding function Chroma collections are opened with.
+"""
+
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import chromadb
+
+from rag_app import chroma_registry, collection_stats, config
+from rag_app.embedding_functions import (InstrumentedEmbeddingFunction, RemoteEmbeddingFunction,
+                                         create_embedding_function)
+from rag_app.rag_module import RAGManager
+
+
+class _LengthEmbeddings:
+    """Offline stand-in for the embedding service: 2-d vectors from the text length."""
+
+    def __call__(self, input):
+        return [[float(len(text)), 1.0] for text in input]
+
+
+@unittest.skipUnless(hasattr(chromadb.EmbeddingFunction, "get_config"),
+                     "collections persist their embedding function since chromadb 1.x")
+class TestCollectionEmbeddingFunction(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp(prefix="chroma_ef_")
+        self.addCleanup(shutil.rmtree, self.path, ignore_errors=True)
+        for patcher in (
+            patch.object(config, "CHROMA_PATH", self.path),
+            patch.object(config, "EMBEDDING_PROVIDER", "ollama"),
+            patch.dict(config.MONITOR_CONFIG, {"stats_path": self.path}),
+            patch.dict(config.RERANKER_CONFIG, {"enable_reranker": False}),
+            patch.dict(config.MODEL_SERVER_CONFIG, {"socket_path": ""}),
+            patch.dict(chroma_registry._registries, clear=True),
+            patch.dict(collection_stats._registry, clear=True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _reopen(self) -> RAGManager:
+        chroma_registry._registries.clear()
+        collection_stats._registry.clear()
+        return RAGManager()
+
+    def test_reopens_collection_created_with_unwrapped_function(self):
+        chromadb.PersistentClient(path=self.path).get_or_create_collection(
+            config.COLLECTION_NAME, embedding_function=create_embedding_function("ollama"))
+        manager = self._reopen()
+        self.assertEqual(manager.collection.name, config.COLLECTION_NAME)
+
+    def test_new_collection_persists_provider_identity(self):
+        self._reopen()
+        manager = self._reopen()
+        persisted = manager.collection.configuration_json["embedding_function"]
+        self.assertEqual(persisted["name"], "ollama")
+        self.assertIsInstance(manager._embedding_function, InstrumentedEmbeddingFunction)
+
+    def test_model_server_embeddings_share_the_collection(self):
+        self._reopen()
+        with patch.dict(config.MODEL_SERVER_CONFIG, {"socket_path": "/tmp/rag_test_models.sock",
+                                                     "serve_embeddings": True}):
+            manager = self._reopen()
+        remote = manager._embedding_function._inner
+        self.assertIsInstance(remote, RemoteEmbeddingFunction)
+        local = create_embedding_function("ollama")
+        self.assertEqual(remote.name(), local.name())
+        self.assertEqual(remote.get_config(), local.get_config())
+        collection = chromadb.PersistentClient(path=self.path).get_collection(
+            config.COLLECTION_NAME, embedding_function=remote)
+        self.assertEqual(collection.name, config.COLLECTION_NAME)
+
+    def test_search_embeds_query_through_instrumented_function(self):
+        manager = self._reopen()
+        manager._embedding_function = InstrumentedEmbeddingFunction(_LengthEmbeddings(), "ollama")
+        documents = ["短题", "一道更长一些的题目"]
+        manager.collection.add(ids=["q1", "q2"], documents=documents, metadatas=[{"n": 1}, {"n": 2}],
+                               embeddings=manager._embed_documents(documents))
+        results = manager.search("一道更长一些的题目", top_k=1)["results"]
+        self.assertEqual([r["id"] for r in results], ["q2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+Tests for the server-sent events hub used by the monitor.
+"""
+
+import asyncio
+import threading
+import unittest
+
+from rag_app.events import EventHub, format_sse
+
+
+class TestEventHub(unittest.TestCase):
+    """Test cases for EventHub fan-out."""
+
+    def test_format_sse(self):
+        frame = format_sse("stats", {"total_documents": 3}, 7)
+        self.assertEqual(frame, 'id: 7\nevent: stats\ndata: {"total_documents": 3}\n\n')
+
+    def test_publish_without_subscribers_is_noop(self):
+        hub = EventHub()
+        hub.publish("query", {"latency_ms": 1})
+        self.assertEqual(hub.published, 0)
+
+    def test_stream_receives_initial_and_threaded_events(self):
+        hub = EventHub()
+
+        async def consume():
+            stream = hub.stream([format_sse("stats", {"total_documents": 1})])
+            frames = [await stream.__anext__() for _ in range(2)]
+            threading.Thread(target=hub.publish, args=("job", {"status": "running"})).start()
+            frames.append(await stream.__anext__())
+            await stream.aclose()
+            return frames
+
+        frames = asyncio.run(consume())
+        self.assertTrue(frames[0].startswith("retry:"))
+        self.assertIn("event: stats", frames[1])
+        self.assertIn('data: {"status": "running"}', frames[2])
+        self.assertEqual(hub.subscriber_count, 0)
+
+    def test_slow_subscriber_drops_oldest(self):
+        hub = EventHub(queue_size=2)
+
+        async def consume():
+            stream = hub.stream()
+            await stream.__anext__()
+            for i in range(4):
+                hub.publish("query", {"i": i})
+            await asyncio.sleep(0)
+            frames = [await stream.__anext__() for _ in range(2)]
+            await stream.aclose()
+            return frames
+
+        frames = asyncio.run(consume())
+        self.assertIn('"i": 2', frames[0])
+        self.assertIn('"i": 3', frames[1])
+        self.assertEqual(hub.dropped, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
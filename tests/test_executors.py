@@ -0,0 +1,82 @@
+"""
+Tests for the bounded worker pools and per-endpoint concurrency limits.
+"""
+
+import asyncio
+import threading
+import unittest
+
+from rag_app import metrics
+from rag_app.executors import BoundedExecutor, ConcurrencyLimiter, Overloaded
+
+
+class TestBoundedExecutor(unittest.TestCase):
+    def test_rejects_when_queue_is_full(self):
+        executor = BoundedExecutor("test", max_workers=1, max_queue=1)
+        self.addCleanup(executor.shutdown)
+        release = threading.Event()
+        self.addCleanup(release.set)
+        running = executor.submit(release.wait)
+        queued = executor.submit(lambda: "queued")
+        self.assertEqual(executor.stats()["queued"], 1)
+        with self.assertRaises(Overloaded) as ctx:
+            executor.submit(lambda: "rejected")
+        self.assertEqual(ctx.exception.status_code, 503)
+
+        release.set()
+        running.result(timeout=1)
+        self.assertEqual(queued.result(timeout=1), "queued")
+        self.assertEqual(executor.submit(lambda: "ok").result(timeout=1), "ok")
+
+    def test_run_does_not_block_event_loop(self):
+        executor = BoundedExecutor("test", max_workers=1, max_queue=0)
+        self.addCleanup(executor.shutdown)
+        release = threading.Event()
+
+        async def run():
+            task = asyncio.ensure_future(executor.run(release.wait, 1))
+            await asyncio.sleep(0.01)
+            # The loop is free while the blocking call runs on the pool
+            release.set()
+            return await task
+
+        self.assertTrue(asyncio.run(run()))
+
+
+class TestConcurrencyLimiter(unittest.TestCase):
+    def test_sheds_with_429_then_503_on_wait_timeout(self):
+        limiter = ConcurrencyLimiter("search", max_concurrent=1, max_waiting=1, wait_timeout=0.05)
+        before = metrics.registry.counter_value(metrics.SHED_METRIC, scope="endpoint", target="search")
+
+        async def hold(event):
+            async with limiter.acquire():
+                await event.wait()
+
+        async def run():
+            event = asyncio.Event()
+            holder = asyncio.ensure_future(hold(event))
+            await asyncio.sleep(0)
+            waiter = asyncio.ensure_future(limiter.acquire().__aenter__())
+            await asyncio.sleep(0)
+            self.assertEqual(limiter.stats()["waiting"], 1)
+            with self.assertRaises(Overloaded) as rejected:
+                async with limiter.acquire():
+                    pass
+            with self.assertRaises(Overloaded) as timed_out:
+                await waiter
+            event.set()
+            await holder
+            async with limiter.acquire():
+                self.assertEqual(limiter.stats()["active"], 1)
+            return rejected.exception, timed_out.exception
+
+        rejected, timed_out = asyncio.run(run())
+        self.assertEqual(rejected.status_code, 429)
+        self.assertEqual(timed_out.status_code, 503)
+        if metrics.registry.enabled:
+            after = metrics.registry.counter_value(metrics.SHED_METRIC, scope="endpoint", target="search")
+            self.assertEqual(after, before + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+"""
+Tests for the question-entity index behind graph retrieval.
+"""
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from xml.sax.saxutils import escape
+
+from rag_app.graph_index import CHUNKS_FILE, GRAPH_FILE, GraphIndex, GraphIndexLoader
+
+# chunk id -> (document id, content)
+CHUNKS = {
+    "c1": ("questions:q1@aaaa", "题目：哪个关键字定义函数？\n选项A. def"),
+    "c2": ("questions:q2@bbbb", "题目：def 语句的作用是什么？\n选项A. 定义函数"),
+    "c3": ("questions:q3@cccc", "题目：函数可以嵌套定义吗？\n选项A. 可以"),
+    "c4": ("数字逻辑客观题:q1@dddd", "题目：加法器具有记忆能力。\n选项A. 对"),
+    "c5": ("textbook.txt#chunk-000000", "与题库无关的教材片段"),
+}
+
+# entity -> chunk ids
+ENTITIES = {
+    "def": ["c1", "c2"],
+    "函数": ["c2", "c3"],
+    "对": ["c1", "c2", "c3", "c4"],
+    "教材": ["c5"],
+}
+
+
+def write_storage(directory, entities=ENTITIES):
+    with open(os.path.join(directory, CHUNKS_FILE), "w", encoding="utf-8") as f:
+        json.dump({cid: {"full_doc_id": doc_id, "content": content} for cid, (doc_id, content) in CHUNKS.items()},
+                  f, ensure_ascii=False)
+    nodes = "".join(
+        f'<node id="{escape(name)}"><data key="d0">{escape(name)}</data>'
+        f'<data key="d3">{"&lt;SEP&gt;".join(chunks)}</data></node>'
+        for name, chunks in entities.items())
+    with open(os.path.join(directory, GRAPH_FILE), "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="utf-8"?>'
+                '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">'
+                '<key id="d3" for="node" attr.name="source_id" attr.type="string" />'
+                '<key id="d0" for="node" attr.name="entity_id" attr.type="string" />'
+                f'<graph edgedefault="undirected">{nodes}</graph></graphml>')
+
+
+class TestGraphIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        write_storage(self.tmp)
+        self.index_path = os.path.join(self.tmp, "graph_index.npz")
+        self.index = GraphIndex.load_or_build(self.tmp, self.index_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_build_only_indexes_question_chunks(self):
+        self.assertEqual(self.index.num_questions, 4)
+        self.assertEqual(self.index.num_entities, 3)
+        self.assertEqual(self.index.rows_for("question_id", "2"), [1])
+        self.assertEqual(self.index.rows_for("编号", "1"), [3])
+        self.assertEqual(self.index.rows_for("question_id", "9"), [])
+
+    def test_expand_within_hop_budget(self):
+        one_hop = dict(self.index.expand({0: 1.0}, max_hops=1, max_entity_questions=3))
+        self.assertEqual(set(one_hop), {1})
+        two_hops = dict(self.index.expand({0: 1.0}, max_hops=2, max_entity_questions=3))
+        self.assertEqual(set(two_hops), {1, 2})
+        self.assertLess(two_hops[2], two_hops[1])
+        # Without the hub cap the shared "对" entity reaches every question in one hop
+        self.assertEqual(set(dict(self.index.expand({0: 1.0}, max_hops=1))), {1, 2, 3})
+        self.assertEqual(len(self.index.expand({0: 1.0}, max_hops=1, max_expansion=1)), 1)
+
+    def test_saved_index_is_reused_and_rebuilt_on_change(self):
+        self.assertTrue(self.index.is_current(self.tmp))
+        loaded = GraphIndex.load_or_build(self.tmp, self.index_path)
+        self.assertEqual(loaded.qids, self.index.qids)
+        self.assertEqual(loaded.q_entities.tolist(), self.index.q_entities.tolist())
+
+        write_storage(self.tmp, {**ENTITIES, "嵌套": ["c3"]})
+        os.utime(os.path.join(self.tmp, GRAPH_FILE), ns=(1, 1))
+        self.assertFalse(self.index.is_current(self.tmp))
+        self.assertEqual(GraphIndex.load_or_build(self.tmp, self.index_path).num_entities, 4)
+
+    def test_missing_graph_returns_none(self):
+        empty = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, empty)
+        self.assertIsNone(GraphIndex.load_or_build(empty, os.path.join(empty, "graph_index.npz")))
+
+
+class TestGraphIndexLoader(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        write_storage(self.tmp)
+        self.loader = GraphIndexLoader(self.tmp, os.path.join(self.tmp, "graph_index.npz"))
+
+    def _change_graph(self, content=None):
+        if content is None:
+            write_storage(self.tmp, {**ENTITIES, "嵌套": ["c3"]})
+        else:
+            with open(os.path.join(self.tmp, GRAPH_FILE), "w", encoding="utf-8") as f:
+                f.write(content)
+        os.utime(os.path.join(self.tmp, GRAPH_FILE), ns=(1, 1))
+
+    def test_concurrent_reload_builds_once(self):
+        self.loader.get()
+        self._change_graph()
+        build = GraphIndex.build
+
+        def slow_build(storage_dir):
+            time.sleep(0.05)
+            return build(storage_dir)
+
+        with patch.object(GraphIndex, "build", side_effect=slow_build) as counted:
+            threads = [threading.Thread(target=self.loader.get) for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(counted.call_count, 1)
+        self.assertEqual(self.loader.get().num_entities, 4)
+        self.assertEqual([f for f in os.listdir(self.tmp) if f.endswith(".tmp")], [])
+
+    def test_failed_rebuild_keeps_previous_index(self):
+        previous = self.loader.get()
+        # LightRAG is still writing the graphml
+        self._change_graph('<?xml version="1.0" encoding="utf-8"?><graphml xmlns="http://graphml')
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            self.assertIs(self.loader.get(), previous)
+            self.assertIs(self.loader.get(), previous)
+        self.assertEqual(out.getvalue().count("图谱索引重建失败"), 1)
+
+        self._change_graph()
+        self.assertEqual(self.loader.get().num_entities, 4)
+
+    def test_missing_graph_is_logged_once(self):
+        empty = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, empty)
+        loader = GraphIndexLoader(empty, os.path.join(empty, "graph_index.npz"))
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            self.assertIsNone(loader.get())
+            self.assertIsNone(loader.get())
+        self.assertEqual(out.getvalue().count("知识图谱尚未构建"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+"""
+Tests for the async KGManager API.
+"""
+
+import asyncio
+import unittest
+from unittest.mock import MagicMock, patch
+
+from rag_app import config
+from rag_app.kg_module import KGManager
+
+
+class _SlowRAG:
+    """Stand-in LightRAG instance that records peak concurrency."""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    async def aquery(self, query_text, param=None):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return f"answer to {query_text}"
+
+    async def ainsert(self, text):
+        await asyncio.sleep(0)
+
+
+class TestKGManagerAsync(unittest.TestCase):
+    """Test cases for ainsert/aquery and the synchronous wrappers."""
+
+    def setUp(self):
+        with patch('rag_app.kg_module.setup_logger'), patch('rag_app.kg_module.os.makedirs'):
+            self.manager = KGManager()
+        self.manager.rag = _SlowRAG()
+
+    @patch('rag_app.kg_module.QueryParam', MagicMock())
+    def test_concurrency_is_bounded(self):
+        async def run():
+            return await asyncio.gather(*(self.manager.aquery(f"q{i}") for i in range(20)))
+
+        with patch.dict(config.KG_CONFIG, {"max_concurrency": 3}):
+            results = asyncio.run(run())
+        self.assertEqual(len(results), 20)
+        self.assertEqual(results[0]["result"], "answer to q0")
+        self.assertLessEqual(self.manager.rag.peak, 3)
+        self.assertGreater(self.manager.rag.peak, 1)
+
+    def test_sync_wrapper_rejects_running_loop(self):
+        async def run():
+            self.manager.insert_text("text")
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(run())
+
+    def test_sync_wrapper_in_script(self):
+        self.manager.insert_text("text")
+        self.manager.insert_text("more text")
+
+
+if __name__ == '__main__':
+    unittest.main()
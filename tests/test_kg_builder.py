@@ -0,0 +1,137 @@
+"""
+Tests for the batched, resumable knowledge-graph builder.
+"""
+
+import asyncio
+import hashlib
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from rag_app.kg_builder import KGBuilder, iter_chunks
+
+
+class _RecordingManager:
+    """Stand-in KGManager that records inserted batches and can fail on demand."""
+
+    def __init__(self, working_dir, fail_on_batch=None):
+        self.working_dir = working_dir
+        self.batches = []
+        self.fail_on_batch = fail_on_batch
+
+    async def ainsert(self, texts, ids=None):
+        if self.fail_on_batch is not None and len(self.batches) == self.fail_on_batch:
+            raise RuntimeError("LLM unavailable")
+        self.batches.append(list(ids))
+
+
+async def _stub_llm(prompt, system_prompt=None, history_messages=[], keyword_extraction=False, **kwargs):
+    from lightrag.prompt import PROMPTS
+
+    d = PROMPTS["DEFAULT_TUPLE_DELIMITER"]
+    records = [
+        f"entity{d}Alan Turing{d}person{d}A mathematician.",
+        f"entity{d}Turing machine{d}concept{d}A model of computation.",
+        f"relation{d}Alan Turing{d}Turing machine{d}invention{d}Turing formalised the Turing machine.",
+    ]
+    return "\n".join(records) + "\n" + PROMPTS["DEFAULT_COMPLETION_DELIMITER"]
+
+
+async def _stub_embed(texts):
+    return np.array([np.frombuffer(hashlib.sha256(t.encode("utf-8")).digest(), dtype=np.uint8)[:32] / 255.0
+                     for t in texts], dtype=np.float32)
+
+
+class _CharTokenizer:
+    """Offline tokenizer for the end-to-end test: one token per character."""
+
+    def encode(self, content):
+        return [ord(ch) for ch in content]
+
+    def decode(self, tokens):
+        return "".join(chr(t) for t in tokens)
+
+
+class TestKGBuilder(unittest.TestCase):
+    """Test cases for chunk streaming, batching and resume."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.path = os.path.join(self.tmp_dir, "corpus.txt")
+        paragraphs = [f"第{i}段：图灵机是一种抽象的计算模型。" + "内容" * 20 for i in range(30)]
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("\n\n".join(paragraphs))
+
+    def test_chunks_cover_file_with_overlap(self):
+        chunks = list(iter_chunks(self.path, chunk_chars=200, overlap=20, read_size=64))
+        self.assertTrue(all(len(text) <= 200 for _, text, _ in chunks))
+        self.assertEqual([i for i, _, _ in chunks], list(range(len(chunks))))
+        self.assertEqual(chunks[-1][2], 1.0)
+        joined = "".join(text for _, text, _ in chunks)
+        self.assertIn("第29段", joined)
+
+    def test_resume_after_failure(self):
+        reports = []
+        failing = _RecordingManager(self.tmp_dir, fail_on_batch=2)
+        builder = KGBuilder(failing, chunk_chars=200, chunk_overlap=20, batch_size=3, on_progress=reports.append)
+        with self.assertRaises(RuntimeError):
+            asyncio.run(builder.build(self.path))
+        self.assertEqual(builder.load_progress(self.path)["completed_chunks"], 6)
+
+        manager = _RecordingManager(self.tmp_dir)
+        builder = KGBuilder(manager, chunk_chars=200, chunk_overlap=20, batch_size=3, on_progress=reports.append)
+        report = asyncio.run(builder.build(self.path))
+        total = len(list(iter_chunks(self.path, 200, 20)))
+        self.assertEqual(manager.batches[0][0], builder.chunk_id(self.path, 6))
+        self.assertEqual(report["completed_chunks"], total)
+        self.assertTrue(builder.load_progress(self.path)["finished"])
+        self.assertGreater(reports[-1]["chunks_per_sec"], 0)
+
+    @unittest.skipUnless(importlib.util.find_spec("lightrag"), "lightrag is not installed")
+    def test_end_to_end_with_stub_models(self):
+        from lightrag.utils import Tokenizer
+
+        from rag_app import config
+        from rag_app.kg_module import KGManager
+
+        overrides = {
+            "embedding_dim": 32,
+            "response_cache": {"path": os.path.join(self.tmp_dir, "cache.sqlite"), "mode": "readwrite"},
+        }
+        patcher = patch.dict(config.KG_CONFIG, overrides)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        total = len(list(iter_chunks(self.path, 500, 50)))
+        build_kwargs = dict(chunk_chars=500, chunk_overlap=50, batch_size=4, on_progress=lambda r: None)
+
+        async def offline_llm(*args, **kwargs):
+            raise AssertionError("LLM called during cache-only replay")
+        offline_llm.__qualname__ = _stub_llm.__qualname__
+
+        async def scenario():
+            manager = KGManager(working_dir=os.path.join(self.tmp_dir, "kg"), llm_model_func=_stub_llm,
+                                embedding_func=_stub_embed, tokenizer=Tokenizer("char", _CharTokenizer()))
+            first = await manager.abuild_from_file(self.path, **build_kwargs)
+
+            # Replaying into a fresh store offline is served entirely from the response cache
+            config.KG_CONFIG["response_cache"] = dict(config.KG_CONFIG["response_cache"], mode="cache_only")
+            replay = KGManager(working_dir=os.path.join(self.tmp_dir, "kg_replay"), llm_model_func=offline_llm,
+                               embedding_func=_stub_embed, tokenizer=Tokenizer("char", _CharTokenizer()),
+                               workspace="replay")
+            second = await replay.abuild_from_file(self.path, **build_kwargs)
+            return first, second, replay.response_cache.stats()
+
+        first, second, cache_stats = asyncio.run(scenario())
+        self.assertEqual(first["completed_chunks"], total)
+        self.assertEqual(second["completed_chunks"], total)
+        self.assertGreater(cache_stats["hits"], 0)
+        self.assertEqual(cache_stats["misses"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
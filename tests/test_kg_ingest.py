@@ -0,0 +1,149 @@
+"""
+Tests for incremental knowledge-graph ingestion of the CSV question banks.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from rag_app.kg_ingest import MANIFEST_NAME, IngestManifest, ingest_csv, load_question_documents
+
+QUESTIONS_CSV = """question_id,question_text,option_key,option_text,is_correct
+1,"Which keyword defines a function?","A","func",FALSE
+1,"Which keyword defines a function?","B","def",TRUE
+2,"Which type is immutable?","A","list",FALSE
+2,"Which type is immutable?","B","tuple",TRUE
+"""
+
+STEM_OPTION_CSV = """编号,题干,选项,答案
+1,加法器具有记忆能力。,A. 对,错
+1,加法器具有记忆能力。,B. 错,对
+"""
+
+
+class _RecordingManager:
+    """Stand-in KGManager that records inserted and deleted document ids."""
+
+    def __init__(self, working_dir):
+        self.working_dir = working_dir
+        self.inserted = []
+        self.deleted = []
+
+    async def ainsert(self, texts, ids=None):
+        self.inserted.extend(ids)
+
+    async def adelete_documents(self, doc_ids):
+        self.deleted.extend(doc_ids)
+        return list(doc_ids)
+
+
+class _RAGWithoutDelete:
+    """Stand-in for a LightRAG version without adelete_by_doc_id."""
+
+    async def ainsert(self, texts, ids=None):
+        pass
+
+
+class TestKGIngest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.csv = os.path.join(self.tmp, "questions.csv")
+        self._write(self.csv, QUESTIONS_CSV)
+        self.manager = _RecordingManager(os.path.join(self.tmp, "kg"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    @staticmethod
+    def _write(path, content):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def _ingest(self, **kwargs):
+        return asyncio.run(ingest_csv(self.manager, self.csv, batch_size=1, **kwargs))
+
+    def test_groups_rows_into_questions(self):
+        docs = load_question_documents(self.csv)
+        self.assertEqual([d["key"] for d in docs], ["questions:q1", "questions:q2"])
+        self.assertIn("正确答案：B. def", docs[0]["text"])
+
+        stem_csv = os.path.join(self.tmp, "数字逻辑客观题.csv")
+        self._write(stem_csv, STEM_OPTION_CSV)
+        docs = load_question_documents(stem_csv)
+        self.assertEqual(len(docs), 1)
+        self.assertIn("选项A. 对", docs[0]["text"])
+        self.assertTrue(docs[0]["text"].endswith("正确答案：B. 错"))
+
+    def test_rerun_only_sends_changed_questions(self):
+        first = self._ingest()
+        self.assertEqual((first["new"], first["unchanged"]), (2, 0))
+        self.assertEqual(len(self.manager.inserted), 2)
+
+        second = self._ingest()
+        self.assertEqual((second["new"], second["changed"], second["unchanged"]), (0, 0, 2))
+        self.assertEqual(len(self.manager.inserted), 2)
+
+        old_id = IngestManifest(os.path.join(self.manager.working_dir, MANIFEST_NAME)).entries["questions:q2"]["doc_id"]
+        self._write(self.csv, QUESTIONS_CSV.replace("tuple", "frozenset"))
+        third = self._ingest()
+        self.assertEqual((third["changed"], third["unchanged"]), (1, 1))
+        self.assertEqual(len(self.manager.inserted), 3)
+        self.assertNotEqual(self.manager.inserted[-1], old_id)
+        self.assertEqual(self.manager.deleted, [old_id])
+
+    def test_interrupted_run_still_deletes_superseded_versions(self):
+        self._ingest()
+        old_ids = [e["doc_id"] for e in
+                   IngestManifest(os.path.join(self.manager.working_dir, MANIFEST_NAME)).entries.values()]
+        self._write(self.csv, QUESTIONS_CSV.replace("def", "lambda").replace("tuple", "frozenset"))
+
+        inserted = self.manager.inserted
+
+        async def crash_after_first_batch(texts, ids=None):
+            if len(inserted) > 2:
+                raise RuntimeError("extraction failed")
+            inserted.extend(ids)
+        self.manager.ainsert = crash_after_first_batch
+        with self.assertRaises(RuntimeError):
+            self._ingest()
+        self.assertEqual(self.manager.deleted, [])
+        manifest = IngestManifest(os.path.join(self.manager.working_dir, MANIFEST_NAME))
+        self.assertEqual(manifest.superseded, old_ids[:1])
+
+        del self.manager.ainsert
+        result = self._ingest()
+        self.assertEqual((result["changed"], result["unchanged"]), (1, 1))
+        self.assertEqual(sorted(self.manager.deleted), sorted(old_ids))
+        manifest = IngestManifest(os.path.join(self.manager.working_dir, MANIFEST_NAME))
+        self.assertEqual(manifest.superseded, [])
+
+    def test_outdated_versions_stay_queued_without_delete_support(self):
+        from rag_app.kg_module import KGManager
+
+        with patch('rag_app.kg_module.setup_logger'):
+            self.manager = KGManager(working_dir=os.path.join(self.tmp, "kg"))
+        self.manager.rag = _RAGWithoutDelete()
+        self._ingest()
+        manifest_path = os.path.join(self.manager.working_dir, MANIFEST_NAME)
+        old_id = IngestManifest(manifest_path).entries["questions:q2"]["doc_id"]
+
+        self._write(self.csv, QUESTIONS_CSV.replace("tuple", "frozenset"))
+        result = self._ingest()
+        self.assertEqual((result["changed"], result["pending_deletion"]), (1, 1))
+        self.assertEqual(IngestManifest(manifest_path).superseded, [old_id])
+
+    def test_prune_removes_missing_questions(self):
+        self._ingest()
+        self._write(self.csv, "\n".join(QUESTIONS_CSV.splitlines()[:3]) + "\n")
+        result = self._ingest(prune=True)
+        self.assertEqual((result["removed"], result["unchanged"]), (1, 1))
+        manifest = IngestManifest(os.path.join(self.manager.working_dir, MANIFEST_NAME))
+        self.assertEqual(list(manifest.entries), ["questions:q1"])
+        self.assertEqual(len(self.manager.deleted), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
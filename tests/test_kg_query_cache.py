@@ -0,0 +1,81 @@
+"""
+Tests for the knowledge-graph query result cache.
+"""
+
+import asyncio
+import unittest
+from unittest.mock import MagicMock, patch
+
+from rag_app.kg_module import KGManager
+from rag_app.kg_query_cache import QueryResultCache, query_key
+
+
+class _CountingRAG:
+    """Stand-in LightRAG instance that counts queries."""
+
+    def __init__(self):
+        self.queries = 0
+
+    async def aquery(self, query_text, param=None):
+        self.queries += 1
+        await asyncio.sleep(0)
+        return f"answer {self.queries}"
+
+    async def ainsert(self, text, ids=None):
+        await asyncio.sleep(0)
+
+
+class TestQueryResultCache(unittest.TestCase):
+    def test_lru_and_ttl(self):
+        cache = QueryResultCache(max_entries=2, ttl=60)
+        for name in ("a", "b"):
+            cache.put(name, name.upper(), cache.generation)
+        cache.get("a")
+        cache.put("c", "C", cache.generation)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "A")
+
+        with patch("rag_app.kg_query_cache.time.monotonic", return_value=10 ** 9):
+            self.assertIsNone(cache.get("a"))
+
+    def test_stale_generation_is_not_stored(self):
+        cache = QueryResultCache()
+        generation = cache.generation
+        cache.invalidate()
+        cache.put("q", "old", generation)
+        self.assertIsNone(cache.get("q"))
+
+    def test_key_depends_on_mode_and_params(self):
+        self.assertNotEqual(query_key("q", "local"), query_key("q", "global"))
+        self.assertNotEqual(query_key("q", "local", {"top_k": 5}), query_key("q", "local", {"top_k": 6}))
+        self.assertEqual(query_key("q", "local", {"a": 1, "b": 2}), query_key("q", "local", {"b": 2, "a": 1}))
+
+
+@patch('rag_app.kg_module.QueryParam', MagicMock())
+class TestKGManagerQueryCache(unittest.TestCase):
+    def setUp(self):
+        with patch('rag_app.kg_module.setup_logger'), patch('rag_app.kg_module.os.makedirs'):
+            self.manager = KGManager()
+        self.manager.rag = _CountingRAG()
+
+    def test_repeated_query_is_served_from_cache(self):
+        first = self.manager.query("What is a flip-flop?", mode="local", top_k=10)
+        second = self.manager.query("What is a flip-flop?", mode="local", top_k=10)
+        self.assertEqual(self.manager.rag.queries, 1)
+        self.assertEqual(second["result"], first["result"])
+        self.assertTrue(second["cached"])
+
+        self.manager.query("What is a flip-flop?", mode="global", top_k=10)
+        self.manager.query("What is a flip-flop?", mode="local", use_cache=False, top_k=10)
+        self.assertEqual(self.manager.rag.queries, 3)
+
+    def test_insert_invalidates(self):
+        self.manager.query("q")
+        self.manager.insert_text("new fact")
+        result = self.manager.query("q")
+        self.assertEqual(self.manager.rag.queries, 2)
+        self.assertNotIn("cached", result)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Tests for lazy component initialization and readiness reporting.
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+
+from rag_app.lifecycle import FAILED, PENDING, READY, ComponentRegistry, LazyComponent
+
+
+class TestLazyComponent(unittest.TestCase):
+    def test_concurrent_first_use_builds_once(self):
+        builds = []
+
+        def factory():
+            builds.append(1)
+            time.sleep(0.05)
+            return object()
+
+        component = LazyComponent("slow", factory)
+        self.assertEqual(component.state, PENDING)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(component.get())) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(len({id(r) for r in results}), 1)
+        self.assertEqual(component.state, READY)
+
+    def test_failure_is_recorded_and_retried(self):
+        attempts = []
+
+        def factory():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("model not found")
+            return "ok"
+
+        component = LazyComponent("flaky", factory)
+        with self.assertRaises(RuntimeError):
+            component.get()
+        self.assertEqual(component.state, FAILED)
+        self.assertEqual(component.status()["error"], "model not found")
+        self.assertEqual(component.get(), "ok")
+        self.assertIsNone(component.status()["error"])
+
+
+class TestComponentRegistry(unittest.TestCase):
+    def test_readiness_follows_required_components(self):
+        registry = ComponentRegistry()
+        registry.register("rag", lambda: "rag", required=True)
+        registry.register("kg", lambda: 1 / 0)
+        self.assertFalse(registry.readiness()["ready"])
+
+        asyncio.run(registry.warm_up(["rag", "kg", "unknown"]))
+        readiness = registry.readiness()
+        self.assertTrue(readiness["ready"])
+        self.assertEqual(readiness["components"]["rag"]["state"], READY)
+        self.assertEqual(readiness["components"]["kg"]["state"], FAILED)
+
+    def test_aclose_closes_built_components_in_reverse_order(self):
+        closed = []
+
+        async def aclose(instance):
+            closed.append(instance)
+
+        registry = ComponentRegistry()
+        registry.register("a", lambda: "a", close=closed.append)
+        registry.register("b", lambda: "b", close=aclose)
+        registry.register("c", lambda: "c", close=closed.append)
+
+        async def run():
+            await registry.warm_up(["a", "b"], parallel=False)
+            await registry.aclose()
+
+        asyncio.run(run())
+        self.assertEqual(closed, ["b", "a"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+Tests for the persistent LLM/embedding response cache.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+from rag_app.llm_cache import CacheMissError, ResponseCache, cache_key, cached_embedding, cached_llm
+
+
+class TestResponseCache(unittest.TestCase):
+    """Test cases for ResponseCache and the model wrappers."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.path = os.path.join(self.tmp_dir, "cache.sqlite")
+
+    def test_llm_responses_are_replayed(self):
+        calls = []
+
+        async def llm(prompt, system_prompt=None, history_messages=[], keyword_extraction=False, **kwargs):
+            calls.append(prompt)
+            return f"echo {prompt}"
+
+        cache = ResponseCache(self.path)
+        wrapped = cached_llm(llm, cache, "qwen-plus")
+        self.assertEqual(asyncio.run(wrapped("hi", hashing_kv=object())), "echo hi")
+        self.assertEqual(asyncio.run(wrapped("hi", hashing_kv=object())), "echo hi")
+        self.assertEqual(calls, ["hi"])
+        cache.close()
+
+        offline = ResponseCache(self.path, mode="cache_only")
+        wrapped = cached_llm(llm, offline, "qwen-plus")
+        self.assertEqual(asyncio.run(wrapped("hi")), "echo hi")
+        with self.assertRaises(CacheMissError):
+            asyncio.run(wrapped("new prompt"))
+        self.assertEqual(calls, ["hi"])
+
+    def test_embeddings_only_compute_missing_texts(self):
+        seen = []
+
+        async def embed(texts):
+            seen.append(list(texts))
+            return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+        wrapped = cached_embedding(embed, ResponseCache(self.path), "text-embedding-v2")
+        asyncio.run(wrapped(["a", "bb"]))
+        result = asyncio.run(wrapped(["bb", "ccc", "a"]))
+        self.assertEqual(seen, [["a", "bb"], ["ccc"]])
+        np.testing.assert_array_equal(result, [[2, 1], [3, 1], [1, 1]])
+
+    def test_lru_eviction_bounds_size(self):
+        cache = ResponseCache(self.path, max_bytes=250)
+        keys = [cache_key("llm", "m", i) for i in range(3)]
+        cache.put(keys[0], "llm", "m", b"x" * 100)
+        cache.put(keys[1], "llm", "m", b"x" * 100)
+        cache.get(keys[0])
+        cache.put(keys[2], "llm", "m", b"x" * 100)
+        stats = cache.stats()
+        self.assertEqual(stats["bytes"], 200)
+        self.assertEqual(stats["evictions"], 1)
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertIsNotNone(cache.get(keys[2]))
+
+    def test_wrappers_batch_lookups_off_the_event_loop(self):
+        calls = []
+
+        class RecordingCache(ResponseCache):
+            def get_many(self, keys):
+                calls.append(("get_many", len(keys), threading.get_ident()))
+                return super().get_many(keys)
+
+            def put_many(self, entries):
+                calls.append(("put_many", len(entries), threading.get_ident()))
+                super().put_many(entries)
+
+        async def embed(texts):
+            return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+        cache = RecordingCache(self.path)
+        cache.put(cache_key("embedding", "text-embedding-v2", "a", {}), "embedding", "text-embedding-v2",
+                  np.array([1, 1], dtype=np.float32).tobytes())
+        calls.clear()
+        wrapped = cached_embedding(embed, cache, "text-embedding-v2")
+        asyncio.run(wrapped(["a", "bb", "ccc"]))
+        self.assertEqual([call[:2] for call in calls], [("get_many", 3), ("put_many", 2)])
+        self.assertNotIn(threading.get_ident(), [call[2] for call in calls])
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+Tests for the open-loop load generator and the stub backends.
+"""
+
+import asyncio
+import unittest
+
+import httpx
+from fastapi.testclient import TestClient
+
+from loadtest.generator import run_step, summarize
+from loadtest.stubs import StubLatency, StubReranker, create_dashscope_app, create_ollama_app, hashed_embeddings
+
+
+class TestLoadGenerator(unittest.TestCase):
+    def test_summarize(self):
+        samples = [{"latency": i / 1000, "status": 200, "error": None, "degraded": [], "coalesced": False}
+                   for i in range(1, 101)]
+        samples[0].update(degraded=["skip_rerank"], coalesced=True)
+        samples += [{"latency": 0.001, "status": 503, "error": None, "degraded": [], "coalesced": False},
+                    {"latency": 5.0, "status": None, "error": "timeout", "degraded": [], "coalesced": False}]
+        summary = summarize(samples, duration=10)
+        self.assertEqual((summary["sent"], summary["ok"], summary["throughput_qps"]), (102, 100, 10.0))
+        self.assertEqual((summary["p50_ms"], summary["p99_ms"], summary["max_ms"]), (50.0, 99.0, 100.0))
+        self.assertEqual(summary["errors"], {"503": 1, "timeout": 1})
+        self.assertEqual(summary["degraded_by_kind"], {"skip_rerank": 1})
+        self.assertEqual(summary["coalesced"], 1)
+
+    def test_open_loop_keeps_sending_while_the_server_is_slow(self):
+        async def handler(request):
+            await asyncio.sleep(0.2)
+            return httpx.Response(200, json={"results": [], "degraded": [], "coalesced": False})
+
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://api") as client:
+                return await run_step(client, "/search", ["q1", "q2"], qps=100, duration=0.3, arrival="constant")
+
+        summary = asyncio.run(run())
+        # A closed loop with one worker would have sent 2 requests in 0.3s
+        self.assertEqual(summary["sent"], 30)
+        self.assertEqual(summary["ok"], 30)
+        self.assertGreaterEqual(summary["p50_ms"], 200)
+
+
+class TestStubBackends(unittest.TestCase):
+    def test_hashed_embeddings_are_deterministic_unit_vectors(self):
+        a, b, c = hashed_embeddings(["加法器的功能", "加法器的功能", "寄存器"], dimensions=64)
+        self.assertEqual(a, b)
+        self.assertAlmostEqual(sum(v * v for v in a), 1.0, places=5)
+        self.assertNotEqual(a, c)
+
+    def test_ollama_and_dashscope_stubs(self):
+        ollama = TestClient(create_ollama_app(StubLatency(), dimensions=32))
+        self.assertEqual(len(ollama.post("/api/embeddings", json={"prompt": "题目"}).json()["embedding"]), 32)
+        embedded = ollama.post("/api/embed", json={"model": "m", "input": ["a", "b"]}).json()["embeddings"]
+        self.assertEqual([len(v) for v in embedded], [32, 32])
+
+        dashscope = TestClient(create_dashscope_app(StubLatency()))
+        body = dashscope.post("/api/v1/services/embeddings/text-embedding/text-embedding",
+                              json={"model": "text-embedding-v4", "input": {"texts": ["a", "b"]},
+                                    "parameters": {"dimension": 16}}).json()
+        self.assertEqual([e["text_index"] for e in body["output"]["embeddings"]], [0, 1])
+        self.assertEqual(len(body["output"]["embeddings"][0]["embedding"]), 16)
+
+    def test_stub_reranker_prefers_overlapping_chunks(self):
+        scores = StubReranker(StubLatency(latency_ms=1)).rerank("时序逻辑电路", ["组合逻辑电路", "时序逻辑电路的特点"])
+        self.assertGreater(scores[1], scores[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+"""
+Tests for the lightweight Prometheus metrics layer.
+"""
+
+import unittest
+
+from rag_app import metrics
+from rag_app.metrics import MetricsRegistry
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """Test cases for MetricsRegistry and its Prometheus rendering."""
+
+    def test_histogram_and_counter_rendering(self):
+        registry = MetricsRegistry(latency_buckets=(0.1, 1.0))
+        registry.observe(metrics.LATENCY_METRIC, 0.05, stage="vector_recall")
+        registry.observe(metrics.LATENCY_METRIC, 0.5, stage="vector_recall")
+        registry.inc(metrics.CACHE_METRIC, 3, cache="rerank_tokens", result="hit")
+        text = registry.render_prometheus()
+        self.assertIn("# TYPE rag_stage_latency_seconds histogram", text)
+        self.assertIn('rag_stage_latency_seconds_bucket{stage="vector_recall",le="0.1"} 1', text)
+        self.assertIn('rag_stage_latency_seconds_bucket{stage="vector_recall",le="1"} 2', text)
+        self.assertIn('rag_stage_latency_seconds_bucket{stage="vector_recall",le="+Inf"} 2', text)
+        self.assertIn('rag_stage_latency_seconds_count{stage="vector_recall"} 2', text)
+        self.assertIn('rag_cache_requests_total{cache="rerank_tokens",result="hit"} 3', text)
+
+    def test_disabled_registry_records_nothing(self):
+        registry = MetricsRegistry(enabled=False)
+        registry.observe(metrics.LATENCY_METRIC, 1.0, stage="search")
+        registry.inc(metrics.ERROR_METRIC, stage="search")
+        self.assertEqual(registry.render_prometheus(), "\n")
+
+    def test_timer_counts_errors(self):
+        metrics.registry.reset()
+        with self.assertRaises(ValueError):
+            with metrics.timer("kg_query", mode="hybrid"):
+                raise ValueError("boom")
+        self.assertEqual(metrics.registry.counter_value(metrics.ERROR_METRIC, stage="kg_query", mode="hybrid"), 1)
+
+    def test_label_values_are_escaped(self):
+        registry = MetricsRegistry()
+        registry.inc(metrics.ERROR_METRIC, stage='a"b\nc')
+        self.assertIn('stage="a\\"b\\nc"', registry.render_prometheus())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+Tests for the shared model server and its Unix-socket client.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from rag_app.model_server import ModelServer, ModelServerClient, ModelServerError, pack_text_list, unpack_text_list
+
+
+class LengthReranker:
+    """Scores each chunk by its length; records the chunk ids it was given."""
+
+    def __init__(self):
+        self.chunk_ids = []
+
+    def rerank(self, query, chunks, chunk_ids=None):
+        if query == "boom":
+            raise ValueError("bad query")
+        self.chunk_ids.append(chunk_ids)
+        return [float(len(c)) for c in chunks]
+
+
+def embed(texts):
+    return [[float(len(t)), 1.0, -1.0] for t in texts]
+
+
+class TestModelServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmp, "models.sock")
+        self.reranker = LengthReranker()
+        self.server = ModelServer(self.socket_path, reranker=self.reranker, embedding_function=embed)
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def serve():
+            asyncio.set_event_loop(self.loop)
+            self.loop.run_until_complete(self.server.start())
+            started.set()
+            self.loop.run_forever()
+            self.loop.run_until_complete(asyncio.sleep(0))
+            self.loop.close()
+
+        self.thread = threading.Thread(target=serve, daemon=True)
+        self.thread.start()
+        started.wait(5)
+        self.client = ModelServerClient(self.socket_path, request_timeout=5)
+
+    def tearDown(self):
+        self.client.close()
+        asyncio.run_coroutine_threadsafe(self.server.close(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+        shutil.rmtree(self.tmp)
+
+    def test_text_list_roundtrip(self):
+        payload = pack_text_list(["查询", "", "片段 b"]) + pack_text_list(["id-1"])
+        texts, pos = unpack_text_list(payload)
+        self.assertEqual(texts, ["查询", "", "片段 b"])
+        self.assertEqual(unpack_text_list(payload, pos)[0], ["id-1"])
+
+    def test_sync_rerank_and_embed(self):
+        self.assertEqual(self.client.rerank("q", ["a", "abc"], chunk_ids=["x", "y"]), [1.0, 3.0])
+        self.assertEqual(self.reranker.chunk_ids, [["x", "y"]])
+        self.assertEqual(self.client.embed(["ab"]), [[2.0, 1.0, -1.0]])
+        self.assertEqual(self.client.rerank("q", []), [])
+
+    def test_concurrent_async_requests_share_one_connection(self):
+        async def run():
+            queries = [self.client.arerank("q", ["x" * n]) for n in range(1, 21)]
+            results = await asyncio.gather(*queries, self.client.aembed(["abcd"]))
+            connections = self.server.connections
+            await self.client.aclose()
+            return results, connections
+
+        results, connections = asyncio.run(run())
+        self.assertEqual([r[0] for r in results[:-1]], [float(n) for n in range(1, 21)])
+        self.assertEqual(results[-1], [[4.0, 1.0, -1.0]])
+        self.assertEqual(connections, 1)
+
+    def test_errors_are_returned_and_connection_survives(self):
+        with self.assertRaises(ModelServerError) as ctx:
+            self.client.rerank("boom", ["a"])
+        self.assertIn("bad query", str(ctx.exception))
+        self.assertEqual(self.client.rerank("q", ["ab"]), [2.0])
+        health = self.client.health()
+        self.assertTrue(health["healthy"])
+        self.assertEqual(health["errors"], {"rerank": 1})
+
+    def test_health_reports_unreachable_server(self):
+        client = ModelServerClient(os.path.join(self.tmp, "missing.sock"), request_timeout=1)
+        self.assertFalse(client.health()["healthy"])
+
+
+if __name__ == "__main__":
+    unittest.main()
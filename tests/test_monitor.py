@@ -0,0 +1,53 @@
+"""
+Tests for the knowledge base monitor's query logging and event listeners.
+"""
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+from rag_app import config
+from rag_app.collection_stats import get_collection_stats
+from rag_app.monitor import KnowledgeBaseMonitor
+from rag_app.query_log import query_log
+
+
+class _QueryCollection:
+    def query(self, query_texts, n_results):
+        return {"ids": [["q1_A", "q2_A"]], "documents": [["doc 1", "doc 2"]],
+                "metadatas": [[{}, {}]], "distances": [[0.1, 0.2]]}
+
+
+class TestMonitorQueries(unittest.TestCase):
+    """Test cases for KnowledgeBaseMonitor.search_and_monitor and listener cleanup."""
+
+    def setUp(self):
+        with patch('rag_app.monitor.get_registry'):
+            self.monitor = KnowledgeBaseMonitor()
+        self.addCleanup(self.monitor.close)
+        self.monitor.registry = MagicMock()
+
+    def test_search_is_recorded_in_query_log(self):
+        self.monitor.registry.collection.return_value = _QueryCollection()
+        self.monitor.search_and_monitor("CPU 的主频", top_k=2)
+        entry = query_log.recent(1)[0]
+        self.assertEqual((entry["endpoint"], entry["query"], entry["top_k"]), ("monitor_search", "CPU 的主频", 2))
+        self.assertEqual(entry["result_ids"], ["q1_A", "q2_A"])
+
+        self.monitor.registry.collection.side_effect = RuntimeError("collection missing")
+        response = self.monitor.search_and_monitor("CPU 的缓存")
+        self.assertIn("error", response)
+        self.assertEqual(query_log.recent(1)[0]["error"], "collection missing")
+
+    def test_close_removes_listeners(self):
+        stats_listeners = get_collection_stats(config.COLLECTION_NAME).listeners
+        before = (len(query_log.listeners), len(stats_listeners))
+        with patch('rag_app.monitor.get_registry'):
+            other = KnowledgeBaseMonitor()
+        self.assertEqual((len(query_log.listeners), len(stats_listeners)), (before[0] + 1, before[1] + 1))
+        other.close()
+        other.close()
+        self.assertEqual((len(query_log.listeners), len(stats_listeners)), before)
+
+
+if __name__ == '__main__':
+    unittest.main()
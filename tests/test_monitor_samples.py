@@ -0,0 +1,62 @@
+"""
+Tests for paginated sample browsing in the knowledge base monitor.
+"""
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+from rag_app.monitor import KnowledgeBaseMonitor
+
+
+class _OrderedCollection:
+    """Stand-in collection that returns rows in insertion order like Chroma's get()."""
+
+    def __init__(self, n):
+        self.rows = [(f"q{i}_A", f"doc {i}", {"编号": str(i)}) for i in range(n)]
+        self.calls = []
+
+    def count(self):
+        return len(self.rows)
+
+    def get(self, limit=None, offset=0, include=None):
+        self.calls.append((limit, offset, tuple(include or ())))
+        rows = self.rows[offset:offset + limit]
+        return {
+            "ids": [r[0] for r in rows],
+            "documents": [r[1] for r in rows] if "documents" in (include or ()) else None,
+            "metadatas": [r[2] for r in rows] if "metadatas" in (include or ()) else None,
+        }
+
+
+class TestMonitorSamples(unittest.TestCase):
+    """Test cases for KnowledgeBaseMonitor.get_data_samples."""
+
+    def setUp(self):
+        with patch('rag_app.monitor.get_registry'):
+            self.monitor = KnowledgeBaseMonitor()
+        self.addCleanup(self.monitor.close)
+        self.collection = _OrderedCollection(25)
+        self.monitor.registry = MagicMock()
+        self.monitor.registry.collection.return_value = self.collection
+
+    def test_offset_is_pushed_down(self):
+        data = self.monitor.get_data_samples(limit=5, offset=10)
+        self.assertEqual([s["id"] for s in data["samples"]], [f"q{i}_A" for i in range(10, 15)])
+        self.assertEqual(self.collection.calls, [(5, 10, ("documents", "metadatas"))])
+
+    def test_projection_ids_only(self):
+        data = self.monitor.get_data_samples(limit=3, fields=[])
+        self.assertEqual(data["samples"][0], {"id": "q0_A", "index": 0})
+
+    def test_cursor_survives_appends_and_deletes(self):
+        first = self.monitor.get_data_samples(limit=10)
+        cursor = first["pagination"]["next_cursor"]
+        self.collection.rows.append(("q99_A", "new", {}))
+        del self.collection.rows[2]
+        second = self.monitor.get_data_samples(limit=10, cursor=cursor)
+        self.assertEqual(second["samples"][0]["id"], "q10_A")
+        self.assertTrue(second["pagination"]["cursor_realigned"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+"""
+Tests for the async Ollama client used by KGManager.
+"""
+
+import asyncio
+import json
+import unittest
+
+import httpx
+import numpy as np
+
+from rag_app.ollama_client import OllamaClient
+
+
+class _StubOllama:
+    """In-process stand-in for the Ollama HTTP API."""
+
+    def __init__(self):
+        self.requests = []
+        self.active = 0
+        self.peak = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        self.requests.append((request.url.path, body))
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        if request.url.path == "/api/embed":
+            return httpx.Response(200, json={"embeddings": [[float(len(t)), 1.0] for t in body["input"]]})
+        if body["stream"]:
+            lines = [json.dumps({"message": {"content": part}, "done": False}) for part in ("Hel", "lo")]
+            lines.append(json.dumps({"message": {"content": ""}, "done": True}))
+            return httpx.Response(200, content="\n".join(lines).encode("utf-8"))
+        answer = '{"ok": true}' if body.get("format") == "json" else "Hello"
+        return httpx.Response(200, json={"message": {"role": "assistant", "content": answer}, "done": True})
+
+
+class TestOllamaClient(unittest.TestCase):
+    def setUp(self):
+        self.server = _StubOllama()
+        self.client = OllamaClient(host="http://ollama.test", llm_model="llm", embedding_model="emb",
+                                   max_concurrency=2, embed_batch_size=3,
+                                   transport=httpx.MockTransport(self.server))
+
+    def test_embeddings_are_batched_and_bounded(self):
+        texts = [("x" * i) for i in range(1, 11)]
+        vectors = asyncio.run(self.client.embed(texts))
+        self.assertEqual(vectors.shape, (10, 2))
+        np.testing.assert_array_equal(vectors[:, 0], np.arange(1, 11, dtype=np.float32))
+        self.assertEqual([len(body["input"]) for _, body in self.server.requests], [3, 3, 3, 1])
+        self.assertEqual(self.server.peak, 2)
+
+    def test_llm_model_func(self):
+        async def run():
+            plain = await self.client.llm_model_func("hi", system_prompt="sys", history_messages=[],
+                                                     max_tokens=16, hashing_kv=object())
+            keywords = await self.client.llm_model_func("hi", response_format={"type": "json_object"})
+            stream = await self.client.llm_model_func("hi", stream=True)
+            return plain, keywords, [part async for part in stream]
+
+        plain, keywords, parts = asyncio.run(run())
+        self.assertEqual(plain, "Hello")
+        self.assertEqual(json.loads(keywords), {"ok": True})
+        self.assertEqual(parts, ["Hel", "lo"])
+        body = self.server.requests[0][1]
+        self.assertEqual([m["role"] for m in body["messages"]], ["system", "user"])
+        self.assertEqual(body["options"]["num_predict"], 16)
+
+    def test_http_errors_are_raised(self):
+        client = OllamaClient(host="http://ollama.test",
+                              transport=httpx.MockTransport(lambda request: httpx.Response(500)))
+        with self.assertRaises(httpx.HTTPStatusError):
+            asyncio.run(client.chat("hi"))
+
+
+if __name__ == "__main__":
+    unittest.main()
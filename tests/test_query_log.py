@@ -0,0 +1,50 @@
+"""
+Tests for the bounded query log and slow-query log.
+"""
+
+import unittest
+
+from rag_app.query_log import QueryLog, normalize_query
+
+
+class TestQueryLog(unittest.TestCase):
+    """Test cases for QueryLog."""
+
+    def test_recent_is_bounded_and_newest_first(self):
+        log = QueryLog(capacity=3)
+        for i in range(5):
+            log.record(f"q{i}", "search", 10)
+        self.assertEqual([e["query"] for e in log.recent()], ["q4", "q3", "q2"])
+        self.assertEqual(log.summary()["recorded"], 5)
+        self.assertEqual(log.summary()["buffered"], 3)
+
+    def test_slow_queries_respect_threshold_and_rate_limit(self):
+        log = QueryLog(slow_threshold_ms=100, slow_max_per_minute=2)
+        log.record("fast", "search", 50)
+        for i in range(4):
+            log.record(f"slow{i}", "search", 150)
+        self.assertEqual([e["query"] for e in log.slow()], ["slow1", "slow0"])
+        summary = log.summary()
+        self.assertEqual(summary["slow_seen"], 4)
+        self.assertEqual(summary["slow_dropped"], 2)
+
+    def test_hotspots(self):
+        log = QueryLog()
+        log.record("Python  函数", "search", 5, result_ids=["a", "b"])
+        log.record("ｐｙｔｈｏｎ 函数", "search", 5, result_ids=["a"])
+        log.record("other", "search", 5, error="boom")
+        # Full-width variants count as the same query, as they do for request coalescing
+        self.assertEqual(log.top_queries(1), [{"query": normalize_query("python 函数"), "count": 2}])
+        self.assertEqual(log.hot_documents(1), [{"id": "a", "count": 2}])
+
+    def test_listeners_receive_entries(self):
+        log = QueryLog()
+        seen = []
+        log.listeners.append(seen.append)
+        entry = log.record("q", "search_with_rerank", 12.3456, stages=[{"name": "prescore", "elapsed_ms": 1}])
+        self.assertEqual(seen, [entry])
+        self.assertEqual(entry["latency_ms"], 12.346)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,230 @@
+"""
+Tests for the asynchronous search paths of RAGManager (coalescing, latency budgets).
+"""
+
+import asyncio
+import os
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from rag_app import config, metrics, rag_module
+from rag_app.deadline import DeadlineExceeded
+from rag_app.query_log import query_log
+from rag_app.rag_module import RAGManager
+
+DOCUMENTS = ["CPU 的主频", "CPU 的缓存", "内存的带宽", "磁盘的寻道", "总线的宽度", "指令的流水"]
+
+
+class _FakeCollection:
+    """Returns DOCUMENTS in order, with increasing distances."""
+
+    def query(self, query_embeddings, n_results):
+        docs = DOCUMENTS[:n_results]
+        return {"ids": [[f"c{i}" for i in range(len(docs))]], "documents": [docs],
+                "metadatas": [[{} for _ in docs]], "distances": [[0.1 * (i + 1) for i in range(len(docs))]]}
+
+
+class _SlowEmbeddings:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self, input):
+        self.calls += 1
+        time.sleep(self.delay)
+        return [[1.0, 0.0] for _ in input]
+
+
+class _SlowReranker:
+    """Cross-encoder stand-in that ranks candidates in reverse recall order."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.batches = []
+
+    async def arerank(self, query, texts, chunk_ids=None):
+        self.batches.append(list(chunk_ids))
+        await asyncio.sleep(self.delay)
+        return [float(DOCUMENTS.index(text)) for text in texts]
+
+
+class _FailingReranker(_SlowReranker):
+    async def arerank(self, query, texts, chunk_ids=None):
+        raise RuntimeError("reranker unavailable")
+
+
+class _SearchTestCase(unittest.TestCase):
+    def setUp(self):
+        for patcher in (
+            patch.object(rag_module, "get_registry", MagicMock()),
+            patch.object(rag_module, "get_collection_stats", MagicMock()),
+            patch.object(rag_module, "create_embedding_function", MagicMock()),
+            patch.object(config, "EMBEDDING_PROVIDER", "ollama"),
+            patch.dict(config.RERANKER_CONFIG, {"enable_reranker": False, "pretokenize": False,
+                                                "early_exit_margin": None, "prescore_candidates": 6}),
+            patch.dict(config.MODEL_SERVER_CONFIG, {"socket_path": ""}),
+            patch.dict(config.SEARCH_CONFIG, {"coalesce": True, "default_deadline_ms": None}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _manager(self, embed_delay: float = 0.0, reranker: _SlowReranker = None) -> RAGManager:
+        manager = RAGManager()
+        manager.collection = _FakeCollection()
+        manager._embedding_function = _SlowEmbeddings(embed_delay)
+        if reranker is not None:
+            manager.remote_reranker = reranker
+            manager._reranker_loaded = True
+        return manager
+
+
+class TestCoalescing(_SearchTestCase):
+    def test_coalesced_requests_are_counted_per_operation(self):
+        manager = self._manager(embed_delay=0.05)
+        before = {op: metrics.registry.counter_value(metrics.COALESCED_METRIC, operation=op)
+                  for op in ("search", "search_with_rerank")}
+
+        async def run():
+            return await asyncio.gather(*[manager.asearch("CPU 的主频", 3) for _ in range(3)],
+                                        *[manager.asearch_with_rerank("CPU 的主频", 3) for _ in range(2)])
+
+        responses = asyncio.run(run())
+        self.assertEqual(manager._embedding_function.calls, 2)
+        self.assertEqual(sum(bool(r.get("coalesced")) for r in responses), 3)
+        if metrics.registry.enabled:
+            self.assertEqual(metrics.registry.counter_value(metrics.COALESCED_METRIC, operation="search"),
+                             before["search"] + 2)
+            self.assertEqual(metrics.registry.counter_value(metrics.COALESCED_METRIC,
+                                                            operation="search_with_rerank"),
+                             before["search_with_rerank"] + 1)
+
+
+class TestLatencyAccounting(_SearchTestCase):
+    def test_logged_latency_includes_query_embedding(self):
+        manager = self._manager(embed_delay=0.05)
+        asyncio.run(manager.asearch("CPU 的主频", 3))
+        self.assertGreaterEqual(query_log.recent(1)[0]["latency_ms"], 50)
+
+        response = asyncio.run(manager.asearch_with_rerank("CPU 的缓存", 3))
+        entry = query_log.recent(1)[0]
+        self.assertEqual(entry["endpoint"], "search_with_rerank")
+        self.assertGreaterEqual(entry["latency_ms"], 50)
+        stages = {stage["name"]: stage["elapsed_ms"] for stage in response["stages"]}
+        self.assertGreaterEqual(stages["embedding"], 50)
+        self.assertIn("vector_recall", stages)
+
+    def test_error_latency_is_measured_from_the_request_start(self):
+        manager = self._manager(embed_delay=0.05, reranker=_FailingReranker())
+        with self.assertRaises(RuntimeError):
+            asyncio.run(manager.asearch_with_rerank("CPU 的主频", 3))
+        entry = query_log.recent(1)[0]
+        self.assertEqual(entry["error"], "reranker unavailable")
+        self.assertGreaterEqual(entry["latency_ms"], 50)
+
+
+class TestDeadlineDegradation(_SearchTestCase):
+    QUERY = "CPU 的主频"
+
+    def _rerank(self, manager, top_k=3, deadline_ms=None):
+        return asyncio.run(manager.asearch_with_rerank(self.QUERY, top_k, deadline_ms=deadline_ms))
+
+    def _prescore_order(self, manager):
+        plan = manager._prepare_rerank(self.QUERY, 3, "vector", [1.0, 0.0])
+        return [c["id"] for c in plan["survivors"]]
+
+    def test_unbounded_request_reranks_and_updates_cost_estimate(self):
+        reranker = _SlowReranker(delay=0.03)
+        manager = self._manager(reranker=reranker)
+        self.assertEqual(manager._rerank_ms_per_candidate, 15)
+        response = self._rerank(manager)
+        self.assertEqual(response["degraded"], [])
+        self.assertEqual(response["rerank_strategy"], "qwen3-reranker")
+        self.assertEqual([r["id"] for r in response["results"]], ["c5", "c4", "c3"])
+        # 30 ms for 6 candidates: the estimate moves 20% of the way from 15 towards ~5 ms
+        self.assertGreaterEqual(manager._rerank_ms_per_candidate, 13)
+        self.assertLess(manager._rerank_ms_per_candidate, 15)
+
+    def test_skip_rerank_when_budget_cannot_cover_top_k(self):
+        reranker = _SlowReranker()
+        manager = self._manager(reranker=reranker)
+        manager._rerank_ms_per_candidate = 1000
+        before = metrics.registry.counter_value(metrics.DEGRADED_METRIC, operation="search_with_rerank",
+                                                degradation="skip_rerank")
+        response = self._rerank(manager, deadline_ms=500)
+        self.assertEqual(response["degraded"], ["skip_rerank"])
+        self.assertEqual(response["rerank_strategy"], "prescore")
+        self.assertEqual(reranker.batches, [])
+        self.assertEqual([r["id"] for r in response["results"]], self._prescore_order(manager)[:3])
+        if metrics.registry.enabled:
+            after = metrics.registry.counter_value(metrics.DEGRADED_METRIC, operation="search_with_rerank",
+                                                   degradation="skip_rerank")
+            self.assertEqual(after, before + 1)
+
+    def test_partial_rerank_scores_the_affordable_prefix(self):
+        reranker = _SlowReranker()
+        manager = self._manager(reranker=reranker)
+        manager._rerank_ms_per_candidate = 100
+        # (450 ms - 5 ms reserve) / 100 ms affords 4 of the 6 survivors
+        response = self._rerank(manager, deadline_ms=450)
+        self.assertEqual(response["degraded"], ["partial_rerank"])
+        self.assertEqual(response["rerank_strategy"], "qwen3-reranker")
+        sent = self._prescore_order(manager)[:4]
+        self.assertEqual(reranker.batches, [sent])
+        expected = sorted(sent, key=lambda chunk_id: int(chunk_id[1:]), reverse=True)[:3]
+        self.assertEqual([r["id"] for r in response["results"]], expected)
+
+    def test_rerank_timeout_falls_back_to_prescore(self):
+        reranker = _SlowReranker(delay=1.0)
+        manager = self._manager(reranker=reranker)
+        manager._rerank_ms_per_candidate = 0.1
+        started = time.perf_counter()
+        response = self._rerank(manager, deadline_ms=100)
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertEqual(response["degraded"], ["rerank_timeout"])
+        self.assertEqual(response["rerank_strategy"], "prescore")
+        self.assertEqual(len(reranker.batches), 1)
+        self.assertEqual([r["id"] for r in response["results"]], self._prescore_order(manager)[:3])
+        # The wait until the timeout (~95 ms for 6 candidates) is a lower bound on the cost
+        self.assertGreater(manager._rerank_ms_per_candidate, 2)
+
+    def test_lower_bound_never_lowers_the_estimate(self):
+        manager = self._manager()
+        manager._rerank_ms_per_candidate = 50
+        manager._observe_rerank_cost(10, lower_bound=True)
+        self.assertEqual(manager._rerank_ms_per_candidate, 50)
+
+    def test_slow_retrieval_returns_the_last_result(self):
+        manager = self._manager(reranker=_SlowReranker())
+        fresh = self._rerank(manager)
+        manager._embedding_function.delay = 0.2
+        response = self._rerank(manager, deadline_ms=50)
+        self.assertEqual(response["degraded"], ["stale_cache"])
+        self.assertIn("stale_age_s", response)
+        self.assertEqual([r["id"] for r in response["results"]], [r["id"] for r in fresh["results"]])
+
+    def test_slow_retrieval_without_previous_result_raises(self):
+        manager = self._manager(embed_delay=0.2)
+        with self.assertRaises(DeadlineExceeded):
+            asyncio.run(manager.asearch(self.QUERY, 3, deadline_ms=50))
+
+
+@unittest.skipUnless(os.path.isdir("rag_app/static"), "main.py mounts rag_app/static for the monitor UI")
+class TestDeadlineResponse(_SearchTestCase):
+    def test_deadline_exceeded_maps_to_504(self):
+        from fastapi.testclient import TestClient
+
+        import main
+
+        manager = self._manager(embed_delay=0.2)
+
+        async def aget(name):
+            return manager
+
+        with patch.object(main.components, "aget", aget):
+            response = TestClient(main.app).post("/search", json={"query": "CPU 的主频", "deadline_ms": 50})
+        self.assertEqual(response.status_code, 504)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+Tests for the segmented prompt encoding used by the Qwen3 reranker.
+"""
+
+import importlib.util
+import unittest
+
+MODEL_DEPS = all(importlib.util.find_spec(name) for name in ("torch", "transformers", "tokenizers"))
+
+# Qwen2 pre-tokenizer: punctuation is split off together with the letters that follow it
+QWEN_PRETOKENIZE = (r"""(?i:'s|'t|'re|'ve|'m|'ll|'d)|[^\r\n\p{L}\p{N}]?\p{L}+|\p{N}| ?[^\s\p{L}\p{N}]+[\r\n]*"""
+                    r"""|\s*[\r\n]+|\s+(?!\S)|\s+""")
+QUERIES = ["CPU 的主频是多少？", "什么是缓存", "Cache 命中率"]
+CHUNKS = ["CPU 的主频", "A. 内存的带宽", "题干 B. 错"]
+
+
+def _full_prompt(query, chunk):
+    from rag_app.reranker import INSTRUCTION, SYSTEM_PROMPT
+
+    return f"{SYSTEM_PROMPT}<|im_start|>user 指令：{INSTRUCTION} 查询：{query} 文档：{chunk}<|im_end|>"
+
+
+def _train_tokenizer():
+    """Small byte-level BPE with Qwen's pre-tokenizer, trained offline on the prompts themselves."""
+    from tokenizers import AddedToken, Regex, Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import PreTrainedTokenizerFast
+
+    tokenizer = Tokenizer(models.BPE())
+    tokenizer.pre_tokenizer = pre_tokenizers.Sequence([
+        pre_tokenizers.Split(Regex(QWEN_PRETOKENIZE), behavior="isolated"),
+        pre_tokenizers.ByteLevel(add_prefix_space=False, use_regex=False),
+    ])
+    tokenizer.decoder = decoders.ByteLevel()
+    special = ["<|im_start|>", "<|im_end|>"]
+    tokenizer.add_special_tokens([AddedToken(token, special=True) for token in special])
+    corpus = [_full_prompt(query, chunk) for query in QUERIES for chunk in CHUNKS] * 20
+    tokenizer.train_from_iterator(corpus, trainers.BpeTrainer(
+        vocab_size=600, special_tokens=special, initial_alphabet=pre_tokenizers.ByteLevel.alphabet()))
+    return PreTrainedTokenizerFast(tokenizer_object=tokenizer)
+
+
+@unittest.skipUnless(MODEL_DEPS, "torch, transformers and tokenizers are required")
+class TestRerankerPromptEncoder(unittest.TestCase):
+    """Test cases for RerankerPromptEncoder."""
+
+    @classmethod
+    def setUpClass(cls):
+        from rag_app.reranker import RerankerPromptEncoder
+
+        cls.tokenizer = _train_tokenizer()
+        cls.encoder = RerankerPromptEncoder(cls.tokenizer)
+
+    def _full_ids(self, query, chunk):
+        return self.tokenizer(_full_prompt(query, chunk), add_special_tokens=False)["input_ids"]
+
+    def test_segmented_encoding_matches_full_prompt(self):
+        for query in QUERIES:
+            batch = self.encoder.build_batch(query, self.encoder.encode_chunks(CHUNKS))
+            for row, chunk in zip(batch["input_ids"].tolist(), CHUNKS):
+                full = self._full_ids(query, chunk)
+                self.assertEqual(row[-len(full):], full)
+
+    def test_batch_is_left_padded(self):
+        query = QUERIES[0]
+        batch = self.encoder.build_batch(query, self.encoder.encode_chunks(CHUNKS))
+        lengths = [len(self._full_ids(query, chunk)) for chunk in CHUNKS]
+        width = max(lengths)
+        self.assertEqual(batch["input_ids"].shape[1], width)
+        for mask, length in zip(batch["attention_mask"].tolist(), lengths):
+            self.assertEqual(mask, [0] * (width - length) + [1] * length)
+
+    def test_truncation_keeps_the_suffix_last(self):
+        from rag_app.reranker import RerankerPromptEncoder
+
+        query = QUERIES[0]
+        head = len(self.encoder.prefix_ids) + len(self.encoder._encode(f"：{query}")) + len(self.encoder.middle_ids)
+        encoder = RerankerPromptEncoder(self.tokenizer, max_length=head + len(self.encoder.suffix_ids) + 2)
+        row = encoder.build_batch(query, encoder.encode_chunks(["内存的带宽" * 20]))["input_ids"].tolist()[0]
+        self.assertEqual(len(row), encoder.max_length)
+        self.assertEqual(row[-len(encoder.suffix_ids):], encoder.suffix_ids)
+
+
+if __name__ == '__main__':
+    unittest.main()
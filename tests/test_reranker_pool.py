@@ -0,0 +1,92 @@
+"""
+Tests for the out-of-process reranker pool.
+"""
+
+import asyncio
+import os
+import time
+import unittest
+
+from rag_app.reranker_pool import RerankerPool, _pack_texts, _unpack_texts
+
+
+class _LengthReranker:
+    """Stand-in reranker that scores chunks by length and crashes or hangs on demand."""
+
+    def rerank(self, query, chunks):
+        if query == "crash":
+            os._exit(1)
+        if query == "hang":
+            time.sleep(3600)
+        return [float(len(chunk)) for chunk in chunks]
+
+
+def _make_length_reranker():
+    return _LengthReranker()
+
+
+class TestSharedMemoryTransport(unittest.TestCase):
+    """Test cases for the shared-memory request layout."""
+
+    def test_round_trip(self):
+        texts = ["查询", "文档一", "", "doc"]
+        shm = _pack_texts(texts, 3)
+        try:
+            self.assertEqual(_unpack_texts(shm.buf, 3), texts)
+        finally:
+            shm.close()
+            shm.unlink()
+
+
+class TestRerankerPool(unittest.TestCase):
+    """Test cases for RerankerPool using a stub reranker."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = RerankerPool(num_workers=2, factory=_make_length_reranker, factory_args=(),
+                                request_timeout=30, heartbeat_interval=0.2, heartbeat_timeout=5)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def test_rerank(self):
+        self.assertEqual(self.pool.rerank("q", ["a", "bbb", "中文"]), [1.0, 3.0, 2.0])
+
+    def test_arerank_concurrent(self):
+        async def run():
+            return await asyncio.gather(*[self.pool.arerank("q", ["x" * i]) for i in range(6)])
+        self.assertEqual(asyncio.run(run()), [[float(i)] for i in range(6)])
+
+    def test_restart_on_crash(self):
+        with self.assertRaises(RuntimeError):
+            self.pool.rerank("crash", ["a"])
+        deadline = time.time() + 20
+        while time.time() < deadline and self.pool.health()["ready_workers"] < 2:
+            time.sleep(0.1)
+        health = self.pool.health()
+        self.assertTrue(health["healthy"])
+        self.assertEqual(sum(w["restarts"] for w in health["workers"]), 1)
+        self.assertEqual(self.pool.rerank("q", ["abcd"]), [4.0])
+
+
+class TestStuckWorker(unittest.TestCase):
+    """A worker stuck in a forward pass stops sending heartbeats and is restarted."""
+
+    def test_restart_on_stuck_forward(self):
+        pool = RerankerPool(num_workers=1, factory=_make_length_reranker, factory_args=(),
+                            request_timeout=30, heartbeat_interval=0.1, heartbeat_timeout=1)
+        self.addCleanup(pool.close)
+        started = time.time()
+        with self.assertRaisesRegex(RuntimeError, "心跳超时"):
+            pool.rerank("hang", ["a"])
+        self.assertLess(time.time() - started, 10)
+        deadline = time.time() + 20
+        while time.time() < deadline and pool.health()["ready_workers"] < 1:
+            time.sleep(0.1)
+        self.assertEqual(pool.health()["workers"][0]["restarts"], 1)
+        self.assertEqual(pool.rerank("q", ["abc"]), [3.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+Tests for orjson responses, result projection and response compression.
+"""
+
+import json
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from rag_app import config
+from rag_app.responses import BrotliMiddleware, CompressionMiddleware, FastJSONResponse, project_results
+
+RESPONSE = {
+    "query": "函数",
+    "stages": [{"name": "prescore", "ms": 0.4}],
+    "results": [
+        {"id": "q1_A", "content": "题目：…", "metadata": {"question_text": "…" * 50}, "rerank_score": 0.9},
+        {"id": "q1_B", "content": "题目：…", "metadata": {"question_text": "…" * 50}, "rerank_score": 0.1},
+    ],
+}
+
+
+class TestResponses(unittest.TestCase):
+    def test_fast_json_response_handles_numpy(self):
+        body = FastJSONResponse({"score": np.float32(0.5), "ids": np.arange(2), 1: "x"}).body
+        self.assertEqual(json.loads(body), {"score": 0.5, "ids": [0, 1], "1": "x"})
+
+    def test_project_results(self):
+        projected = project_results(RESPONSE, ["id", "rerank_score", "graph_score"])
+        self.assertEqual(projected["results"], [{"id": "q1_A", "rerank_score": 0.9},
+                                                {"id": "q1_B", "rerank_score": 0.1}])
+        self.assertEqual(projected["stages"], RESPONSE["stages"])
+        self.assertIs(project_results(RESPONSE, None), RESPONSE)
+
+    def test_large_responses_are_compressed(self):
+        app = FastAPI(default_response_class=FastJSONResponse)
+        app.add_middleware(CompressionMiddleware, minimum_size=500, uncompressed_paths=["/stream"])
+
+        @app.get("/large")
+        async def large():
+            return FastJSONResponse({"rows": ["题目"] * 500})
+
+        @app.get("/small")
+        async def small():
+            return {"ok": True}
+
+        @app.get("/stream")
+        async def stream():
+            return StreamingResponse(iter(["data: " + "x" * 1000 + "\n\n"]), media_type="text/event-stream")
+
+        client = TestClient(app)
+        response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertLess(int(response.headers["content-length"]), len(json.dumps({"rows": ["题目"] * 500})))
+        self.assertEqual(response.json(), {"rows": ["题目"] * 500})
+        self.assertNotIn("content-encoding", client.get("/small", headers={"Accept-Encoding": "gzip"}).headers)
+        self.assertNotIn("content-encoding", client.get("/stream", headers={"Accept-Encoding": "gzip"}).headers)
+        # brotli is opt-in, so clients that accept it still get gzip by default
+        response = client.get("/large", headers={"Accept-Encoding": "br, gzip"})
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+
+    @unittest.skipUnless(BrotliMiddleware is not None, "brotli-asgi is an optional dependency")
+    def test_brotli_when_enabled(self):
+        app = FastAPI(default_response_class=FastJSONResponse)
+        with patch.dict(config.RESPONSE_CONFIG, {"brotli": True}):
+            app.add_middleware(CompressionMiddleware, minimum_size=500)
+            client = TestClient(app)
+
+            @app.get("/large")
+            async def large():
+                return FastJSONResponse({"rows": ["题目"] * 500})
+
+            response = client.get("/large", headers={"Accept-Encoding": "br, gzip"})
+        self.assertEqual(response.headers["content-encoding"], "br")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Tests for single-flight coalescing of identical concurrent requests.
+"""
+
+import asyncio
+import unittest
+
+from rag_app import metrics
+from rag_app.singleflight import SingleFlight, normalize_query
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query("  What  is\tＣＰＵ？ "), normalize_query("what is CPU?"))
+
+    def test_identical_calls_share_one_computation(self):
+        flight = SingleFlight("test")
+        calls = []
+        before = metrics.registry.counter_value(metrics.COALESCED_METRIC, operation="test")
+
+        async def compute(value):
+            calls.append(value)
+            await asyncio.sleep(0.02)
+            return {"value": value}
+
+        async def run():
+            same = [flight.do("k", compute, 1) for _ in range(10)]
+            results = await asyncio.gather(*same, flight.do("other", compute, 2))
+            self.assertEqual(flight.inflight(), 0)
+            return results
+
+        results = asyncio.run(run())
+        self.assertEqual(sorted(calls), [1, 2])
+        self.assertEqual([r for r, _ in results[:10]], [{"value": 1}] * 10)
+        self.assertEqual(sum(coalesced for _, coalesced in results), 9)
+        if metrics.registry.enabled:
+            after = metrics.registry.counter_value(metrics.COALESCED_METRIC, operation="test")
+            self.assertEqual(after, before + 9)
+
+    def test_errors_reach_every_waiter_and_are_not_cached(self):
+        flight = SingleFlight("test")
+        attempts = []
+
+        async def fail():
+            attempts.append(1)
+            await asyncio.sleep(0.01)
+            raise RuntimeError("ollama timeout")
+
+        async def run():
+            results = await asyncio.gather(*(flight.do("k", fail) for _ in range(3)), return_exceptions=True)
+            self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+            with self.assertRaises(RuntimeError):
+                await flight.do("k", fail)
+
+        asyncio.run(run())
+        self.assertEqual(len(attempts), 2)
+
+    def test_cancelled_leader_does_not_cancel_waiters(self):
+        flight = SingleFlight("test")
+
+        async def compute():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        async def run():
+            leader = asyncio.ensure_future(flight.do("k", compute))
+            await asyncio.sleep(0)
+            waiter = asyncio.ensure_future(flight.do("k", compute))
+            await asyncio.sleep(0)
+            leader.cancel()
+            return await waiter
+
+        self.assertEqual(asyncio.run(run()), ("done", True))
+
+
+if __name__ == "__main__":
+    unittest.main()
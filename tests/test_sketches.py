@@ -0,0 +1,61 @@
+"""
+Tests for the streaming sketches used in metadata profiling.
+"""
+
+import unittest
+
+from rag_app.sketches import FieldProfile, HyperLogLog, SpaceSaving
+
+
+class TestHyperLogLog(unittest.TestCase):
+    """Test cases for the HyperLogLog distinct counter."""
+
+    def test_estimate_within_error(self):
+        hll = HyperLogLog(p=12)
+        for i in range(50000):
+            hll.add(f"question-{i}")
+            hll.add(f"question-{i}")
+        self.assertAlmostEqual(hll.count(), 50000, delta=50000 * 0.05)
+
+    def test_small_cardinality_is_exact_enough(self):
+        hll = HyperLogLog()
+        for value in ["A", "B", "C", "D", "A"]:
+            hll.add(value)
+        self.assertEqual(hll.count(), 4)
+
+    def test_round_trip(self):
+        hll = HyperLogLog(p=10)
+        for i in range(100):
+            hll.add(str(i))
+        self.assertEqual(HyperLogLog.from_dict(hll.to_dict()).count(), hll.count())
+
+
+class TestSpaceSaving(unittest.TestCase):
+    """Test cases for the Space-Saving heavy-hitter sketch."""
+
+    def test_heavy_hitters_survive_long_tail(self):
+        sketch = SpaceSaving(capacity=8)
+        for i in range(2000):
+            sketch.add("A" if i % 3 == 0 else f"tail-{i}")
+        value, count, error = sketch.top(1)[0]
+        self.assertEqual(value, "A")
+        self.assertLessEqual(count - error, 667)
+        self.assertGreaterEqual(count, 667)
+        self.assertEqual(len(sketch.counters), 8)
+
+
+class TestFieldProfile(unittest.TestCase):
+    """Test cases for the bounded field summary."""
+
+    def test_summary_is_bounded(self):
+        profile = FieldProfile(top_capacity=16)
+        for i in range(5000):
+            profile.add("题干" * 100 + str(i))
+        summary = profile.summary(top_n=5, max_value_length=20)
+        self.assertEqual(len(summary["top_values"]), 5)
+        self.assertTrue(all(len(v["value"]) <= 21 for v in summary["top_values"]))
+        self.assertEqual(summary["total_occurrences"], 5000)
+
+
+if __name__ == '__main__':
+    unittest.main()
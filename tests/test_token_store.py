@@ -0,0 +1,82 @@
+"""
+Tests for the pre-tokenized document store.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from rag_app.token_store import TokenStore
+
+
+class TestTokenStore(unittest.TestCase):
+    """Test cases for the TokenStore class."""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def test_put_and_get(self):
+        store = TokenStore(self.path)
+        store.put_many(["q1_A", "q1_B"], [[1, 2, 3], [70000]])
+        self.assertEqual(list(store.get("q1_A")), [1, 2, 3])
+        self.assertEqual([list(t) if t is not None else None for t in store.get_many(["q1_B", "q9_Z"])],
+                         [[70000], None])
+        self.assertEqual(store.stats()["misses"], 1)
+
+    def test_existing_ids_are_not_rewritten(self):
+        store = TokenStore(self.path)
+        store.put_many(["q1_A"], [[1, 2]])
+        store.put_many(["q1_A", "q2_A"], [[9, 9], [4]])
+        self.assertEqual(list(store.get("q1_A")), [1, 2])
+        self.assertEqual(store.stats()["tokens"], 3)
+
+    def test_reader_picks_up_new_chunks(self):
+        writer = TokenStore(self.path)
+        writer.put_many(["q1_A"], [[5]])
+        reader = TokenStore(self.path)
+        self.assertEqual(len(reader), 1)
+        writer.put_many(["q2_A"], [[6, 7]])
+        self.assertEqual(list(reader.get("q2_A")), [6, 7])
+
+    def test_batches_append_to_the_log(self):
+        store = TokenStore(self.path)
+        store.put_many(["q1_A"], [[1, 2]])
+        log_file = os.path.join(self.path, "ids.log")
+        with open(log_file, "rb") as f:
+            first = f.read()
+        store.put_many(["q2_A"], [[3]])
+        with open(log_file, "rb") as f:
+            self.assertTrue(f.read().startswith(first))
+
+    def test_discard_and_compact(self):
+        writer = TokenStore(self.path)
+        writer.put_many(["q1_A", "q1_B", "q2_A"], [[1], [2, 3], [4]])
+        reader = TokenStore(self.path)
+        writer.discard(["q1_B", "q9_Z"])
+        self.assertEqual(len(writer), 2)
+        self.assertTrue(reader.refresh())
+        self.assertNotIn("q1_B", reader)
+        writer.close()
+        with open(os.path.join(self.path, "ids.log"), encoding="utf-8") as f:
+            self.assertEqual(len(f.read().splitlines()), 2)
+        writer.put_many(["q3_A"], [[5, 6]])
+        self.assertEqual([list(t) for t in reader.get_many(["q2_A", "q3_A"])], [[4], [5, 6]])
+        self.assertEqual(list(TokenStore(self.path).get("q1_A")), [1])
+
+    def test_partial_record_is_ignored(self):
+        store = TokenStore(self.path)
+        store.put_many(["q1_A"], [[1]])
+        with open(os.path.join(self.path, "ids.log"), "a", encoding="utf-8") as f:
+            f.write("q2_A\t1")
+        self.assertEqual(len(TokenStore(self.path)), 1)
+        store = TokenStore(self.path)
+        store.put_many(["q3_A"], [[7]])
+        self.assertEqual(list(TokenStore(self.path).get("q3_A")), [7])
+
+
+if __name__ == '__main__':
+    unittest.main()